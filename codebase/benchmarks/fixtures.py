@@ -0,0 +1,228 @@
+"""
+Synthetic inputs for the benchmarks: eregister pages, trademark sheets, scraper
+thread files and journal PDFs, all deterministic for a given seed.
+"""
+import base64
+import json
+import os
+import random
+import string
+
+import pandas as pd
+
+MARK_WORDS = [
+    "sunrise", "apple", "nova", "kripa", "shree ganesh", "lotus", "maxx", "zenith", "royal", "amrit",
+    "tiger", "bharat", "galaxy", "ocean", "star", "vedic", "nature", "pure", "glow", "om",
+]
+
+# roughly the busiest classes on the register: pharma, electronics, food, cosmetics, services
+DEFAULT_CLASS_WEIGHTS = {5: 4, 9: 3, 30: 3, 3: 2, 35: 2, 25: 1, 29: 1, 41: 1}
+
+
+def _hidden_inputs(state: str, rnd: random.Random, viewstate_bytes: int) -> str:
+    # the state leads the viewstate so a mock server can tell which page a postback comes from
+    viewstate = base64.b64encode(state.encode() + b'|' + rnd.randbytes(viewstate_bytes)).decode()
+    validation = base64.b64encode(rnd.randbytes(max(viewstate_bytes // 20, 16))).decode()
+    return (
+        '<input type="hidden" name="ToolkitScriptManager1_HiddenField" id="ToolkitScriptManager1_HiddenField" '
+        'value=";;AjaxControlToolkit, Version=3.5.11119.20050, Culture=neutral" />\n'
+        '<input type="hidden" name="__EVENTTARGET" id="__EVENTTARGET" value="" />\n'
+        '<input type="hidden" name="__EVENTARGUMENT" id="__EVENTARGUMENT" value="" />\n'
+        f'<input type="hidden" name="__VIEWSTATE" id="__VIEWSTATE" value="{viewstate}" />\n'
+        '<input type="hidden" name="__VIEWSTATEGENERATOR" id="__VIEWSTATEGENERATOR" value="B8CF52B9" />\n'
+        '<input type="hidden" name="__VIEWSTATEENCRYPTED" id="__VIEWSTATEENCRYPTED" value="" />\n'
+        f'<input type="hidden" name="__EVENTVALIDATION" id="__EVENTVALIDATION" value="{validation}" />\n'
+    )
+
+
+def viewstate_state(viewstate: str) -> str | None:
+    """The state a fixture page put in front of its viewstate, None for foreign viewstates."""
+    try:
+        return base64.b64decode(viewstate).split(b'|', 1)[0].decode()
+    except (ValueError, UnicodeDecodeError):
+        return None
+
+
+def _page(body: str, hidden: str) -> str:
+    return f"""<!DOCTYPE html>
+<html xmlns="http://www.w3.org/1999/xhtml">
+<head><title>Trade Marks Registry</title>
+<script type="text/javascript">//<![CDATA[
+var theForm = document.forms['form1'];
+//]]></script>
+<style>.grid {{ border: 1px }}</style></head>
+<body>
+<form name="form1" method="post" action="./Application_View.aspx" id="form1">
+{hidden}
+{body}
+</form>
+</body>
+</html>"""
+
+
+def search_page(appl_number: str, seed: int = 0, viewstate_bytes: int = 30_000) -> str:
+    """The search result page listing ``appl_number``, whose link posts back to the detail page."""
+    rnd = random.Random(seed)
+    body = f"""<table id="SearchWMDatagrid" width="100%">
+  <tr><td>Application No.</td><td>Proprietor Name</td></tr>
+  <tr><td><a id="SearchWMDatagrid_ctl03_lnkbtnappNumber1"
+         href="javascript:__doPostBack('SearchWMDatagrid$ctl03$lnkbtnappNumber1','')">{appl_number}</a></td>
+      <td>ACME &amp; SONS PVT. LTD.</td></tr>
+</table>"""
+    return _page(body, _hidden_inputs(f"search:{appl_number}", rnd, viewstate_bytes))
+
+
+def detail_page(appl_number: str, seed: int = 0, viewstate_bytes: int = 30_000, status: str = "Registered") -> str:
+    """An Application_View.aspx detail page shaped like the ones the eregister site returns."""
+    rnd = random.Random(seed)
+    fields = [
+        ("TM Application No.", appl_number),
+        ("Class", str(rnd.randint(1, 45))),
+        ("Date of Application", f"{rnd.randint(1, 28):02d}/{rnd.randint(1, 12):02d}/20{rnd.randint(10, 24)}"),
+        ("Appropriate Office", rnd.choice(["MUMBAI", "DELHI", "CHENNAI", "KOLKATA", "AHMEDABAD"])),
+        ("State", rnd.choice(["MAHARASHTRA", "DELHI", "TAMIL NADU"])),
+        ("Country", "India"),
+        ("Filing Mode", "e-Filing"),
+        ("TM Applied For", f"MARK {appl_number}"),
+        ("TM Category", "TRADE MARK"),
+        ("Trade Mark Type", rnd.choice(["WORD", "DEVICE"])),
+        ("User Detail", "Proposed to be Used"),
+        ("Certificate Detail", "Certificate No. &nbsp; Dated :"),
+        ("Valid upto/ Renewed upto", "NA"),
+        ("Proprietor name", "(1) ACME &amp; SONS PVT. LTD.<br/>\n  12, MG ROAD, MUMBAI"),
+        ("Proprietor Address", "12, MG ROAD<br/>MUMBAI - 400001"),
+        ("Goods & Service Details", "[CLASS : 5]<br/>" + " ".join("GOODS" for _ in range(rnd.randint(5, 60)))),
+        ("Publication Details", f"Published in Journal No. : {rnd.randint(1500, 2100)} Dated : 01/01/2024"),
+    ]
+    rows = "\n".join(
+        f'<tr>\n  <td width="25%"><font face="Verdana" size="2">{key}</font></td>\n'
+        f'  <td><font face="Verdana" size="2"> {value} </font></td>\n</tr>'
+        for key, value in fields
+    )
+    body = f"""<div id="panelgetdetail">
+  <table width="100%"><tr><td><img src="images/logo.gif" /> Trade Marks Registry</td></tr></table>
+  <table width="100%">
+    <tr><td>As on Date : {rnd.randint(1, 28):02d}/10/2026</td></tr>
+    <tr><td><font face="Verdana" size="2">Status : </font><font color="red"><b>{status}</b></font></td></tr>
+  </table>
+  <table border="1" width="100%">
+{rows}
+  </table>
+  <!-- opposition details -->
+  <table><tr><td>Alert</td></tr></table>
+</div>"""
+    return _page(body, _hidden_inputs(f"detail:{appl_number}", rnd, viewstate_bytes))
+
+
+def parse_class_weights(spec: str) -> dict:
+    """'5:4,9:3,30:3' -> {5: 4, 9: 3, 30: 3}"""
+    weights = {}
+    for part in spec.split(','):
+        trademark_class, weight = part.split(':')
+        weights[int(trademark_class)] = float(weight)
+    return weights
+
+
+def _mutate(mark: str, rnd: random.Random) -> str:
+    letters = list(mark)
+    for _ in range(rnd.randint(0, 3)):
+        op = rnd.random()
+        i = rnd.randrange(len(letters) + 1)
+        if op < .3 and letters:
+            letters[min(i, len(letters) - 1)] = rnd.choice(string.ascii_lowercase)
+        elif op < .6:
+            letters.insert(i, rnd.choice(string.ascii_lowercase + " -1"))
+        elif letters:
+            del letters[min(i, len(letters) - 1)]
+    mutated = "".join(letters)
+    return mutated.upper() if rnd.random() < .3 else mutated.title()
+
+
+def trademark_sheet(
+        count: int,
+        seed: int = 0,
+        start: int = 1000000,
+        class_weights: dict | None = None,
+        missing_rate: float = 0.03,
+) -> pd.DataFrame:
+    """
+    A sheet with the columns extract_similar_tm reads. Marks are mutated combinations
+    of a small vocabulary, so there are plenty of near matches, and a share of rows
+    has no mark or no class, like real exports.
+    """
+    rnd = random.Random(seed)
+    class_weights = class_weights or DEFAULT_CLASS_WEIGHTS
+    classes, weights = list(class_weights), list(class_weights.values())
+
+    rows = []
+    for i in range(count):
+        mark = _mutate(" ".join(rnd.sample(MARK_WORDS, rnd.choice([1, 1, 2]))), rnd)
+        trademark_class = rnd.choices(classes, weights)[0]
+        if rnd.random() < missing_rate:
+            mark = None
+        if rnd.random() < missing_rate:
+            trademark_class = None
+        rows.append({"TM Application No.": start + i, "TM Applied For": mark, "Class": trademark_class})
+    return pd.DataFrame(rows)
+
+
+def write_thread_files(directory: str, files: int, records_per_file: int, start: int = 1000000) -> int:
+    """Scraper thread files (.jsonl, as written by the result sink), returns the record count."""
+    number = start
+    for thread_id in range(1, files + 1):
+        with open(os.path.join(directory, f"trademark_data_thread_{thread_id}.jsonl"), 'w', encoding='utf-8') as file:
+            for _ in range(records_per_file):
+                file.write(json.dumps({
+                    "status": "Registered" if number % 3 else "Objected",
+                    "TM Application No.": str(number),
+                    "Class": str(number % 45 + 1),
+                    "TM Applied For": f"MARK {number}",
+                    "Proprietor name": "ACME & SONS PVT. LTD. 12, MG ROAD, MUMBAI",
+                }) + "\n")
+                number += 1
+    return files * records_per_file
+
+
+def journal_pdf(path: str, pages: int, numbers_per_page: int = 40, start: int = 5000000) -> int:
+    """
+    A trade marks journal lookalike: each page lists application numbers among other
+    text. Written as a bare PDF with Helvetica text so PyPDF2 can extract it. Returns
+    how many application numbers it holds.
+    """
+    objects = [
+        b"<< /Type /Catalog /Pages 2 0 R >>",
+        None,  # the page tree, once the page objects are numbered
+        b"<< /Type /Font /Subtype /Type1 /BaseFont /Helvetica >>",
+    ]
+    page_ids = []
+    number = start
+    for page in range(pages):
+        lines = [f"TRADE MARKS JOURNAL NO: 2150, 18/10/2026 Class {page % 45 + 1} Page {page + 1}"]
+        for _ in range(numbers_per_page):
+            lines.append(f"{number} 01/01/2024 ACME & SONS PVT. LTD. MUMBAI Proposed to be Used")
+            number += 1
+        text = "".join(f"({line}) Tj T* " for line in lines)
+        stream = f"BT /F1 9 Tf 11 TL 40 800 Td {text}ET".encode()
+
+        objects.append(b"<< /Length %d >>\nstream\n%s\nendstream" % (len(stream), stream))
+        content_id = len(objects)
+        objects.append(
+            b"<< /Type /Page /Parent 2 0 R /MediaBox [0 0 595 842] "
+            b"/Resources << /Font << /F1 3 0 R >> >> /Contents %d 0 R >>" % content_id
+        )
+        page_ids.append(len(objects))
+    kids = b" ".join(b"%d 0 R" % page_id for page_id in page_ids)
+    objects[1] = b"<< /Type /Pages /Kids [%s] /Count %d >>" % (kids, pages)
+
+    with open(path, 'wb') as file:
+        file.write(b"%PDF-1.4\n")
+        offsets = []
+        for object_id, body in enumerate(objects, start=1):
+            offsets.append(file.tell())
+            file.write(b"%d 0 obj\n%s\nendobj\n" % (object_id, body))
+        xref_offset = file.tell()
+        file.write(b"xref\n0 %d\n0000000000 65535 f \n" % (len(objects) + 1))
+        for offset in offsets:
+            file.write(b"%010d 00000 n \n" % offset)
+        file.write(b"trailer\n<< /Size %d /Root 1 0 R >>\nstartxref\n%d\n%%%%EOF\n" % (len(objects) + 1, xref_offset))
+    return pages * numbers_per_page
@@ -0,0 +1,211 @@
+"""
+Local stand-in for the eregister site, so scraping changes can be measured
+without touching tmrsearch.ipindia.gov.in.
+
+    python -m benchmarks.mock_ipindia --port 8765 --latency 0.05 --error-rate 0.01
+    IPINDIA_BASE_URL=http://127.0.0.1:8765/eregister python main.py
+
+It serves the captcha endpoints and the Application_View.aspx search/detail
+postbacks. Pages come from ``benchmarks.fixtures``, or are replayed from
+recorded pages (``--recorded-search``/``--recorded-detail``) with every
+occurrence of ``{appl_number}`` replaced. Latency, 503 errors, captcha expiry
+and a request rate cap can be injected.
+"""
+import argparse
+import asyncio
+import random
+import threading
+import time
+import uuid
+
+from aiohttp import web
+
+from benchmarks.fixtures import detail_page, search_page, viewstate_state
+
+SESSION_COOKIE = 'ASP.NET_SessionId'
+REJECTED_PAGE = "<html><body><script>alert('Invalid Captcha');</script></body></html>"
+
+
+class MockIpIndia:
+
+    def __init__(
+            self,
+            latency: float = 0.0,
+            jitter: float = 0.0,
+            error_rate: float = 0.0,
+            captcha_expiry: int | None = None,
+            max_rps: float | None = None,
+            chaining: bool = False,
+            viewstate_bytes: int = 30_000,
+            recorded_search: str | None = None,
+            recorded_detail: str | None = None,
+            seed: int = 0,
+    ):
+        self.latency = latency
+        self.jitter = jitter
+        self.error_rate = error_rate
+        self.captcha_expiry = captcha_expiry
+        self.max_rps = max_rps
+        self.chaining = chaining
+        self.viewstate_bytes = viewstate_bytes
+        self.recorded_search = recorded_search
+        self.recorded_detail = recorded_detail
+        self.requests = 0
+        self.injected_errors = 0
+        self.rejections = 0
+        self._rnd = random.Random(seed)
+        self._lookups = {}
+        self._recent = []
+        self._runner = None
+        self._loop = None
+        self._thread = None
+
+    def _search_page(self, appl_number: str) -> str:
+        if self.recorded_search:
+            return self.recorded_search.replace('{appl_number}', appl_number)
+        return search_page(appl_number, seed=int(appl_number) if appl_number.isdigit() else 0,
+                           viewstate_bytes=self.viewstate_bytes)
+
+    def _detail_page(self, appl_number: str) -> str:
+        if self.recorded_detail:
+            return self.recorded_detail.replace('{appl_number}', appl_number)
+        return detail_page(appl_number, seed=int(appl_number) if appl_number.isdigit() else 0,
+                           viewstate_bytes=self.viewstate_bytes)
+
+    async def _pause(self):
+        delay = self.latency + (self._rnd.uniform(-self.jitter, self.jitter) if self.jitter else 0.0)
+        if delay > 0:
+            await asyncio.sleep(delay)
+
+    def _overloaded(self) -> bool:
+        self.requests += 1
+        if self.max_rps:
+            now = time.monotonic()
+            self._recent = [at for at in self._recent if now - at < 1.0]
+            self._recent.append(now)
+            if len(self._recent) > self.max_rps:
+                return True
+        return self._rnd.random() < self.error_rate
+
+    async def _captcha_image(self, request):
+        await self._pause()
+        response = web.Response(body=b'GIF89a', content_type='image/gif')
+        if SESSION_COOKIE not in request.cookies:
+            response.set_cookie(SESSION_COOKIE, uuid.uuid4().hex)
+        return response
+
+    async def _get_captcha(self, request):
+        await self._pause()
+        self._lookups.pop(request.cookies.get(SESSION_COOKIE), None)
+        return web.json_response({'d': 'ABCDE'})
+
+    async def _view_get(self, request):
+        await self._pause()
+        return web.Response(text=self._search_page(''), content_type='text/html')
+
+    async def _view_post(self, request):
+        await self._pause()
+        if self._overloaded():
+            self.injected_errors += 1
+            return web.Response(status=503, text='Service Unavailable')
+
+        form = await request.post()
+        appl_number = form.get('applNumber', '')
+        session_id = request.cookies.get(SESSION_COOKIE)
+
+        if not form.get('__EVENTTARGET'):
+            # a search consumes the session's captcha, like the real site after a while
+            self._lookups[session_id] = self._lookups.get(session_id, 0) + 1
+            if self.captcha_expiry and self._lookups[session_id] > self.captcha_expiry:
+                self.rejections += 1
+                return web.Response(text=REJECTED_PAGE, content_type='text/html')
+            return web.Response(text=self._search_page(appl_number), content_type='text/html')
+
+        # detail postback: the number comes from the search page's viewstate, or from
+        # the form when chaining is allowed and the viewstate is a previous detail page
+        state = viewstate_state(form.get('__VIEWSTATE', '')) or ''
+        kind, _, state_number = state.partition(':')
+        if kind == 'detail' and self.chaining and appl_number:
+            state_number = appl_number
+        if not state_number:
+            # a postback without a usable viewstate lands back on an empty search
+            return web.Response(text=self._search_page(''), content_type='text/html')
+        return web.Response(text=self._detail_page(state_number), content_type='text/html')
+
+    def app(self) -> web.Application:
+        app = web.Application()
+        app.router.add_get('/eregister/captcha.ashx', self._captcha_image)
+        app.router.add_get('/eregister/Application_View.aspx', self._view_get)
+        app.router.add_post('/eregister/Application_View.aspx', self._view_post)
+        app.router.add_post('/eregister/Viewdetails_Copyright.aspx/GetCaptcha', self._get_captcha)
+        return app
+
+    def start(self, port: int = 0) -> str:
+        """Serve from a background thread, returns the base URL to point IPINDIA_BASE_URL at."""
+        started = threading.Event()
+        address = {}
+
+        def serve():
+            self._loop = asyncio.new_event_loop()
+            asyncio.set_event_loop(self._loop)
+            self._runner = web.AppRunner(self.app(), access_log=None)
+            self._loop.run_until_complete(self._runner.setup())
+            site = web.TCPSite(self._runner, '127.0.0.1', port)
+            self._loop.run_until_complete(site.start())
+            address['port'] = self._runner.addresses[0][1]
+            started.set()
+            self._loop.run_forever()
+
+        self._thread = threading.Thread(target=serve, name='mock-ipindia', daemon=True)
+        self._thread.start()
+        started.wait()
+        return f"http://127.0.0.1:{address['port']}/eregister"
+
+    def stop(self):
+        if self._loop is None:
+            return
+        asyncio.run_coroutine_threadsafe(self._runner.cleanup(), self._loop).result()
+        self._loop.call_soon_threadsafe(self._loop.stop)
+        self._thread.join()
+        self._loop.close()
+        self._loop = None
+
+    def stats(self) -> dict:
+        return {'requests': self.requests, 'injected_errors': self.injected_errors, 'rejections': self.rejections}
+
+
+def _read(path: str | None) -> str | None:
+    if path is None:
+        return None
+    with open(path, 'r', encoding='utf-8') as file:
+        return file.read()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--port", type=int, default=8765)
+    parser.add_argument("--latency", type=float, default=0.0, help="seconds added to every response")
+    parser.add_argument("--jitter", type=float, default=0.0, help="uniform +/- seconds around the latency")
+    parser.add_argument("--error-rate", type=float, default=0.0, help="share of postbacks answered with 503")
+    parser.add_argument("--captcha-expiry", type=int, default=None, help="searches before a captcha is rejected")
+    parser.add_argument("--max-rps", type=float, default=None, help="postbacks per second before answering 503")
+    parser.add_argument("--chaining", action="store_true", help="accept detail postbacks from a detail page")
+    parser.add_argument("--recorded-search", help="recorded search page, {appl_number} is substituted")
+    parser.add_argument("--recorded-detail", help="recorded detail page, {appl_number} is substituted")
+    args = parser.parse_args()
+
+    server = MockIpIndia(
+        latency=args.latency,
+        jitter=args.jitter,
+        error_rate=args.error_rate,
+        captcha_expiry=args.captcha_expiry,
+        max_rps=args.max_rps,
+        chaining=args.chaining,
+        recorded_search=_read(args.recorded_search),
+        recorded_detail=_read(args.recorded_detail),
+    )
+    web.run_app(server.app(), host='127.0.0.1', port=args.port)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,52 @@
+"""
+Compare the lxml and BeautifulSoup backends of ``trademark.data_parser`` on
+synthetic Application_View.aspx pages: both must return identical dicts, and
+the run reports the time per page of each.
+
+    python -m benchmarks.parser_backends --pages 200
+"""
+import argparse
+import json
+import time
+
+from benchmarks.fixtures import detail_page
+from trademark.data_parser import BS4_BACKEND, LXML_BACKEND, parse_application_data, parse_payload
+
+
+def _time_per_page(parse, pages: list, backend: str) -> float:
+    start = time.perf_counter()
+    for page in pages:
+        parse(page, backend=backend)
+    return (time.perf_counter() - start) / len(pages)
+
+
+def run(page_count: int) -> dict:
+    pages = [detail_page(str(1000000 + i), seed=i) for i in range(page_count)]
+
+    mismatches = sum(
+        parse_application_data(page, backend=LXML_BACKEND) != parse_application_data(page, backend=BS4_BACKEND)
+        or parse_payload(page, backend=LXML_BACKEND) != parse_payload(page, backend=BS4_BACKEND)
+        for page in pages
+    )
+
+    results = {"benchmark": "parser_backends", "pages": page_count, "mismatches": mismatches}
+    for name, parse in (("parse_application_data", parse_application_data), ("parse_payload", parse_payload)):
+        bs4_seconds = _time_per_page(parse, pages, BS4_BACKEND)
+        lxml_seconds = _time_per_page(parse, pages, LXML_BACKEND)
+        results[name] = {
+            "bs4_ms_per_page": round(bs4_seconds * 1000, 3),
+            "lxml_ms_per_page": round(lxml_seconds * 1000, 3),
+            "speedup": round(bs4_seconds / lxml_seconds, 1),
+        }
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--pages", type=int, default=200)
+    args = parser.parse_args()
+    print(json.dumps(run(args.pages), indent=2))
+
+
+if __name__ == "__main__":
+    main()
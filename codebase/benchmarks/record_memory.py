@@ -0,0 +1,127 @@
+"""
+Per-record memory footprint of the trademark representations: a pandas sheet
+and the tuples built from it with iterrows, against doc_utils.records; and
+scraped records with and without interned labels.
+
+    python -m benchmarks.record_memory --size 100000 --pages 2000
+
+Sizes are the bytes still allocated once a representation is built (and the
+peak while loading), measured with tracemalloc and divided by the number of
+records. Load times are measured separately, tracemalloc slows allocation down.
+"""
+import argparse
+import gc
+import json
+import os
+import tempfile
+import time
+import tracemalloc
+
+import pandas as pd
+
+from benchmarks.fixtures import detail_page, trademark_sheet
+from doc_utils.records import read_trademark_columns
+from trademark import data_parser
+
+
+def _retained(build) -> tuple:
+    """(value, bytes still allocated after building it, peak bytes while building it)"""
+    gc.collect()
+    tracemalloc.start()
+    before = tracemalloc.get_traced_memory()[0]
+    value = build()
+    gc.collect()
+    current, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return value, current - before, peak - before
+
+
+def _timed(build) -> tuple:
+    start = time.perf_counter()
+    value = build()
+    return value, time.perf_counter() - start
+
+
+def _iterrows_records(frame: pd.DataFrame) -> list:
+    # how extract_similar_tm held the user sheet before doc_utils.records
+    return [
+        (row['TM Application No.'], row['TM Applied For'], row['Class'])
+        for _, row in frame.iterrows()
+        if isinstance(row['TM Applied For'], str)
+    ]
+
+
+def _sheet_results(size: int) -> dict:
+    with tempfile.TemporaryDirectory(prefix='webxela-bench-') as directory:
+        path = os.path.join(directory, 'sheet.xlsx')
+        trademark_sheet(size, seed=1).to_excel(path, index=False)
+
+        frame, pandas_seconds = _timed(lambda: pd.read_excel(path))
+        _, columns_seconds = _timed(lambda: read_trademark_columns(path))
+        _, iterrows_seconds = _timed(lambda: _iterrows_records(frame))
+
+        _, frame_bytes, frame_peak = _retained(lambda: pd.read_excel(path))
+        _, tuple_bytes, _ = _retained(lambda: _iterrows_records(frame))
+        _, columns_bytes, columns_peak = _retained(lambda: read_trademark_columns(path))
+
+    return {
+        'rows': size,
+        # before: the sheet read with pandas, then a tuple per row built with iterrows
+        'pandas_sheet': {
+            'load_seconds': round(pandas_seconds, 3),
+            'bytes_per_record': round(frame_bytes / size, 1),
+            'peak_bytes_per_record': round(frame_peak / size, 1),
+        },
+        'iterrows_tuples': {
+            'build_seconds': round(iterrows_seconds, 3),
+            'bytes_per_record': round(tuple_bytes / size, 1),
+        },
+        # after: read straight into columns
+        'trademark_columns': {
+            'load_seconds': round(columns_seconds, 3),
+            'bytes_per_record': round(columns_bytes / size, 1),
+            'peak_bytes_per_record': round(columns_peak / size, 1),
+        },
+    }
+
+
+def _scraped_results(page_count: int) -> dict:
+    pages = [detail_page(str(1000000 + i), seed=i) for i in range(page_count)]
+
+    def parse_all() -> list:
+        return [data_parser.parse_application_data(page) for page in pages]
+
+    interned, interned_bytes, _ = _retained(parse_all)
+    intern_label = data_parser.intern_label
+    data_parser.intern_label = lambda value: value
+    try:
+        plain, plain_bytes, _ = _retained(parse_all)
+    finally:
+        data_parser.intern_label = intern_label
+
+    return {
+        'records': page_count,
+        'identical': interned == plain,
+        'plain_labels_bytes_per_record': round(plain_bytes / page_count, 1),
+        'interned_labels_bytes_per_record': round(interned_bytes / page_count, 1),
+    }
+
+
+def run(size: int, page_count: int) -> dict:
+    return {
+        'benchmark': 'record_memory',
+        'sheet': _sheet_results(size),
+        'scraped': _scraped_results(page_count),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--size", type=int, default=100_000, help="rows of the synthetic trademark sheet")
+    parser.add_argument("--pages", type=int, default=2000, help="detail pages to parse into scraped records")
+    args = parser.parse_args()
+    print(json.dumps(run(args.size, args.pages), indent=2))
+
+
+if __name__ == "__main__":
+    main()
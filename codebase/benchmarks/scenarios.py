@@ -0,0 +1,383 @@
+"""
+End-to-end benchmark scenarios on synthetic data and a local mock eregister
+site, reported as JSON so results of two versions can be diffed.
+
+    python -m benchmarks.scenarios --output bench.json
+    python -m benchmarks.scenarios --scenarios scrape_threads,similar --numbers 2000 --latency 0.05
+
+Every scenario runs in a scratch directory laid out like the repo's data/
+folder, so nothing under data/ is touched.
+"""
+import argparse
+import json
+import logging
+import os
+import platform
+import shutil
+import subprocess
+import tempfile
+import time
+from contextlib import contextmanager
+
+from benchmarks.fixtures import (
+    DEFAULT_CLASS_WEIGHTS,
+    journal_pdf,
+    parse_class_weights,
+    trademark_sheet,
+    write_thread_files,
+)
+from benchmarks.mock_ipindia import MockIpIndia
+
+SCRAPE_SCENARIOS = ('scrape_threads', 'scrape_async')
+SCENARIOS = SCRAPE_SCENARIOS + ('similar', 'similarity_service', 'combine', 'extract_pdf', 'extract_excel')
+
+APPLICATION_NUMBERS_FILE = 'data/application_num/application_numbers.txt'
+STORE_FILE = 'data/extracted/trademarks.sqlite'
+
+
+@contextmanager
+def _workspace():
+    cwd = os.getcwd()
+    directory = tempfile.mkdtemp(prefix='webxela-bench-')
+    os.makedirs(os.path.join(directory, 'data/extracted'))
+    os.makedirs(os.path.join(directory, 'data/application_num'))
+    os.chdir(directory)
+    try:
+        yield directory
+    finally:
+        os.chdir(cwd)
+        shutil.rmtree(directory, ignore_errors=True)
+
+
+def _timed(function, *args, **kwargs) -> float:
+    start = time.perf_counter()
+    function(*args, **kwargs)
+    return time.perf_counter() - start
+
+
+def _write_numbers(count: int, start: int = 1000001):
+    with open(APPLICATION_NUMBERS_FILE, 'w') as file:
+        for number in range(start, start + count):
+            file.write(f"{number}\n")
+
+
+def _stored_records() -> int:
+    from doc_utils.trademark_store import TrademarkStore
+
+    if not os.path.exists(STORE_FILE):
+        return 0
+    with TrademarkStore(STORE_FILE) as store:
+        return len(store)
+
+
+def _percentile_ms(sorted_seconds: list, fraction: float) -> float:
+    return round(sorted_seconds[min(int(len(sorted_seconds) * fraction), len(sorted_seconds) - 1)] * 1000, 3)
+
+
+def _scrape_result(seconds: float, numbers: int, server: MockIpIndia, requests_before: int) -> dict:
+    from doc_utils.metrics import METRICS
+
+    report = METRICS.report()
+    stored = _stored_records()
+    return {
+        'numbers': numbers,
+        'stored': stored,
+        'seconds': round(seconds, 3),
+        'numbers_per_s': round(stored / seconds, 2) if seconds else 0.0,
+        'server_requests': server.requests - requests_before,
+        'errors': report['errors'],
+        'max_in_flight': report['max_in_flight'],
+        'stages': report['stages'],
+    }
+
+
+def scrape_threads(args, server: MockIpIndia) -> dict:
+    from trademark.webxela_automator import automate_webxela
+
+    with _workspace():
+        _write_numbers(args.numbers)
+        requests_before = server.requests
+        seconds = _timed(automate_webxela, args.workers)
+        return _scrape_result(seconds, args.numbers, server, requests_before)
+
+
+def scrape_async(args, server: MockIpIndia) -> dict:
+    import asyncio
+
+    from trademark.async_automator import automate_webxela_async
+
+    with _workspace():
+        _write_numbers(args.numbers)
+        requests_before = server.requests
+        seconds = _timed(asyncio.run, automate_webxela_async(args.workers, base_url=args.base_url))
+        return _scrape_result(seconds, args.numbers, server, requests_before)
+
+
+def similar(args, server=None) -> dict:
+    import pandas as pd
+
+    from fuzzer.similar_tm_extractor import extract_similar_tm
+
+    with _workspace():
+        trademark_sheet(args.user_size, seed=1, start=5000000, class_weights=args.class_weights) \
+            .to_excel('user.xlsx', index=False)
+        trademark_sheet(args.corpus_size, seed=2, start=1000000, class_weights=args.class_weights) \
+            .to_excel('corpus.xlsx', index=False)
+
+        seconds = _timed(
+            extract_similar_tm,
+            user_sheet='user.xlsx',
+            trademark_sheet='corpus.xlsx',
+            output_sheet='data/extracted/sim.xlsx',
+            workers=args.workers,
+        )
+        matched = pd.read_excel('data/extracted/sim.xlsx')
+
+        from doc_utils.trademark_store import TrademarkStore
+        from fuzzer.fingerprint_index import update_fingerprint_index
+
+        # the corpus as option 5 sees it: in the store, with a fingerprint index next to it
+        with TrademarkStore(STORE_FILE) as store:
+            store.upsert(pd.read_excel('corpus.xlsx').to_dict('records'))
+            store.commit()
+        index_build_seconds = _timed(update_fingerprint_index, STORE_FILE, 'data/extracted/fingerprints.sqlite',
+                                     workers=args.workers)
+        indexed_seconds = _timed(
+            extract_similar_tm,
+            user_sheet='user.xlsx',
+            trademark_sheet=STORE_FILE,
+            output_sheet='data/extracted/sim_indexed.xlsx',
+            workers=args.workers,
+            fingerprint_index='data/extracted/fingerprints.sqlite',
+        )
+        ranked_seconds = _timed(
+            extract_similar_tm,
+            user_sheet='user.xlsx',
+            trademark_sheet=STORE_FILE,
+            output_sheet='data/extracted/sim_ranked.csv',
+            workers=args.workers,
+            fingerprint_index='data/extracted/fingerprints.sqlite',
+            top_k=args.top_k,
+        )
+        return {
+            'user_rows': args.user_size,
+            'corpus_rows': args.corpus_size,
+            'workers': args.workers,
+            'seconds': round(seconds, 3),
+            'corpus_rows_per_s': round(args.corpus_size / seconds, 1) if seconds else 0.0,
+            'rows_with_matches': len(matched),
+            'matches': int(matched.iloc[:, 1:].notna().sum().sum()) if len(matched) else 0,
+            'fingerprint_index_build_seconds': round(index_build_seconds, 3),
+            'indexed_seconds': round(indexed_seconds, 3),
+            'indexed_output_identical': matched.equals(pd.read_excel('data/extracted/sim_indexed.xlsx')),
+            'top_k': args.top_k,
+            'ranked_seconds': round(ranked_seconds, 3),
+            'ranked_rows': len(pd.read_csv('data/extracted/sim_ranked.csv')),
+        }
+
+
+def similarity_service(args, server=None) -> dict:
+    from doc_utils.trademark_store import TrademarkStore
+    from fuzzer.similarity_service import SimilarityService
+
+    with _workspace():
+        user = trademark_sheet(args.user_size, seed=1, start=5000000, class_weights=args.class_weights)
+        with TrademarkStore(STORE_FILE) as store:
+            store.upsert(trademark_sheet(args.corpus_size, seed=2, start=1000000,
+                                         class_weights=args.class_weights).to_dict('records'))
+            store.commit()
+
+        started = time.perf_counter()
+        service = SimilarityService(STORE_FILE).load()
+        load_seconds = time.perf_counter() - started
+
+        latencies = []
+        matches = 0
+        for trademark, tm_class in zip(user['TM Applied For'], user['Class']):
+            started = time.perf_counter()
+            matches += len(service.query(trademark, tm_class))
+            latencies.append(time.perf_counter() - started)
+        service.close()
+
+        latencies.sort()
+        return {
+            'corpus_rows': args.corpus_size,
+            'queries': len(latencies),
+            'load_seconds': round(load_seconds, 3),
+            'matches': matches,
+            'p50_ms': _percentile_ms(latencies, 0.50),
+            'p99_ms': _percentile_ms(latencies, 0.99),
+            'max_ms': round(latencies[-1] * 1000, 3),
+        }
+
+
+def combine(args, server=None) -> dict:
+    import pandas as pd
+
+    from doc_utils.spreadsheet_utils import combine_excel_files
+
+    with _workspace():
+        legacy = trademark_sheet(args.legacy_rows, seed=3, start=1000000)
+        legacy.insert(0, 'status', 'Registered')
+        legacy.to_excel('data/extracted/combined_trademark_data.xlsx', index=False)
+
+        # the first run imports the legacy workbook, half the thread records re-scrape it
+        records = write_thread_files('data/extracted', args.thread_files, args.records_per_file,
+                                     start=1000000 + args.legacy_rows // 2)
+        first_seconds = _timed(combine_excel_files)
+
+        incremental = write_thread_files('data/extracted', 1, args.records_per_file,
+                                         start=2000000)
+        incremental_seconds = _timed(combine_excel_files)
+
+        export_seconds = _timed(combine_excel_files, export_xlsx=True)
+        return {
+            'legacy_rows': args.legacy_rows,
+            'thread_records': records,
+            'first_combine_seconds': round(first_seconds, 3),
+            'incremental_records': incremental,
+            'incremental_combine_seconds': round(incremental_seconds, 3),
+            'export_seconds': round(export_seconds, 3),
+            'stored': _stored_records(),
+            'exported_rows': len(pd.read_excel('data/extracted/combined_trademark_data.xlsx')),
+        }
+
+
+def extract_pdf(args, server=None) -> dict:
+    from doc_utils.pdf_utils import extract_pdf as extract
+
+    with _workspace():
+        numbers = journal_pdf('journal.pdf', args.pdf_pages)
+        seconds = _timed(extract, 'journal.pdf', workers=args.workers)
+        with open(APPLICATION_NUMBERS_FILE) as file:
+            extracted = sum(1 for line in file if line.strip())
+        return {
+            'pages': args.pdf_pages,
+            'workers': args.workers,
+            'numbers_in_pdf': numbers,
+            'numbers_extracted': extracted,
+            'seconds': round(seconds, 3),
+            'pages_per_s': round(args.pdf_pages / seconds, 1) if seconds else 0.0,
+        }
+
+
+def extract_excel(args, server=None) -> dict:
+    from openpyxl import Workbook
+
+    from doc_utils.spreadsheet_utils import EXCEL_ENGINES, default_excel_engine, extract_excel as extract
+
+    with _workspace():
+        workbook = Workbook(write_only=True)
+        sheet = workbook.create_sheet()
+        sheet.append(['Application No.', 'Proprietor name', 'Class'])
+        for i in range(args.excel_rows):
+            # every 20th row repeats an earlier number as text, like merged client exports
+            number = str(5000000 + i // 2) if i % 20 == 0 else 5000000 + i
+            sheet.append([number, 'ACME & SONS PVT. LTD. MUMBAI', i % 45 + 1])
+        workbook.save('numbers.xlsx')
+
+        results = {'rows': args.excel_rows}
+        engines = [default_excel_engine()] if args.excel_engine == 'default' else \
+            list(EXCEL_ENGINES) if args.excel_engine == 'all' else [args.excel_engine]
+        for engine in engines:
+            seconds = _timed(extract, 'numbers.xlsx', engine=engine)
+            with open(APPLICATION_NUMBERS_FILE) as file:
+                extracted = sum(1 for line in file if line.strip())
+            results[engine] = {
+                'numbers_extracted': extracted,
+                'seconds': round(seconds, 3),
+                'rows_per_s': round(args.excel_rows / seconds, 1) if seconds else 0.0,
+            }
+        return results
+
+
+def _commit() -> str | None:
+    try:
+        return subprocess.run(
+            ['git', 'rev-parse', '--short', 'HEAD'], capture_output=True, text=True, check=True,
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def run(args) -> dict:
+    selected = args.scenarios
+    server = None
+    if any(name in SCRAPE_SCENARIOS for name in selected):
+        server = MockIpIndia(
+            latency=args.latency,
+            jitter=args.jitter,
+            error_rate=args.error_rate,
+            captcha_expiry=args.captcha_expiry,
+            max_rps=args.max_rps,
+        )
+        args.base_url = server.start()
+        # read by trademark.constants at import, scenarios import the scraper lazily
+        os.environ['IPINDIA_BASE_URL'] = args.base_url
+
+    results = {}
+    try:
+        for name in selected:
+            logging.warning(f"Running scenario {name}...")
+            results[name] = globals()[name](args, server)
+    finally:
+        if server is not None:
+            results['mock_server'] = server.stats()
+            server.stop()
+
+    parameters = {key: value for key, value in vars(args).items() if key not in ('output', 'verbose', 'base_url')}
+    return {
+        'suite': 'scenarios',
+        'commit': _commit(),
+        'python': platform.python_version(),
+        'parameters': parameters,
+        'results': results,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--scenarios", type=lambda value: value.split(','), default=list(SCENARIOS),
+                        help=f"comma separated, any of {','.join(SCENARIOS)}")
+    parser.add_argument("--workers", type=int, default=8)
+    parser.add_argument("--numbers", type=int, default=500, help="application numbers to scrape")
+    parser.add_argument("--latency", type=float, default=0.02)
+    parser.add_argument("--jitter", type=float, default=0.01)
+    parser.add_argument("--error-rate", type=float, default=0.0)
+    parser.add_argument("--captcha-expiry", type=int, default=50)
+    parser.add_argument("--max-rps", type=float, default=None)
+    parser.add_argument("--user-size", type=int, default=2000)
+    parser.add_argument("--corpus-size", type=int, default=2000)
+    parser.add_argument("--top-k", type=int, default=10, help="matches kept per trademark by the ranked run")
+    parser.add_argument("--class-weights", type=parse_class_weights, default=DEFAULT_CLASS_WEIGHTS,
+                        help="class:weight pairs for the synthetic sheets, e.g. 5:4,9:3,30:3")
+    parser.add_argument("--legacy-rows", type=int, default=20_000)
+    parser.add_argument("--thread-files", type=int, default=8)
+    parser.add_argument("--records-per-file", type=int, default=500)
+    parser.add_argument("--pdf-pages", type=int, default=200)
+    parser.add_argument("--excel-rows", type=int, default=50_000)
+    parser.add_argument("--excel-engine", default="default", help="openpyxl, calamine, all or default")
+    parser.add_argument("--output", help="write the JSON report here instead of stdout")
+    parser.add_argument("--verbose", action="store_true", help="keep the scraper's INFO logging")
+    args = parser.parse_args()
+
+    unknown = set(args.scenarios) - set(SCENARIOS)
+    if unknown:
+        parser.error(f"unknown scenario(s): {', '.join(sorted(unknown))}")
+
+    # configured before the repo modules call basicConfig, which is then a no-op
+    logging.basicConfig(
+        level=logging.INFO if args.verbose else logging.WARNING,
+        format='%(asctime)s - %(levelname)s - %(message)s',
+    )
+
+    report = json.dumps(run(args), indent=2)
+    if args.output:
+        with open(args.output, 'w', encoding='utf-8') as file:
+            file.write(report + '\n')
+    else:
+        print(report)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,65 @@
+"""
+Time ``extract_similar_tm`` with the pairwise fuzzywuzzy scoring backend and
+with the batch rapidfuzz ``cdist`` backend on the same synthetic sheets, and
+check that both write the same matches.
+
+    python -m benchmarks.similarity_scoring --size 10000
+"""
+import argparse
+import json
+import os
+import tempfile
+import time
+
+import pandas as pd
+
+from benchmarks.fixtures import trademark_sheet
+from fuzzer.similar_tm_extractor import BATCH_SCORING, PAIRWISE_SCORING, extract_similar_tm
+
+
+def _timed_extract(directory: str, scoring: str, workers: int) -> tuple[float, pd.DataFrame]:
+    output_sheet = os.path.join(directory, f'sim_{scoring}.xlsx')
+    start = time.perf_counter()
+    extract_similar_tm(
+        user_sheet=os.path.join(directory, 'user.xlsx'),
+        trademark_sheet=os.path.join(directory, 'corpus.xlsx'),
+        output_sheet=output_sheet,
+        workers=workers,
+        scoring=scoring,
+    )
+    seconds = time.perf_counter() - start
+    return seconds, pd.read_excel(output_sheet)
+
+
+def run(size: int, workers: int = 1) -> dict:
+    with tempfile.TemporaryDirectory(prefix='webxela-bench-') as directory:
+        trademark_sheet(size, seed=1, start=5000000).to_excel(os.path.join(directory, 'user.xlsx'), index=False)
+        trademark_sheet(size, seed=2, start=1000000).to_excel(os.path.join(directory, 'corpus.xlsx'), index=False)
+
+        pairwise_seconds, pairwise = _timed_extract(directory, PAIRWISE_SCORING, workers)
+        batch_seconds, batch = _timed_extract(directory, BATCH_SCORING, workers)
+
+    assert pairwise.equals(batch), "pairwise and batch scoring wrote different matches"
+    return {
+        "benchmark": "similarity_scoring",
+        "user_rows": size,
+        "corpus_rows": size,
+        "workers": workers,
+        "pairwise_seconds": round(pairwise_seconds, 3),
+        "batch_seconds": round(batch_seconds, 3),
+        "speedup": round(pairwise_seconds / batch_seconds, 1) if batch_seconds else 0.0,
+        "rows_with_matches": len(batch),
+        "matches": int(batch.iloc[:, 1:].notna().sum().sum()) if len(batch) else 0,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--size", type=int, default=10_000)
+    parser.add_argument("--workers", type=int, default=1)
+    args = parser.parse_args()
+    print(json.dumps(run(args.size, args.workers), indent=2))
+
+
+if __name__ == "__main__":
+    main()
@@ -1,32 +1,110 @@
+import json
+import threading
 
-def read_last_application_id(progress_file):
+PROGRESS_FILE = "data/application_num/progress"
+FIRST_APPLICATION_ID = 1000000
+
+# ranges of one run share the progress file
+_progress_lock = threading.Lock()
+
+
+def read_progress(progress_file: str = PROGRESS_FILE) -> dict:
+    """
+    ``{"last_id": ..., "ranges": [{"start", "stop", "step", "next"}, ...]}``. Older
+    progress files only hold the last generated id, they are read as a state
+    without ranges.
+    """
     try:
         with open(progress_file, 'r') as file:
-            last_id = int(file.read().strip())
+            content = file.read().strip()
     except FileNotFoundError:
-        last_id = 1000000
-    return last_id
+        return {"last_id": FIRST_APPLICATION_ID, "ranges": []}
 
+    if content.isdigit():
+        return {"last_id": int(content), "ranges": []}
+    progress = json.loads(content)
+    progress.setdefault("ranges", [])
+    return progress
 
-def write_last_application_id(progress_file, last_id):
+
+def write_progress(progress: dict, progress_file: str = PROGRESS_FILE):
     with open(progress_file, 'w') as file:
-        file.write(str(last_id))
+        json.dump(progress, file, indent=1)
+
+
+def read_last_application_id(progress_file):
+    return read_progress(progress_file)["last_id"]
+
+
+def write_last_application_id(progress_file, last_id):
+    progress = read_progress(progress_file)
+    progress["last_id"] = last_id
+    write_progress(progress, progress_file)
+
+
+def pending_ranges(progress_file: str = PROGRESS_FILE) -> list:
+    """Generated ranges that were not scraped to the end yet."""
+    return [r for r in read_progress(progress_file)["ranges"] if r["next"] < r["stop"]]
+
 
+class RangeProgress:
+    """
+    Tracks which numbers of a generated range are scraped. Numbers finish out of
+    order, so ``next`` only moves past a number once everything before it is
+    done. Only ``save`` writes the progress file, the scraper calls it once the
+    records are in the trademark store, so a failed run is repeated rather than
+    skipped.
+    """
 
-def application_number_gen(amount: int):
+    def __init__(self, start: int, stop: int, step: int = 1, progress_file: str = PROGRESS_FILE):
+        self.start = start
+        self.stop = stop
+        self.step = step
+        self.progress_file = progress_file
+        self.next = start
+        for saved in read_progress(progress_file)["ranges"]:
+            if (saved["start"], saved["stop"], saved["step"]) == (start, stop, step):
+                self.next = saved["next"]
+        self._done_ahead = set()
 
-    progress_file = "data/application_num/progress"
-    output_file = "data/application_num/application_numbers.txt"
+    def mark_done(self, number: int):
+        with _progress_lock:
+            if number < self.next or number >= self.stop or (number - self.start) % self.step:
+                return
+            self._done_ahead.add(number)
+            while self.next in self._done_ahead:
+                self._done_ahead.remove(self.next)
+                self.next += self.step
 
-    last_id = read_last_application_id(progress_file)
+    def save(self):
+        with _progress_lock:
+            progress = read_progress(self.progress_file)
+            entry = {"start": self.start, "stop": self.stop, "step": self.step, "next": min(self.next, self.stop)}
+            ranges = progress["ranges"]
+            for i, saved in enumerate(ranges):
+                if (saved["start"], saved["stop"], saved["step"]) == (self.start, self.stop, self.step):
+                    ranges[i] = entry
+                    break
+            else:
+                ranges.append(entry)
+            write_progress(progress, self.progress_file)
 
-    with open(output_file, 'w') as file:
-        for i in range(amount):
-            new_id = last_id + (i + 1)
-            file.write(f"{new_id}\n")
 
-    write_last_application_id(progress_file, new_id)
+def application_number_gen(amount: int, step: int = 1, progress_file: str = PROGRESS_FILE) -> dict:
+    """
+    Reserve the next ``amount`` application numbers, ``step`` apart, as a range in
+    the progress file. The numbers are not written out, the scraper iterates the
+    range directly (see doc_utils.work_source.NumberRange).
+    """
+    progress = read_progress(progress_file)
+    start = progress["last_id"] + 1
+    stop = start + amount * step
+    new_range = {"start": start, "stop": stop, "step": step, "next": start}
 
-    print(f"{amount} application numbers generated and written to {output_file}")
-    print(f"Last generated Application ID updated to {new_id} in {progress_file}")
+    progress["last_id"] = stop - step
+    progress["ranges"].append(new_range)
+    write_progress(progress, progress_file)
 
+    print(f"{amount} application numbers reserved: {start} to {stop - step}" + (f", every {step}" if step > 1 else ""))
+    print(f"Last generated Application ID updated to {progress['last_id']} in {progress_file}")
+    return new_range
@@ -0,0 +1,187 @@
+import bisect
+import json
+import logging
+import os
+import threading
+import time
+from contextlib import contextmanager
+
+# per-request INFO lines ("Trademark Data Request was successful!", captchas...) are opt-in
+REQUEST_LOG = logging.getLogger('webxela.requests')
+REQUEST_LOG.setLevel(logging.INFO if os.environ.get('WEBXELA_LOG_REQUESTS') else logging.WARNING)
+
+DEFAULT_REPORT_PATH = 'data/extracted/scrape_metrics.json'
+
+# histogram bucket upper bounds in seconds, sqrt(2) apart from 0.1 ms to ~100 s
+_BUCKET_BOUNDS = [0.0001 * 2 ** (i / 2) for i in range(41)]
+
+
+def _format_duration(seconds: float) -> str:
+    minutes, seconds = divmod(int(seconds), 60)
+    hours, minutes = divmod(minutes, 60)
+    return f"{hours}h{minutes:02d}m{seconds:02d}s" if hours else f"{minutes}m{seconds:02d}s"
+
+
+class Histogram:
+    """Fixed log-scale buckets, percentiles are read at bucket resolution (about ±20%)."""
+
+    def __init__(self):
+        self.counts = [0] * (len(_BUCKET_BOUNDS) + 1)
+        self.count = 0
+        self.total = 0.0
+        self.max = 0.0
+
+    def add(self, seconds: float):
+        self.counts[bisect.bisect_left(_BUCKET_BOUNDS, seconds)] += 1
+        self.count += 1
+        self.total += seconds
+        if seconds > self.max:
+            self.max = seconds
+
+    def percentile(self, fraction: float) -> float:
+        rank = fraction * self.count
+        seen = 0
+        for bucket, count in enumerate(self.counts):
+            seen += count
+            if seen >= rank and count:
+                return min(_BUCKET_BOUNDS[bucket], self.max) if bucket < len(_BUCKET_BOUNDS) else self.max
+        return 0.0
+
+    def summary(self) -> dict:
+        return {
+            'count': self.count,
+            'mean_ms': round(self.total / self.count * 1000, 3) if self.count else 0.0,
+            'p50_ms': round(self.percentile(0.5) * 1000, 3),
+            'p90_ms': round(self.percentile(0.9) * 1000, 3),
+            'p99_ms': round(self.percentile(0.99) * 1000, 3),
+            'max_ms': round(self.max * 1000, 3),
+            'total_s': round(self.total, 3),
+        }
+
+
+class Metrics:
+    """
+    Run-wide scrape instrumentation: a timing histogram per stage (network,
+    parse_payload, parse_application_data, save, ...), error counts by kind,
+    in-flight requests and completed application numbers. Recording is a
+    perf_counter call and a short lock, cheap next to any HTTP round trip.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.reset()
+
+    def reset(self, total: int | None = None):
+        with self._lock:
+            self.total = total
+            self.started_at = time.monotonic()
+            self.completed = 0
+            self.skipped = 0
+            self.in_flight = 0
+            self.max_in_flight = 0
+            self.errors = {}
+            self.stages = {}
+
+    def record(self, stage: str, seconds: float):
+        with self._lock:
+            histogram = self.stages.get(stage)
+            if histogram is None:
+                histogram = self.stages[stage] = Histogram()
+            histogram.add(seconds)
+
+    @contextmanager
+    def stage(self, name: str):
+        started = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.record(name, time.perf_counter() - started)
+
+    @contextmanager
+    def in_flight_request(self):
+        with self._lock:
+            self.in_flight += 1
+            self.max_in_flight = max(self.max_in_flight, self.in_flight)
+        try:
+            yield
+        finally:
+            with self._lock:
+                self.in_flight -= 1
+
+    def count_error(self, kind: str):
+        with self._lock:
+            self.errors[kind] = self.errors.get(kind, 0) + 1
+
+    def complete(self, count: int = 1):
+        with self._lock:
+            self.completed += count
+
+    def skip(self, count: int = 1):
+        """Numbers taken off the run without a request, e.g. already scraped ones."""
+        with self._lock:
+            self.skipped += count
+            if self.total is not None:
+                self.total -= count
+
+    def progress_line(self) -> str:
+        with self._lock:
+            elapsed = time.monotonic() - self.started_at
+            rate = self.completed / elapsed if elapsed else 0.0
+            line = f"{self.completed}"
+            if self.total:
+                line += f"/{self.total} ({self.completed / self.total:.1%})"
+                if rate:
+                    line += f", ETA {_format_duration((self.total - self.completed) / rate)}"
+            line += f", {rate:.2f} numbers/s, {self.in_flight} in flight"
+            if self.errors:
+                line += f", errors {self.errors}"
+            return line
+
+    def report(self) -> dict:
+        with self._lock:
+            elapsed = time.monotonic() - self.started_at
+            network = self.stages.get('network')
+            return {
+                'elapsed_s': round(elapsed, 3),
+                'total': self.total,
+                'completed': self.completed,
+                'skipped': self.skipped,
+                'numbers_per_s': round(self.completed / elapsed, 3) if elapsed else 0.0,
+                'requests_per_s': round(network.count / elapsed, 3) if network and elapsed else 0.0,
+                'max_in_flight': self.max_in_flight,
+                'errors': dict(self.errors),
+                'stages': {name: histogram.summary() for name, histogram in sorted(self.stages.items())},
+            }
+
+    def dump_json(self, path: str = DEFAULT_REPORT_PATH) -> dict:
+        report = self.report()
+        with open(path, 'w', encoding='utf-8') as file:
+            json.dump(report, file, indent=2)
+        return report
+
+
+class ProgressReporter:
+    """Logs ``metrics.progress_line()`` every ``interval`` seconds from a daemon thread."""
+
+    def __init__(self, metrics: Metrics, interval: float = 10.0):
+        self.metrics = metrics
+        self.interval = interval
+        self._stopped = threading.Event()
+        self._thread = threading.Thread(target=self._run, name='progress-reporter', daemon=True)
+
+    def _run(self):
+        while not self._stopped.wait(self.interval):
+            logging.info(f"Progress: {self.metrics.progress_line()}")
+
+    def __enter__(self):
+        self._thread.start()
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self._stopped.set()
+        self._thread.join()
+        logging.info(f"Progress: {self.metrics.progress_line()}")
+
+
+# shared by the scraper modules, reset at the start of each run
+METRICS = Metrics()
@@ -1,30 +1,82 @@
 import logging
+import os
 import re
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
 
 from PyPDF2 import PdfReader
 
+APPLICATION_NUMBERS_FILE = "data/application_num/application_numbers.txt"
+APPLICATION_NUMBER_PATTERN = re.compile(r"\d{7}")
 
-def extract_pdf(pdf_path: str) -> bool:
-    try:
-        logging.info("Extracting the PDF document...")
-        pdf_reader = PdfReader(pdf_path)
-        extracted_text = []
+# opened once per worker process by _init_worker
+_worker_reader = None
+
+
+def _page_matches(page) -> list:
+    return APPLICATION_NUMBER_PATTERN.findall(page.extract_text() or "")
+
+
+def _init_worker(pdf_path: str):
+    global _worker_reader
+    _worker_reader = PdfReader(pdf_path)
+
+
+def _page_numbers_in_worker(start: int, stop: int) -> list:
+    """Application numbers on pages [start, stop), one list per page."""
+    return [_page_matches(_worker_reader.pages[page_num]) for page_num in range(start, stop)]
 
-        for page_num in range(len(pdf_reader.pages)):
-            page = pdf_reader.pages[page_num]
-            text = page.extract_text()
-            extracted_text.append(text)
 
-        regex = r"\d{7}"
-        pattern = re.compile(regex)
+def iter_page_numbers(pdf_path: str, workers: int = 1, pages_per_task: int = 50):
+    """
+    Yield the application numbers of each page, in page order. Pages are matched
+    one at a time, so digits at the end of one page never run into the next. With
+    ``workers`` > 1 page ranges are extracted by a process pool, at most two
+    ranges per worker in flight.
+    """
+    pdf_reader = PdfReader(pdf_path)
+    page_count = len(pdf_reader.pages)
+    ranges = [(start, min(start + pages_per_task, page_count)) for start in range(0, page_count, pages_per_task)]
+
+    if workers <= 1 or len(ranges) <= 1:
+        for page in pdf_reader.pages:
+            yield _page_matches(page)
+        return
+
+    with ProcessPoolExecutor(max_workers=workers, initializer=_init_worker, initargs=(pdf_path,)) as executor:
+        pending = deque()
+        for start, stop in ranges:
+            pending.append(executor.submit(_page_numbers_in_worker, start, stop))
+            if len(pending) >= 2 * workers:
+                yield from pending.popleft().result()
+        while pending:
+            yield from pending.popleft().result()
+
+
+def iter_application_numbers(pdf_path: str, workers: int = 1, pages_per_task: int = 50):
+    """Application numbers of the PDF in order of first appearance, without duplicates."""
+    seen = set()
+    for numbers in iter_page_numbers(pdf_path, workers, pages_per_task):
+        for number in numbers:
+            if number not in seen:
+                seen.add(number)
+                yield number
+
+
+def extract_pdf(pdf_path: str, workers: int | None = None, pages_per_task: int = 50) -> bool:
+    try:
+        logging.info("Extracting the PDF document...")
+        workers = workers or os.cpu_count() or 1
 
-        output_file = "data/application_num/application_numbers.txt"
-        with open(output_file, "w") as file:
-            for match in pattern.findall("".join(extracted_text)):
-                file.write(match + "\n")
+        count = 0
+        with open(APPLICATION_NUMBERS_FILE, "w") as file:
+            for number in iter_application_numbers(pdf_path, workers, pages_per_task):
+                file.write(number + "\n")
+                count += 1
 
+        logging.info(f"Extracted {count} application numbers from {pdf_path}")
         return True
 
     except Exception as e:
         logging.error(f"Error while extracting pdf: {e}")
-        return False
\ No newline at end of file
+        return False
@@ -0,0 +1,126 @@
+import math
+import os
+import sys
+from array import array
+
+from doc_utils.trademark_store import APPLICATION_NO_COLUMN, STORE_EXTENSIONS, TrademarkStore, normalize_application_number
+
+TRADEMARK_COLUMN = 'TM Applied For'
+CLASS_COLUMN = 'Class'
+
+RECORD_COLUMNS = [APPLICATION_NO_COLUMN, TRADEMARK_COLUMN, CLASS_COLUMN]
+
+
+def class_key(value) -> str | None:
+    """5, 5.0, '5' and ' 5.0 ' are the same class; None for a missing one."""
+    if value is None or (isinstance(value, float) and math.isnan(value)):
+        return None
+    value = str(value).strip()
+    try:
+        number = float(value)
+    except ValueError:
+        return value or None
+    return str(int(number)) if number.is_integer() else value
+
+
+def intern_label(value):
+    """One shared copy of a label or status string, however many records carry it."""
+    return sys.intern(value) if type(value) is str else value
+
+
+class Interner:
+    """The distinct values of a low-cardinality column, rows refer to them by a 2-byte code."""
+
+    __slots__ = ('values', '_codes')
+
+    def __init__(self):
+        self.values = [None]
+        self._codes = {None: 0}
+
+    def code(self, value) -> int:
+        code = self._codes.get(value)
+        if code is None:
+            code = self._codes[value] = len(self.values)
+            self.values.append(intern_label(value))
+        return code
+
+    def __len__(self) -> int:
+        return len(self.values) - 1
+
+
+class TrademarkColumns:
+    """
+    Trademarks held column by column: application numbers in an int64 array,
+    classes as codes into an ``Interner``, and only the marks as Python
+    strings. A row costs a few bytes plus its mark, where a pandas row or a
+    dict per record costs hundreds.
+
+    ``columns[pos]`` is the ``(app_number, trademark, tm_class)`` tuple the
+    matchers unpack. Rows keep their position in the source, a mark that is
+    missing or not text is None.
+    """
+
+    __slots__ = ('trademarks', 'classes', '_numbers', '_other_numbers', '_class_codes')
+
+    def __init__(self):
+        self.trademarks = []
+        self.classes = Interner()
+        self._numbers = array('q')
+        # application numbers that are not integers, by position
+        self._other_numbers = {}
+        self._class_codes = array('H')
+
+    def append(self, app_number, trademark, tm_class=None):
+        app_number = normalize_application_number(app_number.item() if hasattr(app_number, 'item') else app_number)
+        if type(app_number) is int and -(1 << 63) <= app_number < (1 << 63):
+            self._numbers.append(app_number)
+        else:
+            self._other_numbers[len(self._numbers)] = app_number
+            self._numbers.append(0)
+        self.trademarks.append(trademark if isinstance(trademark, str) and trademark else None)
+        self._class_codes.append(self.classes.code(class_key(tm_class)))
+
+    def extend(self, rows):
+        """Append ``(app_number, trademark, tm_class)`` tuples."""
+        for row in rows:
+            self.append(*row)
+        return self
+
+    def __len__(self) -> int:
+        return len(self.trademarks)
+
+    def app_number(self, pos: int):
+        if self._other_numbers and pos in self._other_numbers:
+            return self._other_numbers[pos]
+        return self._numbers[pos]
+
+    def tm_class(self, pos: int) -> str | None:
+        return self.classes.values[self._class_codes[pos]]
+
+    def __getitem__(self, pos: int) -> tuple:
+        return self.app_number(pos), self.trademarks[pos], self.classes.values[self._class_codes[pos]]
+
+    def __iter__(self):
+        for pos in range(len(self.trademarks)):
+            yield self[pos]
+
+    def positions(self):
+        """Positions of the rows with a mark."""
+        return (pos for pos, trademark in enumerate(self.trademarks) if trademark is not None)
+
+
+def read_trademark_columns(path: str, engine: str | None = None) -> TrademarkColumns:
+    """
+    The trademarks of a store (.sqlite/.db) or an Excel sheet as
+    ``TrademarkColumns``, read row by row without a DataFrame in between.
+    """
+    if path.lower().endswith(STORE_EXTENSIONS):
+        if not os.path.exists(path):
+            raise FileNotFoundError(f"No trademark store at {path}")
+        with TrademarkStore(path) as store:
+            return TrademarkColumns().extend(store.iter_rows(RECORD_COLUMNS))
+
+    # imported here, the scraper loads this module for intern_label and has no use for the sheet readers
+    from doc_utils.spreadsheet_utils import iter_sheet_rows
+
+    return TrademarkColumns().extend(iter_sheet_rows(path, RECORD_COLUMNS, engine))
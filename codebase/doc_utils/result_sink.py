@@ -0,0 +1,140 @@
+import csv
+import json
+import os
+import time
+from abc import ABC, abstractmethod
+
+from doc_utils.metrics import METRICS
+
+
+class ResultSink(ABC):
+    """
+    Buffered, append-only writer for scraped records, opened once per worker.
+
+    Records are kept in memory and written out once ``flush_every`` records are
+    buffered or ``flush_interval`` seconds have passed since the last flush, and
+    on close. Both are checked by ``write``, there is no background timer. The
+    file is never re-read, so writing the Nth record costs the same as the
+    first; the xlsx output is produced once from these files at the end.
+
+    Subclasses implement ``_write_records`` for their file format.
+    """
+
+    extension = None
+
+    def __init__(self, filename: str, flush_every: int = 100, flush_interval: float = 5.0):
+        self.filename = filename
+        self.flush_every = flush_every
+        self.flush_interval = flush_interval
+        self.written = 0
+        self._buffer = []
+        self._file = None
+        self._last_flush = time.monotonic()
+
+    def open(self):
+        self._file = open(self.filename, 'a', newline='', encoding='utf-8')
+        self._last_flush = time.monotonic()
+        return self
+
+    def __enter__(self):
+        return self.open()
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
+
+    def write(self, record: dict):
+        self._buffer.append(record)
+        if len(self._buffer) >= self.flush_every or self._flush_due():
+            self.flush()
+
+    def _flush_due(self) -> bool:
+        # a slow scrape can take minutes to fill a buffer, a crash must not lose that much
+        return time.monotonic() - self._last_flush >= self.flush_interval
+
+    def flush(self):
+        if self._buffer:
+            with METRICS.stage('save'):
+                self._write_records(self._buffer)
+                self._file.flush()
+            self.written += len(self._buffer)
+            self._buffer = []
+        self._last_flush = time.monotonic()
+
+    def close(self):
+        if self._file is not None:
+            self.flush()
+            self._file.close()
+            self._file = None
+
+    @abstractmethod
+    def _write_records(self, records: list):
+        """Write ``records`` to ``self._file``, which is flushed afterwards."""
+
+
+class JsonlResultSink(ResultSink):
+    """One JSON object per line, each record keeps its own keys."""
+
+    extension = '.jsonl'
+
+    def _write_records(self, records: list):
+        self._file.write(''.join(json.dumps(record, ensure_ascii=False) + '\n' for record in records))
+
+
+class CsvResultSink(ResultSink):
+    """
+    CSV with the header taken from ``fieldnames`` or the first record written to
+    a new file. Keys missing from a record are left empty and keys outside the
+    header are dropped, CSV cannot grow columns once rows are written.
+    """
+
+    extension = '.csv'
+
+    def __init__(self, filename: str, fieldnames: list | None = None, **kwargs):
+        super().__init__(filename, **kwargs)
+        self.fieldnames = fieldnames
+        self._writer = None
+        self._header_written = False
+
+    def open(self):
+        if self.fieldnames is None and os.path.exists(self.filename):
+            with open(self.filename, 'r', newline='', encoding='utf-8') as csvfile:
+                self.fieldnames = next(csv.reader(csvfile), None)
+        file_exists = os.path.exists(self.filename) and os.path.getsize(self.filename) > 0
+        super().open()
+        self._header_written = file_exists
+        return self
+
+    def _write_records(self, records: list):
+        if self._writer is None:
+            if self.fieldnames is None:
+                self.fieldnames = list(records[0].keys())
+            self._writer = csv.DictWriter(self._file, fieldnames=self.fieldnames, extrasaction='ignore')
+            if not self._header_written:
+                self._writer.writeheader()
+                self._header_written = True
+        self._writer.writerows(records)
+
+
+SINK_TYPES = {sink.extension: sink for sink in (JsonlResultSink, CsvResultSink)}
+
+
+def open_result_sink(filename: str, **kwargs) -> ResultSink:
+    """Open the sink matching ``filename``'s extension (.jsonl or .csv)."""
+    extension = os.path.splitext(filename)[1].lower()
+    if extension not in SINK_TYPES:
+        raise ValueError(f"No result sink for '{extension}' files, use one of {sorted(SINK_TYPES)}")
+    return SINK_TYPES[extension](filename, **kwargs).open()
+
+
+def read_records(filename: str):
+    """Yield the records of a sink file, tolerating a torn last line of a killed run."""
+    extension = os.path.splitext(filename)[1].lower()
+    with open(filename, 'r', newline='', encoding='utf-8') as file:
+        if extension == CsvResultSink.extension:
+            yield from csv.DictReader(file)
+            return
+        for line in file:
+            try:
+                yield json.loads(line)
+            except ValueError:
+                break
@@ -1,47 +1,131 @@
-import csv
+import itertools
 import logging
-import pandas as pd
 import os
 
+from openpyxl import load_workbook
 
-def save_to_csv(data: dict, filename: str = 'data/extracted/trademark_data.csv'):
-    file_exists = os.path.exists(filename)
-
-    with open(filename, mode='a', newline='', encoding='utf-8') as csvfile:
-        field_names = data.keys()
-        writer = csv.DictWriter(csvfile, fieldnames=field_names)
-
-        if not file_exists:
-            writer.writeheader()
+from doc_utils.result_sink import CsvResultSink, read_records
+from doc_utils.trademark_store import COMBINED_XLSX_PATH, DEFAULT_STORE_PATH, TrademarkStore, bootstrap_store, iter_xlsx_records
 
-        writer.writerow(data)
+THREAD_FILE_PREFIX = 'trademark_data_thread_'
+THREAD_FILE_EXTENSIONS = ('.jsonl', '.xlsx')
 
 
+def save_to_csv(data: dict, filename: str = 'data/extracted/trademark_data.csv'):
+    """Append a single record; for many records keep a ``CsvResultSink`` open instead."""
+    with CsvResultSink(filename) as sink:
+        sink.write(data)
 
-def save_to_excel(data: dict, filename: str):
-    file_exists = os.path.exists(filename)
-
-    df = pd.DataFrame([data])
 
-    if file_exists:
-        with pd.ExcelWriter(filename, mode='a', engine='openpyxl', if_sheet_exists='overlay') as writer:
-            df.to_excel(writer, index=False, header=False, startrow=writer.sheets['Sheet1'].max_row)
-    else:
-        df.to_excel(filename, index=False)
 
+def _read_rows_openpyxl(excel_file: str, max_col: int | None = None):
+    workbook = load_workbook(excel_file, read_only=True)
+    try:
+        yield from workbook.worksheets[0].iter_rows(max_col=max_col, values_only=True)
+    finally:
+        workbook.close()
 
 
+def _read_rows_calamine(excel_file: str, max_col: int | None = None):
+    from python_calamine import CalamineWorkbook
 
-def extract_excel(excel_file: str) -> bool:
+    workbook = CalamineWorkbook.from_path(excel_file)
+    try:
+        sheet = workbook.get_sheet_by_index(0)
+        # rows start at the sheet's used range, not at A1 like openpyxl's
+        first_row, first_col = sheet.start or (0, 0)
+        padding = (None,) * first_col
+        rows = sheet.iter_rows()
+        first = next(rows, None)
+        if first is None:
+            return
+        # python-calamine 0.8 yields the empty rows above the used range itself; a version
+        # that starts at the range's first row (which holds a value) gets them added here
+        if first_row and any(value != '' for value in first):
+            yield from ((None,) * (max_col or first_col + len(first)) for _ in range(first_row))
+        for row in itertools.chain((first,), rows):
+            # calamine reports an empty cell as ''
+            yield (padding + tuple(None if value == '' else value for value in row))[:max_col]
+    finally:
+        workbook.close()
+
+
+# each yields the rows of the first sheet as tuples, the first ``max_col`` cells of each
+EXCEL_ENGINES = {
+    'openpyxl': _read_rows_openpyxl,
+    'calamine': _read_rows_calamine,
+}
+
+
+def default_excel_engine() -> str:
+    """calamine when python-calamine is installed, openpyxl's read-only mode otherwise."""
+    try:
+        import python_calamine  # noqa: F401
+    except ImportError:
+        return 'openpyxl'
+    return 'calamine'
+
+
+def normalize_seven_digit_number(value) -> str | None:
+    """1234567, 1234567.0 and ' 1234567 ' -> '1234567', None for anything else."""
+    if isinstance(value, float) and value.is_integer():
+        value = int(value)
+    if isinstance(value, int) and not isinstance(value, bool):
+        value = str(value)
+    if isinstance(value, str):
+        value = value.strip()
+        if len(value) == 7 and value.isdigit():
+            return value
+    return None
+
+
+def iter_excel_numbers(excel_file: str, engine: str | None = None):
+    """
+    Application numbers in column A of the first sheet, header row skipped,
+    normalised to 7 digits and without duplicates. Values that are not an
+    application number are dropped.
+    """
+    engine = engine or default_excel_engine()
+    rows = EXCEL_ENGINES[engine](excel_file, max_col=1)
+    next(rows, None)  # header
+
+    seen = set()  # ints, a fraction of the size of the strings
+    invalid = 0
+    for row in rows:
+        value = row[0] if row else None
+        number = normalize_seven_digit_number(value)
+        if number is None:
+            invalid += (value is not None)
+            continue
+        key = int(number)
+        if key in seen:
+            continue
+        seen.add(key)
+        yield number
+    logging.info(f"Read {len(seen)} application numbers from {excel_file} with {engine}, "
+                 f"skipped {invalid} invalid values")
+
+
+def iter_sheet_rows(excel_file: str, columns: list, engine: str | None = None):
+    """
+    Tuples of the values under the ``columns`` headers of the first sheet, with
+    None for empty cells and for headers the sheet does not have.
+    """
+    rows = EXCEL_ENGINES[engine or default_excel_engine()](excel_file)
+    header = next(rows, None) or ()
+    positions = [header.index(column) if column in header else None for column in columns]
+    for row in rows:
+        yield tuple(
+            row[position] if position is not None and position < len(row) else None for position in positions
+        )
+
+
+def extract_excel(excel_file: str, engine: str | None = None) -> bool:
+    """Stream the application numbers of ``excel_file`` (see iter_excel_numbers) into application_numbers.txt."""
     try:
-        df = pd.read_excel(excel_file, engine='openpyxl')
-
-        first_column = df.iloc[:, 0]
-
         with open('data/application_num/application_numbers.txt', 'w', encoding='utf-8') as f:
-            for value in first_column:
-                f.write(f"{value}\n")
-
+            for number in iter_excel_numbers(excel_file, engine):
+                f.write(f"{number}\n")
         return True
 
     except Exception as e:
@@ -52,26 +136,53 @@ def extract_excel(excel_file: str) -> bool:
 
 
 def combine_excel_files(
-        output_file: str = 'data/extracted/combined_trademark_data.xlsx'
+        output_file: str = COMBINED_XLSX_PATH,
+        store_path: str = DEFAULT_STORE_PATH,
+        export_xlsx: bool = False,
 ):
+    """
+    Upsert the thread files of a scrape into the trademark store. Only the new
+    records are read; ``output_file`` seeds an empty store and is rewritten from
+    the store when ``export_xlsx`` is set.
+    """
     directory = 'data/extracted/'
 
-    combined_df = pd.DataFrame()
+    with TrademarkStore(store_path) as store:
+        bootstrap_store(store, output_file)
 
-    if os.path.exists(output_file):
-        existing_df = pd.read_excel(output_file, engine='openpyxl')
-        combined_df = pd.concat([combined_df, existing_df], ignore_index=True)
+        for filename in os.listdir(directory):
+            if filename.startswith(THREAD_FILE_PREFIX) and filename.endswith(THREAD_FILE_EXTENSIONS):
+                file_path = os.path.join(directory, filename)
 
-    for filename in os.listdir(directory):
-        if filename.startswith('trademark_data_thread_') and filename.endswith('.xlsx'):
-            file_path = os.path.join(directory, filename)
+                if filename.endswith('.xlsx'):
+                    records = iter_xlsx_records(file_path)
+                else:
+                    records = read_records(file_path)
 
-            df = pd.read_excel(file_path, engine='openpyxl')
+                # records were flushed through the run, the last write dates them closely enough
+                stored = store.upsert(records, fetched_at=os.path.getmtime(file_path))
+                # committed before the thread file goes away, so a crash cannot lose its records
+                store.commit()
+                os.remove(file_path)
+                logging.info(f"Stored {stored} records from {filename}")
 
-            combined_df = pd.concat([combined_df, df], ignore_index=True)
+        logging.info(f"Combined data saved to {store_path} ({len(store)} trademarks)")
 
-            os.remove(file_path)
+        if export_xlsx:
+            export_combined_xlsx(output_file, store)
 
-    combined_df.to_excel(output_file, index=False)
 
-    logging.info(f"Combined data saved to {output_file}")
\ No newline at end of file
+def export_combined_xlsx(
+        output_file: str = COMBINED_XLSX_PATH,
+        store: TrademarkStore | str = DEFAULT_STORE_PATH,
+):
+    if isinstance(store, str):
+        if not os.path.exists(store):
+            logging.error(f"No trademark store at {store}, scrape some trademark data first")
+            return 0
+        with TrademarkStore(store) as opened_store:
+            return export_combined_xlsx(output_file, opened_store)
+
+    rows = store.export_xlsx(output_file)
+    logging.info(f"Exported {rows} trademarks to {output_file}")
+    return rows
@@ -0,0 +1,247 @@
+import datetime
+import logging
+import math
+import os
+import sqlite3
+import time
+
+APPLICATION_NO_COLUMN = 'TM Application No.'
+DEFAULT_STORE_PATH = 'data/extracted/trademarks.sqlite'
+COMBINED_XLSX_PATH = 'data/extracted/combined_trademark_data.xlsx'
+STORE_EXTENSIONS = ('.sqlite', '.db')
+
+_TABLE = 'trademarks'
+_STATE_TABLE = 'scrape_state'
+
+# statuses after which an application no longer changes on the register
+FINAL_STATUSES = frozenset({'registered', 'refused', 'abandoned', 'withdrawn', 'removed'})
+
+
+def is_final_status(status) -> bool:
+    return isinstance(status, str) and status.strip().lower() in FINAL_STATUSES
+
+
+def _quote(name: str) -> str:
+    return '"' + str(name).replace('"', '""') + '"'
+
+
+def normalize_application_number(value):
+    """'1234567', 1234567 and 1234567.0 are the same application, key them all as int."""
+    if isinstance(value, float) and value.is_integer():
+        return int(value)
+    if isinstance(value, str) and value.strip().isdigit():
+        return int(value.strip())
+    if isinstance(value, str):
+        return value.strip() or None
+    return value
+
+
+def _normalize_value(value):
+    if isinstance(value, float) and math.isnan(value):
+        return None
+    if isinstance(value, (datetime.date, datetime.time)):
+        return value.isoformat(sep=' ') if isinstance(value, datetime.datetime) else value.isoformat()
+    return value
+
+
+class TrademarkStore:
+    """
+    Master dataset of scraped trademarks, one SQLite row per application number.
+
+    Records are upserted, so re-scraping an application replaces its row in
+    place instead of duplicating it, and combining a run only touches the rows
+    it brings. A column is added the first time a record carries a new label.
+    The combined xlsx is exported from the store on demand.
+
+    Alongside, ``scrape_state`` keeps the last fetch time and status of every
+    application, so the scraper can skip numbers that need no refetch.
+    """
+
+    def __init__(self, path: str = DEFAULT_STORE_PATH):
+        self.path = path
+        self._conn = None
+        self._columns = []
+        self._upsert_sql = {}
+
+    def open(self):
+        self._conn = sqlite3.connect(self.path)
+        self._columns = [row[1] for row in self._conn.execute(f"PRAGMA table_info({_TABLE})")]
+        state_exists = self._conn.execute(
+            "SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = ?", (_STATE_TABLE,)
+        ).fetchone()
+        if not state_exists:
+            self._conn.execute(
+                f"CREATE TABLE {_STATE_TABLE} "
+                f"(app_number PRIMARY KEY, fetched_at REAL, status TEXT, final INTEGER) WITHOUT ROWID"
+            )
+            if self._columns:
+                self._backfill_state()
+            self._conn.commit()
+        return self
+
+    def _backfill_state(self):
+        # stores created before the scrape state: fetch time unknown, so only final statuses are skipped
+        status_column = _quote('status') if 'status' in self._columns else 'NULL'
+        rows = self._conn.execute(f"SELECT {_quote(APPLICATION_NO_COLUMN)}, {status_column} FROM {_TABLE}")
+        self._conn.executemany(
+            f"INSERT INTO {_STATE_TABLE} VALUES (?, 0, ?, ?)",
+            ((app_number, status, is_final_status(status)) for app_number, status in rows.fetchall()),
+        )
+
+    def __enter__(self):
+        return self.open()
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        if exc_type is None:
+            self._conn.commit()
+        self.close()
+
+    def close(self):
+        if self._conn is not None:
+            self._conn.close()
+            self._conn = None
+
+    @property
+    def columns(self) -> list:
+        return list(self._columns)
+
+    def __len__(self):
+        if not self._columns:
+            return 0
+        return self._conn.execute(f"SELECT COUNT(*) FROM {_TABLE}").fetchone()[0]
+
+    def _add_columns(self, names):
+        if not self._columns:
+            # the table is created from the first record, so exports keep the scraped column order
+            definitions = ', '.join(
+                _quote(name) + (' PRIMARY KEY' if name == APPLICATION_NO_COLUMN else '') for name in names
+            )
+            self._conn.execute(f"CREATE TABLE {_TABLE} ({definitions})")
+            self._columns = list(names)
+            self._upsert_sql.clear()
+            return
+        for name in names:
+            self._conn.execute(f"ALTER TABLE {_TABLE} ADD COLUMN {_quote(name)}")
+            self._columns.append(name)
+        self._upsert_sql.clear()
+
+    def _upsert_statement(self, keys: tuple) -> str:
+        sql = self._upsert_sql.get(keys)
+        if sql is None:
+            # every other column is reset too, a re-scraped record replaces the old one entirely
+            updates = ', '.join(
+                f"{_quote(column)} = excluded.{_quote(column)}"
+                for column in self._columns if column != APPLICATION_NO_COLUMN
+            ) or f"{_quote(APPLICATION_NO_COLUMN)} = excluded.{_quote(APPLICATION_NO_COLUMN)}"
+            sql = (
+                f"INSERT INTO {_TABLE} ({', '.join(_quote(key) for key in keys)}) "
+                f"VALUES ({', '.join('?' for _ in keys)}) "
+                f"ON CONFLICT({_quote(APPLICATION_NO_COLUMN)}) DO UPDATE SET {updates}"
+            )
+            self._upsert_sql[keys] = sql
+        return sql
+
+    def upsert(self, records, fetched_at: float | None = None) -> int:
+        """
+        Insert or replace ``records`` (dicts keyed by column label), returns how
+        many were stored. ``fetched_at`` (epoch seconds, default now) goes to the
+        scrape state.
+        """
+        fetched_at = time.time() if fetched_at is None else fetched_at
+        stored = 0
+        for record in records:
+            app_number = normalize_application_number(record.get(APPLICATION_NO_COLUMN))
+            if app_number is None:
+                logging.error(f"Skipping record without an application number: {record}")
+                continue
+
+            record = {key: _normalize_value(value) for key, value in record.items() if key is not None}
+            record[APPLICATION_NO_COLUMN] = app_number
+
+            new_columns = [key for key in record if key not in self._columns]
+            if new_columns:
+                self._add_columns(new_columns)
+
+            keys = tuple(record)
+            self._conn.execute(self._upsert_statement(keys), tuple(record.values()))
+            status = record.get('status')
+            self._conn.execute(
+                f"INSERT OR REPLACE INTO {_STATE_TABLE} VALUES (?, ?, ?, ?)",
+                (app_number, fetched_at, status, is_final_status(status)),
+            )
+            stored += 1
+        return stored
+
+    def numbers_to_skip(self, refetch_after_days: float) -> set:
+        """
+        Application numbers that need no fetch: final statuses, and other
+        statuses fetched less than ``refetch_after_days`` days ago.
+        """
+        cutoff = time.time() - refetch_after_days * 86400
+        return {
+            row[0] for row in self._conn.execute(
+                f"SELECT app_number FROM {_STATE_TABLE} WHERE final OR fetched_at > ?", (cutoff,)
+            )
+        }
+
+    def commit(self):
+        self._conn.commit()
+
+    def iter_rows(self, columns: list):
+        """Tuples of ``columns`` in store order, with None for a column the store does not have."""
+        if not self._columns:
+            return iter(())
+        selected = ', '.join(_quote(column) if column in self._columns else 'NULL' for column in columns)
+        return self._conn.execute(f"SELECT {selected} FROM {_TABLE} ORDER BY rowid")
+
+    def export_xlsx(self, output_file: str) -> int:
+        """Stream the whole store into ``output_file``, returns the number of rows written."""
+        # openpyxl is imported by the few commands that write or read a workbook, not by the scraper
+        from openpyxl import Workbook
+
+        workbook = Workbook(write_only=True)
+        sheet = workbook.create_sheet('Sheet1')
+        sheet.append(self._columns)
+
+        rows = 0
+        for row in self._conn.execute(f"SELECT * FROM {_TABLE} ORDER BY rowid") if self._columns else ():
+            sheet.append(row)
+            rows += 1
+
+        workbook.save(output_file)
+        return rows
+
+
+def iter_xlsx_records(excel_file: str):
+    """Yield the rows of the first sheet of ``excel_file`` as dicts keyed by its header row."""
+    from openpyxl import load_workbook
+
+    workbook = load_workbook(excel_file, read_only=True)
+    try:
+        rows = workbook.worksheets[0].iter_rows(values_only=True)
+        header = next(rows, None)
+        if header is None:
+            return
+        for row in rows:
+            yield {key: value for key, value in zip(header, row) if key is not None and value is not None}
+    finally:
+        workbook.close()
+
+
+def bootstrap_store(store: TrademarkStore, legacy_xlsx: str) -> int:
+    """Fill an empty store from an existing combined xlsx, once."""
+    if len(store) or not os.path.exists(legacy_xlsx):
+        return 0
+    logging.info(f"Importing {legacy_xlsx} into {store.path}...")
+    imported = store.upsert(iter_xlsx_records(legacy_xlsx), fetched_at=os.path.getmtime(legacy_xlsx))
+    store.commit()
+    logging.info(f"Imported {imported} records")
+    return imported
+
+
+def scraped_numbers_to_skip(refetch_after_days: float | None, store_path: str = DEFAULT_STORE_PATH) -> set:
+    """``TrademarkStore.numbers_to_skip`` without a store to open, None disables skipping."""
+    if refetch_after_days is None or not os.path.exists(store_path):
+        return set()
+    with TrademarkStore(store_path) as store:
+        return store.numbers_to_skip(refetch_after_days)
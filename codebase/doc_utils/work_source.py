@@ -0,0 +1,193 @@
+import logging
+import os
+import threading
+from abc import ABC, abstractmethod
+
+from doc_utils.increment_based_generator import PROGRESS_FILE, RangeProgress, pending_ranges
+from doc_utils.pdf_utils import APPLICATION_NUMBERS_FILE, iter_application_numbers
+from doc_utils.spreadsheet_utils import iter_excel_numbers
+
+
+class WorkSource(ABC):
+    """
+    Lazy supply of application numbers for the scraper. Numbers are produced
+    while the scrape runs, nothing is materialised up front. ``size`` is None
+    when the count is not known without reading the whole input.
+    ``mark_done`` is called once per number the scraper is finished with and
+    ``commit`` once their records are in the trademark store.
+    """
+
+    @abstractmethod
+    def __iter__(self):
+        """The application numbers, as strings."""
+
+    def size(self) -> int | None:
+        return None
+
+    def mark_done(self, appl_number: str):
+        pass
+
+    def commit(self):
+        pass
+
+
+class NumberRange(WorkSource):
+    """``range(start, stop, step)``, with its completion kept in the progress file when ``progress_file`` is set."""
+
+    def __init__(self, start: int, stop: int, step: int = 1, progress_file: str | None = None):
+        self.start = start
+        self.stop = stop
+        self.step = step
+        self.progress = RangeProgress(start, stop, step, progress_file) if progress_file else None
+
+    def _first(self) -> int:
+        return self.progress.next if self.progress else self.start
+
+    def __iter__(self):
+        for number in range(self._first(), self.stop, self.step):
+            yield str(number)
+
+    def size(self) -> int:
+        return len(range(self._first(), self.stop, self.step))
+
+    def mark_done(self, appl_number: str):
+        if self.progress:
+            self.progress.mark_done(int(appl_number))
+
+    def commit(self):
+        if self.progress:
+            self.progress.save()
+
+
+class TextFileSource(WorkSource):
+    """One application number per line, read as the scrape goes."""
+
+    def __init__(self, path: str = APPLICATION_NUMBERS_FILE):
+        self.path = path
+
+    def __iter__(self):
+        with open(self.path, 'r') as file:
+            for line in file:
+                line = line.strip()
+                if line:
+                    yield line
+
+    def size(self) -> int:
+        # a line count is cheap next to the scrape and gives the progress line an ETA
+        with open(self.path, 'rb') as file:
+            return sum(1 for line in file if line.strip())
+
+
+class DeadLetterSource(WorkSource):
+    """
+    The numbers of a dead letter file, for a later pass over them. Only what the
+    file held when the pass started is read, numbers failing again are appended
+    behind that. ``commit`` rewrites the file without the numbers that succeeded.
+    """
+
+    def __init__(self, path: str):
+        self.path = path
+        self._end = os.path.getsize(path) if os.path.exists(path) else 0
+        self._done = set()
+        self._lock = threading.Lock()
+
+    def _numbers(self) -> list:
+        with open(self.path, 'rb') as file:
+            content = file.read(self._end).decode()
+        # a number can fail in several passes before this one
+        return list(dict.fromkeys(line.strip() for line in content.splitlines() if line.strip()))
+
+    def __iter__(self):
+        if self._end:
+            yield from self._numbers()
+
+    def size(self) -> int:
+        return len(self._numbers()) if self._end else 0
+
+    def mark_done(self, appl_number: str):
+        with self._lock:
+            self._done.add(appl_number)
+
+    def commit(self):
+        if not self._done:
+            return
+        with open(self.path, 'r') as file:
+            remaining = dict.fromkeys(line.strip() for line in file if line.strip())
+        with open(self.path, 'w') as file:
+            file.writelines(f"{number}\n" for number in remaining if number not in self._done)
+        logging.info(f"Removed {len(self._done)} retried application number(s) from {self.path}")
+
+
+class PdfSource(WorkSource):
+    """Application numbers of a journal PDF, extracted while they are scraped."""
+
+    def __init__(self, pdf_path: str, workers: int = 1):
+        self.pdf_path = pdf_path
+        self.workers = workers
+
+    def __iter__(self):
+        return iter_application_numbers(self.pdf_path, self.workers)
+
+
+class ExcelSource(WorkSource):
+    """Application numbers in column A of a workbook, read while they are scraped."""
+
+    def __init__(self, excel_file: str, engine: str | None = None):
+        self.excel_file = excel_file
+        self.engine = engine
+
+    def __iter__(self):
+        return iter_excel_numbers(self.excel_file, self.engine)
+
+
+class ChainedSource(WorkSource):
+    """Several sources one after the other, e.g. every pending generated range."""
+
+    def __init__(self, sources: list):
+        self.sources = sources
+        self._owner = {}
+        self._lock = threading.Lock()
+
+    def __iter__(self):
+        for source in self.sources:
+            for appl_number in source:
+                # mark_done has to reach the source the number came from
+                with self._lock:
+                    self._owner[appl_number] = source
+                yield appl_number
+
+    def size(self) -> int | None:
+        sizes = [source.size() for source in self.sources]
+        return None if None in sizes else sum(sizes)
+
+    def mark_done(self, appl_number: str):
+        with self._lock:
+            source = self._owner.pop(appl_number, None)
+        if source is not None:
+            source.mark_done(appl_number)
+
+    def commit(self):
+        for source in self.sources:
+            source.commit()
+
+
+def pending_range_source(progress_file: str = PROGRESS_FILE) -> ChainedSource:
+    """The generated ranges not scraped to the end, resuming each where it stopped."""
+    ranges = pending_ranges(progress_file)
+    logging.info(f"{len(ranges)} pending generated range(s)")
+    return ChainedSource([NumberRange(r["start"], r["stop"], r["step"], progress_file) for r in ranges])
+
+
+def default_source(progress_file: str = PROGRESS_FILE, numbers_file: str = APPLICATION_NUMBERS_FILE) -> WorkSource:
+    """
+    application_numbers.txt, or the pending generated ranges when they were
+    reserved after it was written: gen does not write the file, scraping it
+    after a gen would repeat an old input.
+    """
+    ranges = pending_ranges(progress_file)
+    if ranges and (not os.path.exists(numbers_file) or os.path.getmtime(progress_file) > os.path.getmtime(numbers_file)):
+        logging.info(f"Scraping the {len(ranges)} pending generated range(s), newer than {numbers_file}")
+        return pending_range_source(progress_file)
+    if ranges:
+        logging.warning(f"{len(ranges)} generated range(s) are still pending, scrape them with --pending")
+    return TextFileSource(numbers_file)
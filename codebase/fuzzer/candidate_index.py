@@ -0,0 +1,134 @@
+import math
+from collections import Counter
+
+from fuzzer.phonetics import PhoneticCache
+
+NGRAM_SIZE = 2
+
+
+def _is_missing(value) -> bool:
+    return value is None or (isinstance(value, float) and math.isnan(value))
+
+
+def _ngrams(text: str) -> Counter:
+    return Counter(text[i:i + NGRAM_SIZE] for i in range(len(text) - NGRAM_SIZE + 1))
+
+
+class _ClassBucket:
+
+    def __init__(self):
+        self.positions = []
+        self.lowered = []
+        self.by_code = {}
+        self.by_ngram = {}
+        self.by_length = {}
+        self.lengths = {}
+
+    def add(self, pos: int, trademark: str, codes):
+        for code in codes:
+            self.by_code.setdefault(code, []).append(pos)
+
+        lowered = trademark.lower()
+        self.positions.append(pos)
+        self.lowered.append(lowered)
+
+        for gram, count in _ngrams(lowered).items():
+            self.by_ngram.setdefault(gram, []).append((pos, count))
+
+        self.by_length.setdefault(len(lowered), []).append(pos)
+        self.lengths[pos] = len(lowered)
+
+
+class CandidateIndex:
+    """
+    Blocking index over the user sheet for ``extract_similar_tm``.
+
+    Rows are grouped by class once, and inside each class every mark is indexed
+    by the metaphone codes of its words and by the character n-grams of its
+    lowercase form. ``candidates`` only drops pairs that can neither match
+    phonetically (no shared code) nor reach the fuzzy threshold, so scoring the
+    candidates gives the same result as scoring the whole class.
+    """
+
+    def __init__(self, records: list, similarity_threshold: int = 80, cache: PhoneticCache | None = None):
+        # (app_number, trademark, class) rows in user sheet order, e.g. doc_utils.records.TrademarkColumns
+        self.records = records
+        self.cache = cache if cache is not None else PhoneticCache()
+        # 1 point below the threshold keeps the bound safe against fuzz.ratio rounding
+        self.ratio_floor = (similarity_threshold - 1) / 100
+        self._buckets = {}
+
+        for pos, (_, trademark, tm_class) in enumerate(records):
+            if not isinstance(trademark, str) or _is_missing(tm_class):
+                continue
+            bucket = self._buckets.setdefault(tm_class, _ClassBucket())
+            bucket.add(pos, trademark, {code for _, code in self.cache.word_table(trademark)})
+
+    def _min_shared_ngrams(self, len_a: int, len_b: int) -> int:
+        # fuzz.ratio is at most 2 * LCS / (len_a + len_b), so a passing pair keeps at
+        # least this many characters in common and needs at most this many indels.
+        min_lcs = math.floor(self.ratio_floor * (len_a + len_b) / 2)
+        deletions = len_a - min_lcs
+        insertions = len_b - min_lcs
+        # an indel destroys at most NGRAM_SIZE n-grams of the side it is applied to
+        return max(
+            len_a - NGRAM_SIZE + 1 - NGRAM_SIZE * deletions - (NGRAM_SIZE - 1) * insertions,
+            len_b - NGRAM_SIZE + 1 - NGRAM_SIZE * insertions - (NGRAM_SIZE - 1) * deletions,
+        )
+
+    def _bucket(self, tm_class) -> _ClassBucket | None:
+        if _is_missing(tm_class):
+            return None
+        return self._buckets.get(tm_class)
+
+    def class_members(self, tm_class) -> tuple[list, list]:
+        """Positions and lowercase marks of every row in ``tm_class``, in sheet order."""
+        bucket = self._bucket(tm_class)
+        if bucket is None:
+            return [], []
+        return bucket.positions, bucket.lowered
+
+    def phonetic_candidates(self, trademark: str, tm_class) -> set:
+        """Positions in ``records`` sharing a metaphone code with a substring of ``trademark``."""
+        bucket = self._bucket(tm_class)
+        if bucket is None:
+            return set()
+
+        found = set()
+        for code in self.cache.substring_table(trademark):
+            found.update(bucket.by_code.get(code, ()))
+        return found
+
+    def candidates(self, trademark: str, tm_class) -> list:
+        """Positions in ``records`` worth scoring against ``trademark``, in sheet order."""
+        bucket = self._bucket(tm_class)
+        if bucket is None:
+            return []
+
+        found = self.phonetic_candidates(trademark, tm_class)
+
+        lowered = trademark.lower()
+        len_a = len(lowered)
+
+        needed = {}
+        for len_b, positions in bucket.by_length.items():
+            if 2 * min(len_a, len_b) < self.ratio_floor * (len_a + len_b):
+                continue
+            min_shared = self._min_shared_ngrams(len_a, len_b)
+            if min_shared <= 0:
+                found.update(positions)
+            else:
+                needed[len_b] = min_shared
+
+        if needed:
+            shared = Counter()
+            for gram, count in _ngrams(lowered).items():
+                for pos, user_count in bucket.by_ngram.get(gram, ()):
+                    shared[pos] += min(count, user_count)
+
+            for pos, count in shared.items():
+                min_shared = needed.get(bucket.lengths[pos])
+                if min_shared is not None and count >= min_shared:
+                    found.add(pos)
+
+        return sorted(found)
@@ -0,0 +1,250 @@
+import hashlib
+import logging
+import sqlite3
+import sys
+from array import array
+from concurrent.futures import ProcessPoolExecutor
+
+from doc_utils.records import read_trademark_columns
+from doc_utils.trademark_store import normalize_application_number
+from fuzzer.phonetics import (
+    PhoneticCache,
+    _word_table,
+    clean_trademark,
+    get_metaphone_code,
+    split_trademark_into_substrings,
+)
+
+DEFAULT_FINGERPRINT_PATH = 'data/extracted/fingerprints.sqlite'
+
+# bump when phonetics.py changes what a fingerprint holds, the index is then rebuilt
+FINGERPRINT_VERSION = 2
+
+# code positions, unsigned 32-bit: a long mark can have more than 65535 distinct substring codes
+_CODE_TYPE = 'I'
+_CODE_SIZE = array(_CODE_TYPE).itemsize
+
+_TABLE = 'fingerprints'
+_BUILD_CHUNK_SIZE = 2000
+
+
+def content_hash(trademark: str) -> int:
+    return int.from_bytes(hashlib.blake2b(trademark.encode('utf-8'), digest_size=8).digest(), 'big', signed=True)
+
+
+def fingerprint(trademark: str) -> tuple:
+    """
+    (lowercase form, cleaned form, word codes, substring codes, code of each substring).
+
+    The substrings themselves are not stored, slicing the cleaned form again is
+    cheap; the metaphone code of each one is what costs. Codes are kept once
+    each, space separated, and every substring refers to its code by position.
+    """
+    cleaned = clean_trademark(trademark, 0)
+    codes = {}
+    code_of = array(_CODE_TYPE)
+    for substring in split_trademark_into_substrings(cleaned):
+        code_of.append(codes.setdefault(get_metaphone_code(substring), len(codes)))
+    words = [code for _, code in _word_table(trademark)]
+    return trademark.lower(), cleaned, ' '.join(words), ' '.join(codes), code_of.tobytes()
+
+
+def substring_codes(trademark: str) -> list:
+    """The distinct metaphone codes of the substrings of ``trademark``, as stored in its fingerprint."""
+    _, _, _, codes, code_of = fingerprint(trademark)
+    return codes.split(' ') if code_of else []
+
+
+def _fingerprint_rows(marks: list) -> list:
+    return [(app_number, content_hash(trademark), *fingerprint(trademark)) for app_number, trademark in marks]
+
+
+class StoredSubstringTable:
+    """
+    Read-only stand-in for the dict of ``phonetics._substring_table`` built from
+    a stored fingerprint. Iterating yields the codes; substrings are sliced out
+    only for the codes that are looked up, which matching does for a handful.
+    """
+
+    __slots__ = ('cleaned', 'codes', 'code_of')
+
+    def __init__(self, cleaned: str, codes: str, code_of: bytes):
+        self.cleaned = cleaned
+        self.codes = codes.split(' ') if code_of else []
+        self.code_of = code_of
+
+    def __iter__(self):
+        return iter(self.codes)
+
+    def __len__(self) -> int:
+        return len(self.codes)
+
+    def __contains__(self, code) -> bool:
+        return code in self.codes
+
+    def get(self, code, default=None):
+        try:
+            position = self.codes.index(code)
+        except ValueError:
+            return default
+
+        # substrings come in split order: every start i, then every end from i + 4
+        length = len(self.cleaned)
+        pattern = array(_CODE_TYPE, [position]).tobytes()
+        substrings = []
+        row_start, i = 0, 0
+        offset = self.code_of.find(pattern)
+        while offset != -1:
+            if offset % _CODE_SIZE == 0:
+                k = offset // _CODE_SIZE
+                while k >= row_start + max(length - i - 3, 0):
+                    row_start += max(length - i - 3, 0)
+                    i += 1
+                substrings.append(self.cleaned[i:i + 4 + k - row_start])
+            offset = self.code_of.find(pattern, offset + 1)
+        return substrings
+
+    def to_dict(self) -> dict:
+        return {code: self.get(code) for code in self.codes}
+
+    def __sizeof__(self) -> int:
+        # what PhoneticCache budgets, the substrings are sliced out on lookup and not kept
+        return (object.__sizeof__(self) + sys.getsizeof(self.cleaned) + sys.getsizeof(self.code_of)
+                + sys.getsizeof(self.codes) + sum(sys.getsizeof(code) for code in self.codes))
+
+
+class FingerprintIndex:
+    """
+    On-disk phonetic fingerprints of the trademark corpus, keyed by application
+    number with a hash of the mark, so ``extract_similar_tm`` does not
+    re-encode every substring of every corpus mark on each run.
+
+    ``update`` only fingerprints rows that are new or whose mark changed. The
+    SQLite file is opened on first use and memory-mapped, so worker processes
+    share the page cache instead of each holding a copy.
+    """
+
+    def __init__(self, path: str = DEFAULT_FINGERPRINT_PATH, mmap_size: int = 1 << 30):
+        self.path = path
+        self.mmap_size = mmap_size
+        self.hits = 0
+        self.misses = 0
+        self._conn = None
+
+    def _connection(self) -> sqlite3.Connection:
+        if self._conn is None:
+            # the similarity service loads in one thread and queries from another
+            self._conn = sqlite3.connect(self.path, check_same_thread=False)
+            self._conn.execute(f"PRAGMA mmap_size = {int(self.mmap_size)}")
+            version = self._conn.execute("PRAGMA user_version").fetchone()[0]
+            if version != FINGERPRINT_VERSION:
+                self._conn.execute(f"DROP TABLE IF EXISTS {_TABLE}")
+                self._conn.execute(f"PRAGMA user_version = {FINGERPRINT_VERSION}")
+            self._conn.execute(
+                f"CREATE TABLE IF NOT EXISTS {_TABLE} ("
+                "app_number PRIMARY KEY, content_hash INTEGER NOT NULL, lowered TEXT, cleaned TEXT, "
+                "words TEXT, codes TEXT, code_of BLOB) WITHOUT ROWID"
+            )
+        return self._conn
+
+    def __enter__(self):
+        self._connection()
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
+
+    def close(self):
+        if self._conn is not None:
+            self._conn.close()
+            self._conn = None
+
+    def __len__(self) -> int:
+        return self._connection().execute(f"SELECT COUNT(*) FROM {_TABLE}").fetchone()[0]
+
+    def __getstate__(self):
+        # handed to worker processes unopened, each opens its own connection
+        state = self.__dict__.copy()
+        state['_conn'] = None
+        return state
+
+    def update(self, marks, workers: int = 1) -> int:
+        """
+        Fingerprint the (app_number, trademark) pairs that are new or whose mark
+        changed since the last update. Returns how many were (re)computed.
+        """
+        conn = self._connection()
+        known = dict(conn.execute(f"SELECT app_number, content_hash FROM {_TABLE}"))
+        stale = [
+            (app_number, trademark) for app_number, trademark in marks
+            if known.get(app_number) != content_hash(trademark)
+        ]
+        if not stale:
+            return 0
+
+        logging.info(f"Fingerprinting {len(stale)} new or changed trademarks into {self.path}...")
+        chunks = [stale[i:i + _BUILD_CHUNK_SIZE] for i in range(0, len(stale), _BUILD_CHUNK_SIZE)]
+        if workers > 1:
+            with ProcessPoolExecutor(max_workers=workers) as executor:
+                results = executor.map(_fingerprint_rows, chunks)
+                for rows in results:
+                    conn.executemany(f"INSERT OR REPLACE INTO {_TABLE} VALUES (?, ?, ?, ?, ?, ?, ?)", rows)
+        else:
+            for chunk in chunks:
+                conn.executemany(f"INSERT OR REPLACE INTO {_TABLE} VALUES (?, ?, ?, ?, ?, ?, ?)",
+                                 _fingerprint_rows(chunk))
+        conn.commit()
+        return len(stale)
+
+    def preload(self, marks: list, cache: PhoneticCache):
+        """
+        Put the stored substring tables of (app_number, trademark) pairs into
+        ``cache``. Pairs missing from the index, or whose mark changed, are left
+        to the cache to compute.
+        """
+        by_number = {normalize_application_number(app_number): trademark for app_number, trademark in marks}
+        numbers = list(by_number)
+        hits = 0
+        conn = self._connection()
+        # SQLite caps bound parameters, 900 stays under every version's limit
+        for start in range(0, len(numbers), 900):
+            batch = numbers[start:start + 900]
+            rows = conn.execute(
+                f"SELECT app_number, content_hash, cleaned, codes, code_of FROM {_TABLE} "
+                f"WHERE app_number IN ({', '.join('?' * len(batch))})",
+                batch,
+            )
+            for app_number, stored_hash, cleaned, codes, code_of in rows:
+                trademark = by_number[app_number]
+                if stored_hash == content_hash(trademark):
+                    cache.add_substring_table(trademark, StoredSubstringTable(cleaned, codes, code_of))
+                    hits += 1
+        self.hits += hits
+        self.misses += len(numbers) - hits
+
+    def iter_codes(self):
+        """(app_number, content_hash, substring codes) of every fingerprint."""
+        for app_number, stored_hash, codes, code_of in self._connection().execute(
+                f"SELECT app_number, content_hash, codes, code_of FROM {_TABLE}"):
+            yield app_number, stored_hash, codes.split(' ') if code_of else []
+
+    def stats(self) -> dict:
+        return {'hits': self.hits, 'misses': self.misses}
+
+
+def corpus_marks(trademark_sheet: str) -> list:
+    """(application number, mark) pairs of the corpus, as keyed in the index."""
+    columns = read_trademark_columns(trademark_sheet)
+    return [(columns.app_number(pos), columns.trademarks[pos]) for pos in columns.positions()]
+
+
+def update_fingerprint_index(
+        trademark_sheet: str,
+        index_path: str = DEFAULT_FINGERPRINT_PATH,
+        workers: int = 1,
+) -> int:
+    """Bring the index at ``index_path`` up to date with the corpus, returns how many marks were fingerprinted."""
+    with FingerprintIndex(index_path) as index:
+        updated = index.update(corpus_marks(trademark_sheet), workers)
+        logging.info(f"Fingerprint index {index_path}: {updated} updated, {len(index)} total")
+        return updated
@@ -0,0 +1,163 @@
+import csv
+import json
+import logging
+import os
+
+from openpyxl import Workbook
+
+RANKED_COLUMNS = [
+    'TM Application No.', 'Rank', 'Matched Application No.', 'Matched Trademark', 'Score', 'Phonetic Evidence',
+]
+
+# data rows per sheet, an xlsx sheet holds 1048576 rows including the header
+_MAX_SHEET_ROWS = 1_048_575
+
+
+def _to_json(value):
+    # numpy scalars coming out of pandas rows
+    if hasattr(value, 'item'):
+        return value.item()
+    raise TypeError(f"Object of type {type(value).__name__} is not JSON serializable")
+
+
+def file_fingerprint(path: str) -> dict:
+    """Path, size and modification time of an input, a resumed run has to see the same ones."""
+    stat = os.stat(path)
+    return {'path': os.path.abspath(path), 'size': stat.st_size, 'mtime_ns': stat.st_mtime_ns}
+
+
+class MatchJournal:
+    """
+    Append-only JSONL journal of ``extract_similar_tm`` results.
+
+    Matches are appended as they are produced and a checkpoint line records the
+    last processed row, so an interrupted run can resume after it. The xlsx
+    output is exported from the journal once, streaming, at the end.
+    """
+
+    def __init__(self, path: str, sources: dict):
+        self.path = path
+        self.sources = sources
+        self.completed_idx = -1
+        self._file = None
+
+    def open(self, resume: bool = False):
+        logger = logging.getLogger(__name__)
+
+        if resume and os.path.exists(self.path):
+            end_offset = self._scan()
+            if end_offset is not None:
+                # drop matches written after the last checkpoint, they are recomputed
+                self._file = open(self.path, 'r+', encoding='utf-8')
+                self._file.seek(end_offset)
+                self._file.truncate()
+                logger.info(f"Resuming from journal {self.path} after row {self.completed_idx + 1}")
+                return self
+            logger.warning(f"Journal {self.path} does not match these sheets or they changed since, starting over")
+
+        self.completed_idx = -1
+        self._file = open(self.path, 'w', encoding='utf-8')
+        self._write({'sources': self.sources})
+        self._file.flush()
+        return self
+
+    def _scan(self) -> int | None:
+        end_offset = None
+        with open(self.path, 'rb') as file:
+            offset = 0
+            for line in file:
+                offset += len(line)
+                try:
+                    entry = json.loads(line)
+                except ValueError:
+                    break  # torn write at the end of a killed run
+                if 'sources' in entry:
+                    if entry['sources'] != self.sources:
+                        return None
+                    end_offset = offset
+                elif 'checkpoint' in entry:
+                    self.completed_idx = entry['checkpoint']
+                    end_offset = offset
+        return end_offset
+
+    def _write(self, entry: dict):
+        self._file.write(json.dumps(entry, default=_to_json) + '\n')
+
+    def append(self, idx: int, app_number, matched_data: list):
+        self._write({'idx': idx, 'app': app_number, 'matched': matched_data})
+
+    def checkpoint(self, idx: int):
+        self._write({'checkpoint': idx})
+        self._file.flush()
+        self.completed_idx = idx
+
+    def close(self):
+        if self._file is not None:
+            self._file.close()
+            self._file = None
+
+    def iter_matches(self):
+        """Yield ``(app_number, matched)`` for every checkpointed row with matches."""
+        with open(self.path, 'r', encoding='utf-8') as file:
+            pending = []
+            for line in file:
+                try:
+                    entry = json.loads(line)
+                except ValueError:
+                    break
+                if 'idx' in entry:
+                    pending.append((entry['app'], entry['matched']))
+                elif 'checkpoint' in entry:
+                    yield from pending
+                    pending = []
+
+    def export_xlsx(self, output_sheet: str) -> int:
+        width = max((len(matched) for _, matched in self.iter_matches()), default=0)
+
+        workbook = Workbook(write_only=True)
+        sheet = workbook.create_sheet('Sheet1')
+        sheet.append(['TM Application No.'] + [f'matched{i + 1}' for i in range(width)])
+
+        rows = 0
+        for app_number, matched in self.iter_matches():
+            sheet.append([app_number] + matched)
+            rows += 1
+
+        workbook.save(output_sheet)
+        return rows
+
+    def iter_ranked_rows(self):
+        """Rows of ``RANKED_COLUMNS``, one per match of a ranked run."""
+        for app_number, matched in self.iter_matches():
+            for rank, (matched_app_number, matched_trademark, score, evidence) in enumerate(matched, start=1):
+                yield [app_number, rank, matched_app_number, matched_trademark, score, evidence]
+
+    def export_ranked(self, output_sheet: str) -> int:
+        """
+        Long format output of a ranked run, streamed from the journal into a
+        .csv, or an .xlsx that continues on a new sheet when one is full.
+        Returns the number of trademarks with matches.
+        """
+        trademarks = sum(1 for _ in self.iter_matches())
+
+        if output_sheet.lower().endswith('.csv'):
+            with open(output_sheet, 'w', newline='', encoding='utf-8') as file:
+                writer = csv.writer(file)
+                writer.writerow(RANKED_COLUMNS)
+                writer.writerows(self.iter_ranked_rows())
+            return trademarks
+
+        workbook = Workbook(write_only=True)
+        sheet = None
+        sheet_rows = _MAX_SHEET_ROWS
+        for row in self.iter_ranked_rows():
+            if sheet_rows == _MAX_SHEET_ROWS:
+                sheet = workbook.create_sheet(f'Sheet{len(workbook.worksheets) + 1}')
+                sheet.append(RANKED_COLUMNS)
+                sheet_rows = 0
+            sheet.append(row)
+            sheet_rows += 1
+        if sheet is None:
+            workbook.create_sheet('Sheet1').append(RANKED_COLUMNS)
+        workbook.save(output_sheet)
+        return trademarks
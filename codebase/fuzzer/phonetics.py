@@ -0,0 +1,152 @@
+import re
+import sys
+from collections import OrderedDict
+
+import jellyfish
+from fuzzywuzzy import fuzz
+from rapidfuzz import fuzz as rapid_fuzz
+
+
+def trademark_spelling_similarity(trademark1, trademark2):
+    similarity_ratio = fuzz.ratio(trademark1.lower(), trademark2.lower())
+    return similarity_ratio
+
+
+def _could_be_similar(word1, word2):
+    """
+    False when ``trademark_spelling_similarity`` cannot exceed 73. difflib's
+    matching blocks form a common subsequence, so rapidfuzz's ratio (from the
+    longest one) is never below fuzzywuzzy's, and costs a fraction of it.
+    """
+    return rapid_fuzz.ratio(word1.lower(), word2.lower()) >= 73
+
+
+def clean_trademark(trademark, switch):
+    if switch == 1:
+        return re.sub(r'[^a-zA-Z\s]', '', trademark)
+    else:
+        return re.sub(r'[^a-zA-Z]', '', trademark)
+
+
+def get_metaphone_code(word):
+    return jellyfish.metaphone(word)
+
+
+def split_trademark_into_substrings(trademark):
+    words = []
+    length = len(trademark)
+
+    for i in range(length):
+        for j in range(i + 4, length + 1):
+            words.append(trademark[i:j])
+    return words
+
+
+def _word_table(trademark):
+    return [(word, get_metaphone_code(word)) for word in clean_trademark(trademark, 1).split()]
+
+
+def _substring_table(trademark):
+    table = {}
+    for substring in split_trademark_into_substrings(clean_trademark(trademark, 0)):
+        table.setdefault(get_metaphone_code(substring), []).append(substring)
+    return table
+
+
+def _table_bytes(table) -> int:
+    """Approximate memory held by a substring table, a built dict or a stand-in reporting its own __sizeof__."""
+    if not isinstance(table, dict):
+        return sys.getsizeof(table)
+    return sys.getsizeof(table) + sum(
+        sys.getsizeof(code) + sys.getsizeof(substrings) + sum(sys.getsizeof(substring) for substring in substrings)
+        for code, substrings in table.items()
+    )
+
+
+class PhoneticCache:
+    """
+    Per-trademark phonetic tables, shared across a matching run so each mark is
+    cleaned, split and encoded once instead of once per pair.
+
+    User-side word tables are small and reused on every row, they are kept in
+    an LRU of ``maxsize`` entries. A corpus-side substring table is quadratic in
+    the mark's length (about 13 KB for 14 letters) and is used by one row, so
+    those get a separate LRU bounded by ``substring_bytes``.
+    """
+
+    def __init__(self, maxsize: int = 200_000, substring_bytes: int = 64 << 20):
+        self.maxsize = maxsize
+        self.substring_bytes = substring_bytes
+        self.hits = 0
+        self.misses = 0
+        self._entries = OrderedDict()
+        # trademark -> (table, its size), with the total kept in _substring_size
+        self._substrings = OrderedDict()
+        self._substring_size = 0
+
+    def word_table(self, trademark: str) -> list:
+        """(word, metaphone code) pairs of the user side of ``phonetic_substring_match``."""
+        try:
+            value = self._entries[trademark]
+        except KeyError:
+            self.misses += 1
+            value = self._entries[trademark] = _word_table(trademark)
+            if len(self._entries) > self.maxsize:
+                self._entries.popitem(last=False)
+        else:
+            self.hits += 1
+            self._entries.move_to_end(trademark)
+        return value
+
+    def substring_table(self, trademark: str) -> dict:
+        """Metaphone code -> substrings (in split order) of our side of ``phonetic_substring_match``."""
+        try:
+            table, _ = self._substrings[trademark]
+        except KeyError:
+            self.misses += 1
+            table = _substring_table(trademark)
+            self.add_substring_table(trademark, table)
+        else:
+            self.hits += 1
+            self._substrings.move_to_end(trademark)
+        return table
+
+    def add_substring_table(self, trademark: str, table: dict):
+        """Seed the cache with a table computed elsewhere, e.g. read from a fingerprint index."""
+        previous = self._substrings.pop(trademark, None)
+        if previous is not None:
+            self._substring_size -= previous[1]
+        size = _table_bytes(table)
+        self._substrings[trademark] = (table, size)
+        self._substring_size += size
+        # the newest table stays even when it alone is over the budget, its row is about to use it
+        while self._substring_size > self.substring_bytes and len(self._substrings) > 1:
+            _, (_, evicted) = self._substrings.popitem(last=False)
+            self._substring_size -= evicted
+
+    def stats(self) -> dict:
+        return {
+            'hits': self.hits,
+            'misses': self.misses,
+            'size': len(self._entries),
+            'maxsize': self.maxsize,
+            'substring_tables': len(self._substrings),
+            'substring_bytes': self._substring_size,
+        }
+
+
+def phonetic_substring_match(trademark1, trademark2, cache: PhoneticCache | None = None):
+    matched_words = []
+
+    if cache is None:
+        user_words = _word_table(trademark1)
+        our_substrings = _substring_table(trademark2)
+    else:
+        user_words = cache.word_table(trademark1)
+        our_substrings = cache.substring_table(trademark2)
+
+    for myword, client_code in user_words:
+        for theirword in our_substrings.get(client_code, ()):
+            if _could_be_similar(myword, theirword) and trademark_spelling_similarity(myword, theirword) > 73:
+                matched_words.append("'{}' matched with '{}'".format(myword, theirword))
+    return matched_words
@@ -1,129 +1,342 @@
-import pandas as pd
-import re
-import jellyfish
+import heapq
+
+import numpy as np
 from fuzzywuzzy import fuzz
+from rapidfuzz import fuzz as rapid_fuzz, process
 import logging
+import os
+from concurrent.futures import ProcessPoolExecutor
 
-logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
-
+from doc_utils.records import read_trademark_columns
+from fuzzer.candidate_index import CandidateIndex
+from fuzzer.fingerprint_index import FingerprintIndex
+from fuzzer.match_journal import MatchJournal, file_fingerprint
+from fuzzer.phonetics import PhoneticCache, phonetic_substring_match
 
-def trademark_spelling_similarity(trademark1, trademark2):
-    similarity_ratio = fuzz.ratio(trademark1.lower(), trademark2.lower())
-    return similarity_ratio
+logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
 
 
-def clean_trademark(trademark, switch):
-    if switch == 1:
-        return re.sub(r'[^a-zA-Z\s]', '', trademark)
-    else:
-        return re.sub(r'[^a-zA-Z]', '', trademark)
+WORKER_CHUNK_SIZE = 200
 
+# scoring backends for the fuzzy fallback, both score with fuzzywuzzy's fuzz.ratio; batch
+# finds the candidates that can reach the threshold with one rapidfuzz call per class first
+BATCH_SCORING = 'batch'
+PAIRWISE_SCORING = 'pairwise'
 
-def get_metaphone_code(word):
-    return jellyfish.metaphone(word)
+# set once per worker process by _init_worker
+_worker_index = None
+_worker_threshold = None
+_worker_scoring = None
+_worker_fingerprints = None
+_worker_top_k = None
 
 
-def split_trademark_into_substrings(trademark):
-    words = []
-    length = len(trademark)
+def match_trademark(my_trademark, my_class, index: CandidateIndex, similarity_threshold: int) -> list:
+    logger = logging.getLogger(__name__)
 
-    for i in range(length):
-        for j in range(i + 4, length + 1):
-            words.append(trademark[i:j])
-    return words
+    matched_data = []
+    for pos in index.candidates(my_trademark, my_class):
+        user_app_number, user_trademark, _ = index.records[pos]
+
+        matched_phonetic = phonetic_substring_match(user_trademark, my_trademark, index.cache)
+
+        if matched_phonetic:
+            matched_data.append(user_app_number)  # Store the application number
+            logger.info(f"Phonetic match found with TM: {user_trademark}")
+
+        else:
+            similarity_score = fuzz.ratio(my_trademark.lower(), user_trademark.lower())
+            if similarity_score >= similarity_threshold:
+                matched_data.append(user_app_number)  # Store the application number
+                logger.info(f"  Fuzzy match: '{user_trademark}' (Score: {similarity_score}, App No: {user_app_number})")
+
+    return matched_data
+
+
+def _rank_matches(my_trademark, fuzzy_scores: dict, phonetic: set, index: CandidateIndex,
+                  similarity_threshold: int, top_k: int) -> list:
+    """
+    The ``top_k`` best matches of ``my_trademark`` as [app_number, trademark,
+    score, phonetic evidence], best first. A candidate matches as in
+    ``match_trademark``; matches rank by fuzzy score, a phonetic one first on
+    a tie. Candidates are visited by falling score into a heap of ``top_k``:
+    once it is full, no later candidate can enter it, so the phonetic check of
+    the rest is skipped.
+    """
+    lowered = my_trademark.lower()
+    scored = [(score, pos) for pos, score in fuzzy_scores.items()]
+    # phonetic candidates below the fuzzy cutoff still need a score to rank by
+    scored.extend(
+        (fuzz.ratio(lowered, index.records[pos][1].lower()), pos)
+        for pos in phonetic if pos not in fuzzy_scores
+    )
+    scored.sort(key=lambda item: (-item[0], item[1]))
+
+    heap = []
+    for score, pos in scored:
+        if len(heap) == top_k and score < heap[0][0]:
+            break
+        evidence = phonetic_substring_match(index.records[pos][1], my_trademark, index.cache) if pos in phonetic else []
+        if not evidence and score < similarity_threshold:
+            continue
+        # -pos keeps the earlier row on a full tie, and entries never compare past it
+        entry = (score, bool(evidence), -pos, evidence)
+        if len(heap) < top_k:
+            heapq.heappush(heap, entry)
+        else:
+            heapq.heappushpop(heap, entry)
+
+    return [
+        [index.records[-neg_pos][0], index.records[-neg_pos][1], score, '; '.join(evidence)]
+        for score, _, neg_pos, evidence in sorted(heap, reverse=True)
+    ]
+
+
+def rank_trademark(my_trademark, my_class, index: CandidateIndex, similarity_threshold: int, top_k: int) -> list:
+    """``match_trademark`` in ranked mode, see ``_rank_matches``."""
+    lowered = my_trademark.lower()
+    fuzzy_scores = {
+        pos: fuzz.ratio(lowered, index.records[pos][1].lower())
+        for pos in index.candidates(my_trademark, my_class)
+    }
+    return _rank_matches(my_trademark, fuzzy_scores, index.phonetic_candidates(my_trademark, my_class),
+                         index, similarity_threshold, top_k)
+
+
+def _log_row(idx, total, my_trademark, my_class):
+    logging.getLogger(__name__).info(
+        f"\n[{idx + 1}/{total}] Processing trademark: {my_trademark} (Class: {my_class})")
+
+
+def _batch_match_class(rows: list, index: CandidateIndex, my_class, similarity_threshold: int, total: int,
+                       top_k: int | None = None) -> list:
+    logger = logging.getLogger(__name__)
 
+    positions, user_lowered = index.class_members(my_class)
+    if not positions:
+        for idx, _, my_trademark, _ in rows:
+            _log_row(idx, total, my_trademark, my_class)
+        return [[] for _ in rows]
+
+    # one vectorized call per class. rapidfuzz's ratio is never below fuzzywuzzy's (see
+    # phonetics._could_be_similar), 1 point below the threshold also covers its rounding
+    scores = process.cdist(
+        [my_trademark.lower() for _, _, my_trademark, _ in rows],
+        user_lowered,
+        scorer=rapid_fuzz.ratio,
+        score_cutoff=similarity_threshold - 1,
+    )
+
+    matched_per_row = []
+    for (idx, _, my_trademark, _), row_scores in zip(rows, scores):
+        _log_row(idx, total, my_trademark, my_class)
+        # only the few marks past the bound get the exact, slower fuzzywuzzy score
+        lowered = my_trademark.lower()
+        fuzzy_scores = {
+            positions[j]: fuzz.ratio(lowered, user_lowered[j])
+            for j in np.flatnonzero(row_scores)
+        }
+        phonetic = index.phonetic_candidates(my_trademark, my_class)
+
+        if top_k:
+            matched_per_row.append(
+                _rank_matches(my_trademark, fuzzy_scores, phonetic, index, similarity_threshold, top_k))
+            continue
+
+        matched_data = []
+        for pos in sorted(phonetic | fuzzy_scores.keys()):
+            user_app_number, user_trademark, _ = index.records[pos]
+
+            if phonetic_substring_match(user_trademark, my_trademark, index.cache):
+                matched_data.append(user_app_number)
+                logger.info(f"Phonetic match found with TM: {user_trademark}")
+
+            elif fuzzy_scores.get(pos, 0) >= similarity_threshold:
+                matched_data.append(user_app_number)
+                logger.info(f"  Fuzzy match: '{user_trademark}' (Score: {fuzzy_scores[pos]}, App No: {user_app_number})")
+
+        matched_per_row.append(matched_data)
+    return matched_per_row
+
+
+def _match_rows(
+        rows: list,
+        index: CandidateIndex,
+        similarity_threshold: int,
+        total: int,
+        scoring: str,
+        fingerprints: FingerprintIndex | None = None,
+        top_k: int | None = None,
+) -> list:
+    if fingerprints is not None:
+        # stored substring tables of the chunk's marks, the rest are computed on demand
+        fingerprints.preload([(my_app_number, my_trademark) for _, my_app_number, my_trademark, _ in rows],
+                             index.cache)
+
+    if scoring == PAIRWISE_SCORING:
+        matched_per_row = []
+        for idx, _, my_trademark, my_class in rows:
+            _log_row(idx, total, my_trademark, my_class)
+            if top_k:
+                matched_per_row.append(rank_trademark(my_trademark, my_class, index, similarity_threshold, top_k))
+            else:
+                matched_per_row.append(match_trademark(my_trademark, my_class, index, similarity_threshold))
+    else:
+        by_class = {}
+        for row_pos, (_, _, _, my_class) in enumerate(rows):
+            by_class.setdefault(my_class, []).append(row_pos)
 
-def phonetic_substring_match(trademark1, trademark2):
-    matched_words = []
+        matched_per_row = [None] * len(rows)
+        for my_class, row_positions in by_class.items():
+            class_rows = [rows[row_pos] for row_pos in row_positions]
+            for row_pos, matched_data in zip(
+                    row_positions,
+                    _batch_match_class(class_rows, index, my_class, similarity_threshold, total, top_k)):
+                matched_per_row[row_pos] = matched_data
 
-    cleaned_user_tm = clean_trademark(trademark1, 1)
-    cleaned_our_tm = clean_trademark(trademark2, 0)
+    return [
+        (idx, my_app_number, matched_data)
+        for (idx, my_app_number, _, _), matched_data in zip(rows, matched_per_row)
+    ]
 
-    trademark1_substrings = cleaned_user_tm.split()
-    trademark2_substrings = split_trademark_into_substrings(cleaned_our_tm)
 
-    for myword in trademark1_substrings:
-        client_code = get_metaphone_code(myword)
+def _init_worker(index: CandidateIndex, similarity_threshold: int, scoring: str,
+                 fingerprints: FingerprintIndex | None = None, top_k: int | None = None):
+    global _worker_index, _worker_threshold, _worker_scoring, _worker_fingerprints, _worker_top_k
+    _worker_index = index
+    _worker_threshold = similarity_threshold
+    _worker_scoring = scoring
+    _worker_fingerprints = fingerprints
+    _worker_top_k = top_k
 
-        for theirword in trademark2_substrings:
-            their_code = get_metaphone_code(theirword)
 
-            if client_code == their_code:
-                if trademark_spelling_similarity(myword, theirword) > 73:
-                    matched_words.append("'{}' matched with '{}'".format(myword, theirword))
-    return matched_words
+def _match_rows_in_worker(rows: list, total: int) -> list:
+    return _match_rows(rows, _worker_index, _worker_threshold, total, _worker_scoring, _worker_fingerprints,
+                       _worker_top_k)
 
 
 def extract_similar_tm(
         user_sheet: str,
         trademark_sheet: str,
         output_sheet: str = 'data/extracted/sim.xlsx',
+        workers: int = 1,
+        scoring: str = PAIRWISE_SCORING,
+        resume: bool = False,
+        fingerprint_index: str | None = None,
+        top_k: int | None = None,
 ):
+    """
+    ``scoring`` picks the fuzzy backend: PAIRWISE_SCORING scores each indexed
+    candidate with fuzz.ratio, BATCH_SCORING finds the candidates of a class
+    with rapidfuzz first. Both give the same matches and scores, batch is
+    faster on large classes.
+
+    With ``fingerprint_index`` (see fuzzer.fingerprint_index) the corpus marks'
+    phonetic tables are read from the index instead of computed; marks missing
+    from it or changed since it was updated are computed as usual.
+
+    With ``top_k`` only the ``top_k`` best matches of each trademark are kept,
+    and ``output_sheet`` (.xlsx or .csv) gets one row per match with its rank,
+    fuzzy score and phonetic evidence instead of matched1..N columns.
+
+    Returns False when the run failed (its partial results are saved), True
+    otherwise.
+    """
     similarity_threshold: int = 80
     save_interval: int = 10
 
     logger = logging.getLogger(__name__)
 
     logger.info("Loading trademark and user sheets...")
-    my_sheet = pd.read_excel(trademark_sheet)
-    user_sheet = pd.read_excel(user_sheet)
-
-    results = pd.DataFrame()
-
-    logger.info("Processing trademarks with phonetic and fuzzy matching...")
-
+    user_sheet_path = user_sheet
+    # column by column with interned classes, a DataFrame row per mark costs far more (see doc_utils.records)
+    my_sheet = read_trademark_columns(trademark_sheet)
+    user_sheet = read_trademark_columns(user_sheet)
+
+    cache = PhoneticCache()
+    # opened lazily, by this process or by each worker on its first chunk
+    fingerprints = FingerprintIndex(fingerprint_index) if fingerprint_index else None
+
+    logger.info("Indexing user sheet by class, metaphone codes and n-grams...")
+    index = CandidateIndex(user_sheet, similarity_threshold=similarity_threshold, cache=cache)
+
+    rows = [(idx, *my_sheet[idx]) for idx in my_sheet.positions()]
+    total = len(my_sheet)
+
+    # the corpus store changes with every scrape, a resumed run must not mix in matches against an older one
+    sources = {
+        'user_sheet': file_fingerprint(user_sheet_path),
+        'trademark_sheet': file_fingerprint(trademark_sheet),
+    }
+    if top_k:
+        # a ranked journal holds other entries, it must not resume an unranked run or another k
+        sources['top_k'] = top_k
+    journal = MatchJournal(f"{os.path.splitext(output_sheet)[0]}.journal.jsonl", sources=sources).open(resume=resume)
+    export = journal.export_ranked if top_k else journal.export_xlsx
+    rows = [row for row in rows if row[0] > journal.completed_idx]
+
+    logger.info(f"Processing trademarks with phonetic and {scoring} fuzzy matching on {workers} worker(s)...")
+
+    chunks = [rows[i:i + WORKER_CHUNK_SIZE] for i in range(0, len(rows), WORKER_CHUNK_SIZE)]
+
+    executor = None
+    last_idx = journal.completed_idx
     try:
-        for idx, my_row in my_sheet.iterrows():
-            my_trademark = my_row['TM Applied For']
-            my_app_number = my_row['TM Application No.']
-            my_class = my_row['Class']
-
-            if not isinstance(my_trademark, str):
-                continue
-
-            logger.info(f"\n[{idx + 1}/{len(my_sheet)}] Processing trademark: {my_trademark} (Class: {my_class})")
-
-            matched_data = []
-            for _, user_row in user_sheet.iterrows():
-                user_trademark = user_row['TM Applied For']
-                user_app_number = user_row['TM Application No.']
-                user_class = user_row['Class']
-
-                if not isinstance(user_trademark, str):
-                    continue
-
-                if user_class != my_class:
-                    continue
-
-                matched_phonetic = phonetic_substring_match(user_trademark, my_trademark)
-
-                if matched_phonetic:
-                    matched_data.append(user_app_number)  # Store the application number
-                    logger.info(f"Phonetic match found with TM: {user_trademark}")
-
-                else:
-                    similarity_score = fuzz.ratio(my_trademark.lower(), user_trademark.lower())
-                    if similarity_score >= similarity_threshold:
-                        matched_data.append(user_app_number)  # Store the application number
-                        logger.info(f"  Fuzzy match: '{user_trademark}' (Score: {similarity_score}, App No: {user_app_number})")
-
+        if workers > 1:
+            # the index is pickled once per worker by the initializer, tasks only carry their rows
+            executor = ProcessPoolExecutor(
+                max_workers=workers,
+                initializer=_init_worker,
+                initargs=(index, similarity_threshold, scoring, fingerprints, top_k),
+            )
+            # map yields chunk results in submission order, so the output stays in sheet order
+            matched_rows = (
+                matched_row
+                for chunk_result in executor.map(_match_rows_in_worker, chunks, [total] * len(chunks))
+                for matched_row in chunk_result
+            )
+        else:
+            matched_rows = (
+                matched_row
+                for chunk in chunks
+                for matched_row in _match_rows(
+                    chunk, index, similarity_threshold, total, scoring, fingerprints, top_k)
+            )
+
+        for idx, my_app_number, matched_data in matched_rows:
             if matched_data:
-                row_data = {'TM Application No.': my_app_number}
-                for i, app_num in enumerate(matched_data):
-                    row_data[f'matched{i + 1}'] = app_num  # Store the matched application numbers
-
-                results = pd.concat([results, pd.DataFrame([row_data])], ignore_index=True)
+                journal.append(idx, my_app_number, matched_data)
 
+            last_idx = idx
             if (idx + 1) % save_interval == 0:
-                logger.info(f"Saving progress after {idx + 1} trademarks...")
-                results.to_excel(output_sheet, index=False)
+                journal.checkpoint(idx)
+
+        if last_idx != journal.completed_idx:
+            journal.checkpoint(last_idx)
 
     except Exception as e:
         logger.error(f"\nAn error occurred: {str(e)}. Saving current progress...")
-        results.to_excel(output_sheet, index=False)
-        logger.info(f"Partial results saved to {output_sheet}. Exiting...")
-        return
+        # the rows finished since the last save_interval are complete, keep them in the export
+        if last_idx != journal.completed_idx:
+            journal.checkpoint(last_idx)
+        journal.close()
+        export(output_sheet)
+        logger.info(f"Partial results saved to {output_sheet}, run again with resume=True to continue. Exiting...")
+        return False
+
+    finally:
+        journal.close()
+        if executor is not None:
+            executor.shutdown(cancel_futures=True)
+        if fingerprints is not None:
+            fingerprints.close()
 
     logger.info(f"\nSaving final results to {output_sheet}...")
-    results.to_excel(output_sheet, index=False)
+    saved = export(output_sheet)
+    logger.info(f"Saved {saved} trademarks with matches")
+    if workers == 1:
+        logger.info(f"Phonetic cache: {cache.stats()}")
+        if fingerprints is not None:
+            logger.info(f"Fingerprint index: {fingerprints.stats()}")
     logger.info("Process complete!")
+    return True
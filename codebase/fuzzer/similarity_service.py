@@ -0,0 +1,242 @@
+import logging
+import os
+import threading
+import time
+from array import array
+from contextlib import contextmanager
+
+from fuzzywuzzy import fuzz
+from rapidfuzz import fuzz as rapid_fuzz, process
+
+from doc_utils.records import TrademarkColumns, class_key, read_trademark_columns
+from fuzzer.fingerprint_index import (
+    DEFAULT_FINGERPRINT_PATH,
+    FingerprintIndex,
+    content_hash,
+    substring_codes,
+    update_fingerprint_index,
+)
+from fuzzer.phonetics import PhoneticCache, phonetic_substring_match
+
+DEFAULT_THRESHOLD = 80
+
+
+class _CorpusClass:
+    """The corpus marks of one class, with their substring codes inverted for phonetic lookups."""
+
+    def __init__(self):
+        self.positions = array('I')
+        self.lowered = []
+        self.by_code = {}
+
+    def add(self, pos: int, lowered: str, codes):
+        self.positions.append(pos)
+        self.lowered.append(lowered)
+        for code in set(codes):
+            postings = self.by_code.get(code)
+            if postings is None:
+                postings = self.by_code[code] = array('I')
+            postings.append(pos)
+
+
+class SimilarityService:
+    """
+    The trademark corpus held in memory to answer "marks similar to X in class C"
+    with the rules of ``extract_similar_tm``: a corpus mark matches when one of
+    X's words sounds like one of its substrings (phonetic), or when its
+    fuzz.ratio with X reaches the threshold (fuzzy).
+
+    Fuzzy candidates are found for the whole class in one rapidfuzz call and
+    only those are scored with fuzz.ratio;
+    phonetic candidates are the marks whose substring codes contain a code of
+    X's words, found through an inverted index built from the fingerprint
+    index, whose stored substring tables are then loaded for those marks only.
+    """
+
+    def __init__(self, trademark_sheet: str, fingerprint_path: str = DEFAULT_FINGERPRINT_PATH):
+        self.trademark_sheet = trademark_sheet
+        self.fingerprint_path = fingerprint_path
+        self.records = TrademarkColumns()
+        self.marks = 0
+        self.classes = {}
+        self.cache = PhoneticCache(maxsize=50_000)
+        self.fingerprints = FingerprintIndex(fingerprint_path)
+        self.loaded_at = None
+        self.source_mtime = None
+
+    def load(self):
+        started = time.perf_counter()
+        self.source_mtime = os.path.getmtime(self.trademark_sheet)
+        update_fingerprint_index(self.trademark_sheet, self.fingerprint_path)
+
+        self.records = read_trademark_columns(self.trademark_sheet)
+        positions_of = {}
+        for pos in self.records.positions():
+            positions_of.setdefault(self.records.app_number(pos), []).append(pos)
+
+        for app_number, stored_hash, codes in self.fingerprints.iter_codes():
+            for pos in positions_of.pop(app_number, ()):
+                self._add(pos, codes if stored_hash == content_hash(self.records[pos][1]) else None)
+        # rows without a fingerprint, e.g. written to the store while loading
+        for positions in positions_of.values():
+            for pos in positions:
+                self._add(pos, None)
+
+        self.loaded_at = time.time()
+        logging.info(f"Loaded {self.marks} trademarks in {len(self.classes)} classes "
+                     f"in {time.perf_counter() - started:.1f}s")
+        return self
+
+    def _add(self, pos: int, codes: list | None):
+        _, trademark, tm_class = self.records[pos]
+        if tm_class is None:
+            # extract_similar_tm never matches a mark without a class
+            return
+        if codes is None:
+            codes = substring_codes(trademark)
+        corpus_class = self.classes.get(tm_class)
+        if corpus_class is None:
+            corpus_class = self.classes[tm_class] = _CorpusClass()
+        corpus_class.add(pos, trademark.lower(), codes)
+        self.marks += 1
+
+    def close(self):
+        self.fingerprints.close()
+
+    def query(self, trademark: str, tm_class, threshold: int = DEFAULT_THRESHOLD, limit: int | None = None) -> list:
+        """Corpus marks similar to ``trademark`` in ``tm_class``, in corpus order."""
+        corpus_class = self.classes.get(class_key(tm_class))
+        if corpus_class is None or not isinstance(trademark, str) or not trademark.strip():
+            return []
+
+        # rapidfuzz bounds fuzz.ratio from above, same cutoff as the batch scorer
+        lowered = trademark.lower()
+        fuzzy_scores = {
+            corpus_class.positions[j]: fuzz.ratio(lowered, corpus_lowered)
+            for corpus_lowered, _, j in process.extract(
+                lowered, corpus_class.lowered, scorer=rapid_fuzz.ratio,
+                score_cutoff=threshold - 1, limit=None)
+        }
+
+        phonetic = set()
+        for _, code in self.cache.word_table(trademark):
+            phonetic.update(corpus_class.by_code.get(code, ()))
+        if phonetic:
+            self.fingerprints.preload(
+                [(self.records[pos][0], self.records[pos][1]) for pos in phonetic], self.cache)
+
+        matches = []
+        for pos in sorted(phonetic | fuzzy_scores.keys()):
+            app_number, corpus_trademark, _ = self.records[pos]
+            score = fuzzy_scores.get(pos)
+            if score is None:
+                # below the cutoff, so only reported alongside a phonetic match
+                score = fuzz.ratio(lowered, corpus_trademark.lower())
+            if phonetic_substring_match(trademark, corpus_trademark, self.cache):
+                match = 'phonetic'
+            elif score >= threshold:
+                match = 'fuzzy'
+            else:
+                continue
+            matches.append({
+                'application_number': app_number,
+                'trademark': corpus_trademark,
+                'match': match,
+                'score': score,
+            })
+            if limit is not None and len(matches) >= limit:
+                break
+        return matches
+
+    def stats(self) -> dict:
+        return {
+            'trademarks': self.marks,
+            'classes': len(self.classes),
+            'loaded_at': self.loaded_at,
+            'source_mtime': self.source_mtime,
+            'phonetic_cache': self.cache.stats(),
+            'fingerprint_index': self.fingerprints.stats(),
+        }
+
+
+class ReloadingService:
+    """
+    Serves queries from a loaded ``SimilarityService`` and replaces it with a
+    freshly loaded one when the trademark store changes. The reload runs in a
+    background thread, queries keep using the previous corpus until the swap.
+    Queries go through ``serving()``, so a replaced service is closed once its
+    last query finishes.
+    """
+
+    def __init__(self, trademark_sheet: str, fingerprint_path: str = DEFAULT_FINGERPRINT_PATH,
+                 check_interval: float = 30.0):
+        self.trademark_sheet = trademark_sheet
+        self.fingerprint_path = fingerprint_path
+        self.check_interval = check_interval
+        self.reloads = 0
+        self.service = SimilarityService(trademark_sheet, fingerprint_path).load()
+        self._lock = threading.Lock()
+        self._reloading = False
+        # service -> queries running on it, guarded by _lock
+        self._in_flight = {}
+        self._stopped = threading.Event()
+        self._watcher = threading.Thread(target=self._watch, name='corpus-watcher', daemon=True)
+
+    def start(self):
+        self._watcher.start()
+        return self
+
+    def stop(self):
+        self._stopped.set()
+        if self._watcher.is_alive():
+            self._watcher.join()
+        self.service.close()
+
+    @contextmanager
+    def serving(self):
+        """The current service, kept open until the block exits even if a reload replaces it."""
+        with self._lock:
+            service = self.service
+            self._in_flight[service] = self._in_flight.get(service, 0) + 1
+        try:
+            yield service
+        finally:
+            with self._lock:
+                self._in_flight[service] -= 1
+                retired = not self._in_flight[service] and service is not self.service
+                if not self._in_flight[service]:
+                    del self._in_flight[service]
+            if retired:
+                service.close()
+
+    def changed(self) -> bool:
+        return os.path.getmtime(self.trademark_sheet) != self.service.source_mtime
+
+    def reload(self) -> bool:
+        """Load the corpus again, unless a reload is already running. Returns whether it reloaded."""
+        with self._lock:
+            if self._reloading:
+                return False
+            self._reloading = True
+        try:
+            service = SimilarityService(self.trademark_sheet, self.fingerprint_path).load()
+            with self._lock:
+                previous, self.service = self.service, service
+                # otherwise the last query still running on it closes it
+                idle = previous not in self._in_flight
+            if idle:
+                previous.close()
+            self.reloads += 1
+            return True
+        finally:
+            with self._lock:
+                self._reloading = False
+
+    def _watch(self):
+        while not self._stopped.wait(self.check_interval):
+            try:
+                if self.changed():
+                    logging.info(f"{self.trademark_sheet} changed, reloading the corpus...")
+                    self.reload()
+            except Exception as e:
+                logging.error(f"Error while reloading the corpus: {e}")
@@ -1,46 +1,268 @@
-from doc_utils.increment_based_generator import application_number_gen
-from doc_utils.pdf_utils import extract_pdf
-from doc_utils.spreadsheet_utils import extract_excel
-from fuzzer.similar_tm_extractor import extract_similar_tm
-from trademark.webxela_automator import automate_webxela
-
-print("------------------- Webxela Trademark Automator ------------------------")
-print("")
-print("Select options: ")
-print("1. Extract Pdf")
-print("2. Extract Excel")
-print("3. Extract Trademark Data")
-print("4. Generate Application Numbers Based on Increment")
-print("5. Find Similar Trademarks")
-
-option = input("Example: [1, 2, 3, 4, 5] > ")
-
-if option == "1":
-
-    pdf_location = input("Enter the location of PDF: ")
-    if extract_pdf(pdf_location):
+"""
+Webxela trademark automator. Without a command it shows the interactive menu.
+
+    python main.py gen 1000 --step 2
+    python main.py extract-pdf journal.pdf --workers 4
+    python main.py extract-excel numbers.xlsx
+    python main.py scrape --workers 8 --async --refetch-after-days 30
+    python main.py scrape --workers 2 --dead-letters
+    python main.py scrape --workers 8 --from-pdf journal.pdf
+    python main.py similar user.xlsx --workers 4 --top-k 10
+    python main.py export
+    python main.py --profile similar.prof similar user.xlsx
+
+Every command imports its subsystem (pandas, the parsers, aiohttp...) only
+when it runs, so a trivial command like gen starts in milliseconds.
+"""
+import argparse
+import sys
+
+DEFAULT_SIMILAR_OUTPUT = 'data/extracted/sim.xlsx'
+# one row per match, csv streams any number of them
+DEFAULT_RANKED_OUTPUT = 'data/extracted/sim_ranked.csv'
+
+
+def run_extract_pdf(pdf_location: str, workers: int | None = None) -> bool:
+    from doc_utils.pdf_utils import extract_pdf
+
+    if extract_pdf(pdf_location, workers):
         print("PDF extracted")
+        return True
+    return False
 
-elif option == "2":
-    excel_location = input("Enter the location of Excel: ")
-    if extract_excel(excel_location):
+
+def run_extract_excel(excel_location: str, engine: str | None = None) -> bool:
+    from doc_utils.spreadsheet_utils import extract_excel
+
+    if extract_excel(excel_location, engine):
         print("Excel extracted")
+        return True
+    return False
+
+
+def run_scrape(threads: int, refetch_after_days: float | None = None, use_async: bool = False,
+               pending: bool = False, dead_letters: bool = False, pdf: str | None = None,
+               excel: str | None = None, numbers_file: str | None = None) -> bool:
+    from doc_utils.work_source import (
+        DeadLetterSource,
+        ExcelSource,
+        PdfSource,
+        TextFileSource,
+        default_source,
+        pending_range_source,
+    )
+    from trademark.request_scheduler import DEAD_LETTER_FILE
+
+    if pending:
+        source = pending_range_source()
+    elif dead_letters:
+        source = DeadLetterSource(DEAD_LETTER_FILE)
+        if not source.size():
+            print(f"No dead letters to retry in {DEAD_LETTER_FILE}")
+            return True
+    elif pdf:
+        # numbers are scraped while the journal is still being read
+        source = PdfSource(pdf)
+    elif excel:
+        source = ExcelSource(excel)
+    elif numbers_file:
+        source = TextFileSource(numbers_file)
+    else:
+        source = default_source()
+    if use_async:
+        import asyncio
 
-elif option == "3":
-    print("Automation will pick your previous pdf data as input")
-    threads = int(input("Enter the numbers of threads to execute: "))
-    automate_webxela(threads)
-elif option == "4":
-    amount = int(input("Enter how many new application numbers to generate: "))
-    application_number_gen(amount)
-elif option == "5":
-    user_excel = input("Enter the location of your Excel: ")
-    my_excel = 'data/extracted/combined_trademark_data.xlsx'
-    extract_similar_tm(
+        from trademark.async_automator import automate_webxela_async
+
+        return asyncio.run(automate_webxela_async(threads, refetch_after_days=refetch_after_days, source=source))
+
+    from trademark.webxela_automator import automate_webxela
+
+    return automate_webxela(threads, refetch_after_days=refetch_after_days, source=source)
+
+
+def run_gen(amount: int, step: int = 1) -> bool:
+    from doc_utils.increment_based_generator import application_number_gen
+
+    application_number_gen(amount, step=step)
+    return True
+
+
+def run_similar(user_excel: str, workers: int = 1, resume: bool = False, top_k: int | None = None,
+                output_sheet: str | None = None, scoring: str = 'pairwise') -> bool:
+    from doc_utils.trademark_store import COMBINED_XLSX_PATH, DEFAULT_STORE_PATH, TrademarkStore, bootstrap_store
+    from fuzzer.fingerprint_index import DEFAULT_FINGERPRINT_PATH, update_fingerprint_index
+    from fuzzer.similar_tm_extractor import extract_similar_tm
+
+    # data combined before the store existed is imported once
+    with TrademarkStore(DEFAULT_STORE_PATH) as store:
+        bootstrap_store(store, COMBINED_XLSX_PATH)
+    # only marks added or changed since the last run are fingerprinted
+    update_fingerprint_index(DEFAULT_STORE_PATH, DEFAULT_FINGERPRINT_PATH, workers=workers)
+    return extract_similar_tm(
         user_sheet=user_excel,
-        trademark_sheet=my_excel
+        trademark_sheet=DEFAULT_STORE_PATH,
+        output_sheet=output_sheet or (DEFAULT_RANKED_OUTPUT if top_k else DEFAULT_SIMILAR_OUTPUT),
+        workers=workers,
+        resume=resume,
+        fingerprint_index=DEFAULT_FINGERPRINT_PATH,
+        top_k=top_k,
+        scoring=scoring,
     )
-else:
-    print("Invalid option")
 
-print("----------------------------- END ----------------------------------")
\ No newline at end of file
+
+def run_export() -> bool:
+    from doc_utils.spreadsheet_utils import export_combined_xlsx
+    from doc_utils.trademark_store import COMBINED_XLSX_PATH, DEFAULT_STORE_PATH
+
+    if export_combined_xlsx(COMBINED_XLSX_PATH, DEFAULT_STORE_PATH):
+        print(f"Combined trademark data exported to {COMBINED_XLSX_PATH}")
+        return True
+    return False
+
+
+def interactive() -> bool:
+    print("------------------- Webxela Trademark Automator ------------------------")
+    print("")
+    print("Select options: ")
+    print("1. Extract Pdf")
+    print("2. Extract Excel")
+    print("3. Extract Trademark Data")
+    print("4. Generate Application Numbers Based on Increment")
+    print("5. Find Similar Trademarks")
+    print("6. Export Combined Trademark Data to Excel")
+
+    option = input("Example: [1, 2, 3, 4, 5, 6] > ")
+
+    if option == "1":
+
+        pdf_location = input("Enter the location of PDF: ")
+        ok = run_extract_pdf(pdf_location)
+
+    elif option == "2":
+        excel_location = input("Enter the location of Excel: ")
+        ok = run_extract_excel(excel_location)
+
+    elif option == "3":
+        from doc_utils.increment_based_generator import pending_ranges
+        from doc_utils.pdf_utils import APPLICATION_NUMBERS_FILE
+        from doc_utils.work_source import DeadLetterSource
+        from trademark.request_scheduler import DEAD_LETTER_FILE
+
+        pending = bool(pending_ranges()) and input(
+            "Scrape the pending generated ranges instead of application_numbers.txt? [y/N]: "
+        ).strip().lower() == "y"
+        dead_letters = not pending and bool(DeadLetterSource(DEAD_LETTER_FILE).size()) and input(
+            f"Retry the failed numbers of {DEAD_LETTER_FILE} instead? [y/N]: "
+        ).strip().lower() == "y"
+        if not pending and not dead_letters:
+            print("Automation will pick your previous pdf data as input")
+        threads = int(input("Enter the numbers of threads to execute: "))
+        refetch = input("Skip already scraped numbers, refetching pending ones older than how many days? "
+                        "[Enter to fetch everything]: ").strip()
+        use_async = input("Use async mode with a shared work queue? [y/N]: ").strip().lower() == "y"
+        # asked explicitly, no guessing between the inputs
+        ok = run_scrape(threads, float(refetch) if refetch else None, use_async, pending, dead_letters,
+                        numbers_file=APPLICATION_NUMBERS_FILE)
+    elif option == "4":
+        amount = int(input("Enter how many new application numbers to generate: "))
+        step = input("Step between numbers [Enter for 1]: ").strip()
+        ok = run_gen(amount, int(step) if step else 1)
+    elif option == "5":
+        user_excel = input("Enter the location of your Excel: ")
+        workers = int(input("Enter the number of worker processes (1 to run in this process): "))
+        resume = input("Resume the previous run? [y/N]: ").strip().lower() == "y"
+        top_k = input("Keep only the best N matches of each trademark, ranked with scores? "
+                      "[Enter to keep every match]: ").strip()
+        ok = run_similar(user_excel, workers, resume, int(top_k) if top_k else None)
+    elif option == "6":
+        ok = run_export()
+    else:
+        print("Invalid option")
+        ok = False
+
+    print("----------------------------- END ----------------------------------")
+    return ok
+
+
+def build_parser() -> argparse.ArgumentParser:
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0],
+                                     formatter_class=argparse.RawDescriptionHelpFormatter,
+                                     epilog="\n".join(__doc__.strip().splitlines()[1:]))
+    parser.add_argument("--profile", metavar="PATH",
+                        help="write a cProfile dump of the command to PATH (read it with python -m pstats PATH); "
+                             "worker processes are not profiled")
+    commands = parser.add_subparsers(dest="command", metavar="command")
+
+    extract_pdf = commands.add_parser("extract-pdf", help="application numbers of a journal PDF")
+    extract_pdf.add_argument("pdf")
+    extract_pdf.add_argument("--workers", type=int, help="extraction processes, default: one per CPU")
+    extract_pdf.set_defaults(run=lambda args: run_extract_pdf(args.pdf, args.workers))
+
+    extract_excel = commands.add_parser("extract-excel", help="application numbers in column A of a workbook")
+    extract_excel.add_argument("excel")
+    extract_excel.add_argument("--engine", choices=("openpyxl", "calamine"),
+                               help="default: calamine when installed")
+    extract_excel.set_defaults(run=lambda args: run_extract_excel(args.excel, args.engine))
+
+    scrape = commands.add_parser("scrape", help="scrape the extracted or generated application numbers")
+    scrape.add_argument("--workers", type=int, required=True, help="threads, or concurrent requests with --async")
+    scrape.add_argument("--async", dest="use_async", action="store_true", help="async mode with a shared work queue")
+    scrape.add_argument("--refetch-after-days", type=float,
+                        help="skip scraped numbers, refetching pending ones older than this")
+    inputs = scrape.add_mutually_exclusive_group()
+    inputs.add_argument("--pending", action="store_true",
+                        help="scrape the pending generated ranges instead of application_numbers.txt "
+                             "(the default when they were generated after the file was written)")
+    inputs.add_argument("--dead-letters", action="store_true",
+                        help="retry the numbers of dead_letter.txt, those that succeed are removed from it")
+    inputs.add_argument("--from-pdf", metavar="PATH", help="scrape the numbers of a journal PDF as they are extracted")
+    inputs.add_argument("--from-excel", metavar="PATH", help="scrape the numbers in column A of a workbook")
+    scrape.set_defaults(run=lambda args: run_scrape(args.workers, args.refetch_after_days, args.use_async,
+                                                    args.pending, args.dead_letters, args.from_pdf, args.from_excel))
+
+    gen = commands.add_parser("gen", help="reserve the next application numbers as a range")
+    gen.add_argument("amount", type=int)
+    gen.add_argument("--step", type=int, default=1)
+    gen.set_defaults(run=lambda args: run_gen(args.amount, args.step))
+
+    similar = commands.add_parser("similar", help="find trademarks similar to the marks of a sheet")
+    similar.add_argument("user_excel")
+    similar.add_argument("--workers", type=int, default=1)
+    similar.add_argument("--resume", action="store_true", help="continue the previous run")
+    similar.add_argument("--top-k", type=int, help="keep the K best matches of each trademark, ranked with scores")
+    similar.add_argument("--output", help=f"default: {DEFAULT_SIMILAR_OUTPUT}, or {DEFAULT_RANKED_OUTPUT} with --top-k")
+    similar.add_argument("--scoring", choices=("pairwise", "batch"), default="pairwise",
+                         help="batch finds the fuzzy candidates with rapidfuzz first: same matches, faster on "
+                              "large classes")
+    similar.set_defaults(run=lambda args: run_similar(args.user_excel, args.workers, args.resume, args.top_k,
+                                                      args.output, args.scoring))
+
+    export = commands.add_parser("export", help="export the trademark store to the combined xlsx")
+    export.set_defaults(run=lambda args: run_export())
+
+    return parser
+
+
+def main(argv: list | None = None) -> int:
+    args = build_parser().parse_args(argv)
+    # no command: the menu, as cron jobs that pipe their answers expect
+    run = getattr(args, "run", None) or (lambda _: interactive())
+
+    if args.profile:
+        import cProfile
+
+        profiler = cProfile.Profile()
+        try:
+            ok = profiler.runcall(run, args)
+        finally:
+            profiler.dump_stats(args.profile)
+            print(f"Profile written to {args.profile}", file=sys.stderr)
+    else:
+        ok = run(args)
+    return 0 if ok is not False else 1
+
+
+# process pool workers re-import this module under spawn, keep the menu out of import time
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,134 @@
+"""
+Similarity lookups over HTTP, with the trademark corpus kept in memory.
+
+    python server.py --port 8080
+    curl 'http://127.0.0.1:8080/similar?mark=Sunrise&class=5'
+    curl -X POST http://127.0.0.1:8080/similar/batch \\
+         -d '{"queries": [{"mark": "Sunrise", "class": 5}, {"mark": "Nova", "class": 9}]}'
+
+Matches follow the phonetic and fuzzy rules of option 5 of main.py. The
+corpus is reloaded in the background when the trademark store changes.
+"""
+import argparse
+import logging
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from aiohttp import web
+
+from doc_utils.records import class_key
+from doc_utils.trademark_store import COMBINED_XLSX_PATH, DEFAULT_STORE_PATH, TrademarkStore, bootstrap_store
+from fuzzer.fingerprint_index import DEFAULT_FINGERPRINT_PATH
+from fuzzer.similarity_service import DEFAULT_THRESHOLD, ReloadingService, SimilarityService
+
+logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
+
+MAX_BATCH_SIZE = 1000
+
+SERVICE_KEY = web.AppKey('service', ReloadingService)
+# queries run off the event loop, on one thread since the phonetic cache is not thread-safe
+QUERY_EXECUTOR_KEY = web.AppKey('query_executor', ThreadPoolExecutor)
+
+
+def _query(service: SimilarityService, query: dict) -> dict:
+    mark = query.get('mark')
+    if not isinstance(mark, str):
+        raise web.HTTPBadRequest(text="'mark' is required")
+    if class_key(query.get('class')) is None:
+        raise web.HTTPBadRequest(text="'class' is required, marks only match within their class")
+    threshold = int(query.get('threshold', DEFAULT_THRESHOLD))
+    limit = query.get('limit')
+
+    started = time.perf_counter()
+    matches = service.query(mark, query.get('class'), threshold, int(limit) if limit is not None else None)
+    return {
+        'mark': mark,
+        'class': query.get('class'),
+        'matches': matches,
+        'took_ms': round((time.perf_counter() - started) * 1000, 3),
+    }
+
+
+async def _run_queries(request: web.Request, queries: list) -> list:
+    service = request.app[SERVICE_KEY]
+
+    def run():
+        with service.serving() as current:
+            return [_query(current, query) for query in queries]
+
+    return await request.loop.run_in_executor(request.app[QUERY_EXECUTOR_KEY], run)
+
+
+async def similar(request: web.Request) -> web.Response:
+    try:
+        return web.json_response((await _run_queries(request, [dict(request.query)]))[0])
+    except ValueError as e:
+        raise web.HTTPBadRequest(text=str(e))
+
+
+async def similar_batch(request: web.Request) -> web.Response:
+    try:
+        queries = (await request.json()).get('queries')
+    except ValueError:
+        raise web.HTTPBadRequest(text="expected a JSON body")
+    if not isinstance(queries, list) or len(queries) > MAX_BATCH_SIZE:
+        raise web.HTTPBadRequest(text=f"'queries' must be a list of at most {MAX_BATCH_SIZE} queries")
+
+    try:
+        return web.json_response({'results': await _run_queries(request, queries)})
+    except (ValueError, AttributeError) as e:
+        raise web.HTTPBadRequest(text=str(e))
+
+
+async def reload(request: web.Request) -> web.Response:
+    service = request.app[SERVICE_KEY]
+    # loading takes seconds on a large corpus, keep serving queries meanwhile
+    reloaded = await request.loop.run_in_executor(None, service.reload)
+    return web.json_response({'reloaded': reloaded, 'reloads': service.reloads})
+
+
+async def health(request: web.Request) -> web.Response:
+    service = request.app[SERVICE_KEY]
+    return web.json_response({'reloads': service.reloads, **service.service.stats()})
+
+
+async def _shutdown_query_executor(app: web.Application):
+    app[QUERY_EXECUTOR_KEY].shutdown()
+
+
+def create_app(service: ReloadingService) -> web.Application:
+    app = web.Application()
+    app[SERVICE_KEY] = service
+    app[QUERY_EXECUTOR_KEY] = ThreadPoolExecutor(max_workers=1, thread_name_prefix='similarity-query')
+    app.on_cleanup.append(_shutdown_query_executor)
+    app.router.add_get('/similar', similar)
+    app.router.add_post('/similar/batch', similar_batch)
+    app.router.add_post('/reload', reload)
+    app.router.add_get('/health', health)
+    return app
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8080)
+    parser.add_argument("--store", default=DEFAULT_STORE_PATH, help="trademark store (.sqlite) or corpus xlsx")
+    parser.add_argument("--fingerprints", default=DEFAULT_FINGERPRINT_PATH)
+    parser.add_argument("--check-interval", type=float, default=30.0,
+                        help="seconds between checks of the store for changes")
+    args = parser.parse_args()
+
+    if args.store == DEFAULT_STORE_PATH:
+        # data combined before the store existed is imported once, as option 5 of main.py does
+        with TrademarkStore(DEFAULT_STORE_PATH) as store:
+            bootstrap_store(store, COMBINED_XLSX_PATH)
+
+    service = ReloadingService(args.store, args.fingerprints, args.check_interval).start()
+    try:
+        web.run_app(create_app(service), host=args.host, port=args.port)
+    finally:
+        service.stop()
+
+
+if __name__ == "__main__":
+    main()
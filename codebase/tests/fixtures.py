@@ -0,0 +1,51 @@
+"""
+Synthetic trademark sheets for the matcher tests, deterministic for a given seed.
+A copy of the generator in benchmarks.fixtures, so the tests do not depend on the
+benchmarks package.
+"""
+import random
+import string
+
+import pandas as pd
+
+MARK_WORDS = [
+    "sunrise", "apple", "nova", "kripa", "shree ganesh", "lotus", "maxx", "zenith", "royal", "amrit",
+    "tiger", "bharat", "galaxy", "ocean", "star", "vedic", "nature", "pure", "glow", "om",
+]
+
+
+def _mutate(mark: str, rnd: random.Random) -> str:
+    letters = list(mark)
+    for _ in range(rnd.randint(0, 3)):
+        op = rnd.random()
+        i = rnd.randrange(len(letters) + 1)
+        if op < .3 and letters:
+            letters[min(i, len(letters) - 1)] = rnd.choice(string.ascii_lowercase)
+        elif op < .6:
+            letters.insert(i, rnd.choice(string.ascii_lowercase + " -1"))
+        elif letters:
+            del letters[min(i, len(letters) - 1)]
+    mutated = "".join(letters)
+    return mutated.upper() if rnd.random() < .3 else mutated.title()
+
+
+def trademark_sheet(count: int, class_weights: dict, seed: int = 0, start: int = 1000000,
+                    missing_rate: float = 0.03) -> pd.DataFrame:
+    """
+    A sheet with the columns extract_similar_tm reads. Marks are mutated combinations
+    of a small vocabulary, so there are plenty of near matches, and a share of rows
+    has no mark or no class, like real exports.
+    """
+    rnd = random.Random(seed)
+    classes, weights = list(class_weights), list(class_weights.values())
+
+    rows = []
+    for i in range(count):
+        mark = _mutate(" ".join(rnd.sample(MARK_WORDS, rnd.choice([1, 1, 2]))), rnd)
+        trademark_class = rnd.choices(classes, weights)[0]
+        if rnd.random() < missing_rate:
+            mark = None
+        if rnd.random() < missing_rate:
+            trademark_class = None
+        rows.append({"TM Application No.": start + i, "TM Applied For": mark, "Class": trademark_class})
+    return pd.DataFrame(rows)
@@ -0,0 +1,75 @@
+import re
+
+import jellyfish
+from fuzzywuzzy import fuzz
+
+from doc_utils.records import read_trademark_columns
+from fuzzer.candidate_index import CandidateIndex
+from fuzzer.similar_tm_extractor import BATCH_SCORING, PAIRWISE_SCORING, _match_rows, match_trademark
+from tests.fixtures import trademark_sheet
+
+THRESHOLD = 80
+CLASS_WEIGHTS = {5: 3, 9: 2, 30: 1}
+
+
+def _sheets(tmp_path, user_size: int = 150, corpus_size: int = 150):
+    trademark_sheet(user_size, seed=1, start=5000000, class_weights=CLASS_WEIGHTS) \
+        .to_excel(tmp_path / 'user.xlsx', index=False)
+    trademark_sheet(corpus_size, seed=2, start=1000000, class_weights=CLASS_WEIGHTS) \
+        .to_excel(tmp_path / 'corpus.xlsx', index=False)
+    return read_trademark_columns(str(tmp_path / 'user.xlsx')), read_trademark_columns(str(tmp_path / 'corpus.xlsx'))
+
+
+def _baseline_phonetic_substring_match(trademark1, trademark2) -> bool:
+    """phonetic_substring_match as it was before the cache and the rapidfuzz prefilter."""
+    cleaned_user_tm = re.sub(r'[^a-zA-Z\s]', '', trademark1)
+    cleaned_our_tm = re.sub(r'[^a-zA-Z]', '', trademark2)
+    their_words = [
+        cleaned_our_tm[i:j]
+        for i in range(len(cleaned_our_tm))
+        for j in range(i + 4, len(cleaned_our_tm) + 1)
+    ]
+    for myword in cleaned_user_tm.split():
+        client_code = jellyfish.metaphone(myword)
+        for theirword in their_words:
+            if jellyfish.metaphone(theirword) == client_code and \
+                    fuzz.ratio(myword.lower(), theirword.lower()) > 73:
+                return True
+    return False
+
+
+def _all_pairs(my_trademark, my_class, user_records) -> list:
+    """The N x M scan extract_similar_tm did before the candidate index."""
+    matched = []
+    for user_app_number, user_trademark, user_class in user_records:
+        if user_trademark is None or user_class is None or user_class != my_class:
+            continue
+        if _baseline_phonetic_substring_match(user_trademark, my_trademark) or \
+                fuzz.ratio(my_trademark.lower(), user_trademark.lower()) >= THRESHOLD:
+            matched.append(user_app_number)
+    return matched
+
+
+def test_match_trademark_equals_all_pairs_scan(tmp_path):
+    user, corpus = _sheets(tmp_path)
+    index = CandidateIndex(user, similarity_threshold=THRESHOLD)
+
+    matches = 0
+    for pos in corpus.positions():
+        _, my_trademark, my_class = corpus[pos]
+        expected = _all_pairs(my_trademark, my_class, user)
+        assert match_trademark(my_trademark, my_class, index, THRESHOLD) == expected, my_trademark
+        matches += len(expected)
+    # the synthetic marks are near variants of a small vocabulary, the check is not vacuous
+    assert matches > 100
+
+
+def test_scoring_backends_agree(tmp_path):
+    user, corpus = _sheets(tmp_path, corpus_size=80)
+    index = CandidateIndex(user, similarity_threshold=THRESHOLD)
+    rows = [(pos, *corpus[pos]) for pos in corpus.positions()]
+
+    pairwise = _match_rows(rows, index, THRESHOLD, len(corpus), PAIRWISE_SCORING)
+    assert _match_rows(rows, index, THRESHOLD, len(corpus), BATCH_SCORING) == pairwise
+    assert _match_rows(rows, index, THRESHOLD, len(corpus), BATCH_SCORING, top_k=5) == \
+        _match_rows(rows, index, THRESHOLD, len(corpus), PAIRWISE_SCORING, top_k=5)
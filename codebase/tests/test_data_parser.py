@@ -0,0 +1,41 @@
+import json
+from pathlib import Path
+
+import pytest
+
+from trademark.data_parser import BS4_BACKEND, DEFAULT_PARSER_BACKEND, LXML_BACKEND, parse_application_data, parse_payload
+
+# anonymised eregister pages, each next to the .json record expected from it
+PAGES = Path(__file__).parent / 'data' / 'eregister'
+PAGE_FILES = sorted(PAGES.glob('*.html'))
+
+
+def _read(page: Path):
+    golden = json.loads(page.with_suffix('.json').read_text(encoding='utf-8'))
+    return page.read_text(encoding='utf-8'), golden
+
+
+@pytest.mark.parametrize('page', PAGE_FILES, ids=lambda page: page.stem)
+def test_lxml_matches_golden(page):
+    html, golden = _read(page)
+
+    assert parse_application_data(html, backend=LXML_BACKEND) == golden['application_data']
+    assert parse_payload(html, backend=LXML_BACKEND) == golden['payload']
+
+
+@pytest.mark.parametrize('page', PAGE_FILES, ids=lambda page: page.stem)
+def test_backends_extract_the_same_payload(page):
+    html, _ = _read(page)
+    assert parse_payload(html, backend=BS4_BACKEND) == parse_payload(html, backend=LXML_BACKEND)
+
+
+@pytest.mark.parametrize('name', ['detail_registered', 'no_record', 'search_result'])
+def test_bs4_matches_golden_on_well_formed_pages(name):
+    html, golden = _read(PAGES / f'{name}.html')
+    assert parse_application_data(html, backend=BS4_BACKEND) == golden['application_data']
+
+
+def test_default_backend_is_lxml():
+    assert DEFAULT_PARSER_BACKEND == LXML_BACKEND
+    html, golden = _read(PAGES / 'detail_objected_malformed.html')
+    assert parse_application_data(html) == golden['application_data']
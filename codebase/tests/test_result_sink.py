@@ -0,0 +1,47 @@
+from doc_utils import result_sink
+from doc_utils.result_sink import JsonlResultSink, read_records
+
+
+class Clock:
+
+    def __init__(self):
+        self.now = 0.0
+
+    def __call__(self):
+        return self.now
+
+
+def _stored(path) -> list:
+    return list(read_records(str(path))) if path.exists() else []
+
+
+def test_sink_flushes_every_k_records(tmp_path):
+    path = tmp_path / 'records.jsonl'
+    with JsonlResultSink(str(path), flush_every=3, flush_interval=3600) as sink:
+        sink.write({'n': 1})
+        sink.write({'n': 2})
+        assert _stored(path) == []
+        sink.write({'n': 3})
+        assert _stored(path) == [{'n': 1}, {'n': 2}, {'n': 3}]
+        sink.write({'n': 4})
+    assert _stored(path) == [{'n': 1}, {'n': 2}, {'n': 3}, {'n': 4}]
+
+
+def test_sink_flushes_after_t_seconds(monkeypatch, tmp_path):
+    clock = Clock()
+    monkeypatch.setattr(result_sink.time, 'monotonic', clock)
+    path = tmp_path / 'records.jsonl'
+    with JsonlResultSink(str(path), flush_every=100, flush_interval=5.0) as sink:
+        sink.write({'n': 1})
+        clock.now = 4.9
+        sink.write({'n': 2})
+        assert _stored(path) == []
+
+        clock.now = 5.0
+        sink.write({'n': 3})
+        assert _stored(path) == [{'n': 1}, {'n': 2}, {'n': 3}]
+
+        # the interval restarts at the flush
+        clock.now = 9.0
+        sink.write({'n': 4})
+        assert sink.written == 3
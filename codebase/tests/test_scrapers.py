@@ -0,0 +1,119 @@
+import asyncio
+
+import pytest
+from aiohttp import web
+
+from benchmarks.mock_ipindia import MockIpIndia
+from doc_utils.trademark_store import APPLICATION_NO_COLUMN, DEFAULT_STORE_PATH, TrademarkStore
+from trademark import (
+    async_automator,
+    captcha_requester,
+    request_scheduler,
+    session_pool,
+    trademark_requester,
+    webxela_automator,
+)
+from trademark.async_automator import automate_webxela_async
+from trademark.constants import CAPTCHA_PATH, GET_CAPTCHA_PATH, TRADEMARK_PATH
+from trademark.request_scheduler import DEAD_LETTER_FILE, AdaptiveRateLimiter
+from trademark.webxela_automator import automate_webxela
+
+NUMBERS = [str(number) for number in range(1000001, 1000009)]
+
+
+class FailingIpIndia(MockIpIndia):
+    """The mock site, answering 503 to every search for the numbers in ``failing``."""
+
+    def __init__(self, failing: set, **kwargs):
+        super().__init__(**kwargs)
+        self.failing = failing
+
+    async def _view_post(self, request):
+        form = await request.post()
+        if form.get('applNumber') in self.failing and not form.get('__EVENTTARGET'):
+            return web.Response(status=503, text='Service Unavailable')
+        return await super()._view_post(request)
+
+
+class UnpacedLimiter(AdaptiveRateLimiter):
+    """A limiter that never slows down, the pacing is not what these tests check."""
+
+    def __init__(self, burst: int):
+        super().__init__(rate=1000.0, min_rate=1000.0, max_rate=1000.0, burst=burst)
+
+
+def _scrape(use_async: bool, base_url: str, workers: int = 3) -> bool:
+    if use_async:
+        return asyncio.run(automate_webxela_async(workers, base_url=base_url))
+    return automate_webxela(workers)
+
+
+def _run(monkeypatch, tmp_path, server: MockIpIndia, use_async: bool) -> bool:
+    (tmp_path / 'data' / 'extracted').mkdir(parents=True)
+    (tmp_path / 'data' / 'application_num').mkdir()
+    (tmp_path / 'data' / 'application_num' / 'application_numbers.txt').write_text('\n'.join(NUMBERS) + '\n')
+    monkeypatch.chdir(tmp_path)
+    # no waiting between the attempts at a failing number
+    monkeypatch.setattr(request_scheduler, 'backoff_delay', lambda attempt: 0.0)
+    monkeypatch.setattr(webxela_automator, 'AdaptiveRateLimiter', UnpacedLimiter)
+    monkeypatch.setattr(async_automator, 'AdaptiveRateLimiter', UnpacedLimiter)
+
+    base_url = server.start()
+    # the threaded scraper reads the URLs the constants were built with at import
+    monkeypatch.setattr(session_pool, 'CAPTCHA_URL', base_url + CAPTCHA_PATH)
+    monkeypatch.setattr(session_pool, 'TRADEMARK_URL', base_url + TRADEMARK_PATH)
+    monkeypatch.setattr(trademark_requester, 'TRADEMARK_URL', base_url + TRADEMARK_PATH)
+    monkeypatch.setattr(captcha_requester, 'GET_CAPTCHA_URL', base_url + GET_CAPTCHA_PATH)
+    try:
+        return _scrape(use_async, base_url)
+    finally:
+        server.stop()
+
+
+def _stored_numbers() -> list:
+    with TrademarkStore(DEFAULT_STORE_PATH) as store:
+        return sorted(str(number) for number, in store.iter_rows([APPLICATION_NO_COLUMN]))
+
+
+def _dead_letters() -> list:
+    with open(DEAD_LETTER_FILE) as file:
+        return sorted(line.strip() for line in file)
+
+
+@pytest.mark.parametrize('use_async', [False, True], ids=['threads', 'async'])
+def test_scraper_stores_records_and_dead_letters_failures(monkeypatch, tmp_path, use_async):
+    failing = {'1000003', '1000006'}
+
+    assert _run(monkeypatch, tmp_path, FailingIpIndia(failing), use_async) is True
+
+    assert _stored_numbers() == [number for number in NUMBERS if number not in failing]
+    assert _dead_letters() == sorted(failing)
+
+
+@pytest.mark.parametrize('use_async', [False, True], ids=['threads', 'async'])
+def test_scraper_chains_detail_postbacks(monkeypatch, tmp_path, use_async):
+    server = MockIpIndia(chaining=True)
+
+    assert _run(monkeypatch, tmp_path, server, use_async) is True
+
+    assert _stored_numbers() == NUMBERS
+    # a search and a detail postback for each session's first number, one postback for the others
+    assert server.requests < 2 * len(NUMBERS)
+
+
+@pytest.mark.parametrize('use_async', [False, True], ids=['threads', 'async'])
+def test_scraper_rewarms_rejected_sessions(monkeypatch, tmp_path, use_async):
+    server = MockIpIndia(captcha_expiry=2)
+
+    assert _run(monkeypatch, tmp_path, server, use_async) is True
+
+    assert _stored_numbers() == NUMBERS
+    assert server.rejections
+
+
+@pytest.mark.parametrize('use_async', [False, True], ids=['threads', 'async'])
+def test_scraper_fails_when_every_lookup_fails(monkeypatch, tmp_path, use_async):
+    assert _run(monkeypatch, tmp_path, FailingIpIndia(set(NUMBERS)), use_async) is False
+
+    assert _stored_numbers() == []
+    assert _dead_letters() == NUMBERS
@@ -0,0 +1,238 @@
+import asyncio
+import logging
+from itertools import islice
+
+import aiohttp
+
+from doc_utils.metrics import METRICS, REQUEST_LOG, ProgressReporter
+from doc_utils.result_sink import JsonlResultSink
+from doc_utils.spreadsheet_utils import THREAD_FILE_PREFIX
+from trademark.captcha_requester import CaptchaError
+from trademark.constants import BASE_URL, CAPTCHA_PATH, GET_CAPTCHA_PATH, REQUEST_TIMEOUT, TRADEMARK_PATH
+from trademark.data_parser import parse_payload
+from trademark.request_scheduler import UNPARSED_FILE, AdaptiveRateLimiter, DeadLetterFile, fetch_with_retry_async
+from trademark.trademark_requester import (
+    SessionRejectedError,
+    build_chained_payload,
+    build_initial_payload,
+    chained_detail_text,
+    check_session,
+    detail_text,
+    is_server_error,
+)
+from trademark.viewstate_cache import ViewStateCache
+from doc_utils.work_source import TextFileSource, WorkSource
+from trademark.webxela_automator import (
+    EXTRACTED_DATA_DIR,
+    LOOKAHEAD_PER_WORKER,
+    cleanup_generated_files,
+    finish_run,
+    initial_cleanup,
+    iter_work,
+    log_run_summary,
+    record_lookup,
+    thread_file_sink,
+)
+
+logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
+
+
+async def request_captcha_async(session: aiohttp.ClientSession, base_url: str = BASE_URL) -> str | None:
+    async with session.post(url=base_url + GET_CAPTCHA_PATH, json={}) as response:
+        if response.status == 200:
+            captcha = (await response.json(content_type=None)).get('d')
+            REQUEST_LOG.info("Captcha Request was successful!")
+            REQUEST_LOG.info(f"Response captcha: {captcha}")
+            return captcha
+        else:
+            logging.error(f"Failed with status code: {response.status}")
+            logging.error(f"Response text: {await response.text()}")
+            return None
+
+
+def raise_for_server_status(response: aiohttp.ClientResponse):
+    if is_server_error(response.status):
+        response.raise_for_status()
+
+
+async def request_trademark_data_async(
+        appl_number: str,
+        captcha_value,
+        session: aiohttp.ClientSession,
+        base_url: str = BASE_URL,
+        viewstate_cache: ViewStateCache | None = None,
+) -> str | None:
+    url = base_url + TRADEMARK_PATH
+    round_trips = 0
+    chained = None
+
+    cached_fields = viewstate_cache.get(session) if viewstate_cache is not None else None
+    if cached_fields is not None:
+        # detail postback straight from the previous response's state, one round trip
+        with METRICS.stage('network'):
+            async with session.post(url=url, data=build_chained_payload(cached_fields, appl_number, captcha_value)) \
+                    as chained_response:
+                chained_text = await chained_response.text()
+        round_trips += 1
+        text = chained_detail_text(chained_response.status, chained_text, appl_number, session, viewstate_cache,
+                                   round_trips)
+        if text is not None:
+            return text
+        # the server refused the cached state, fall back to the two-step flow
+        chained = False
+
+    # basic trademark info
+    with METRICS.stage('network'):
+        async with session.post(url=url, data=build_initial_payload(appl_number, captcha_value)) as initial_response:
+            initial_text = await initial_response.text()
+            raise_for_server_status(initial_response)
+    round_trips += 1
+    check_session(initial_text, appl_number)
+
+    # getting detailed trademark info
+    final_payload = parse_payload(initial_text)
+    with METRICS.stage('network'):
+        async with session.post(url=url, data=final_payload) as response:
+            text = await response.text()
+            raise_for_server_status(response)
+    round_trips += 1
+    return detail_text(response.status, text, appl_number, session, viewstate_cache, round_trips, chained)
+
+
+async def warm_session_async(session: aiohttp.ClientSession, base_url: str = BASE_URL) -> str:
+    """Start a fresh ASP.NET session on ``session`` and return its captcha."""
+    session.cookie_jar.clear()
+    with METRICS.stage('warm'):
+        async with session.get(url=base_url + CAPTCHA_PATH) as response:
+            await response.read()
+        async with session.get(url=base_url + TRADEMARK_PATH) as response:
+            await response.read()
+
+    with METRICS.stage('captcha'):
+        captcha = await request_captcha_async(session, base_url)
+    if not captcha:
+        raise CaptchaError("Captcha retrieval failed")
+    return captcha
+
+
+async def process_queue(
+        queue: asyncio.Queue,
+        worker_id: int,
+        generated_files: list,
+        connector: aiohttp.TCPConnector,
+        base_url: str = BASE_URL,
+        viewstate_cache: ViewStateCache | None = None,
+        source: WorkSource | None = None,
+        limiter: AdaptiveRateLimiter | None = None,
+        dead_letter: DeadLetterFile | None = None,
+        unparsed: DeadLetterFile | None = None,
+):
+    """Async counterpart of ``process_chunk``, pulls numbers from a shared queue until it gets None."""
+    filename = f'{EXTRACTED_DATA_DIR}/{THREAD_FILE_PREFIX}{worker_id}{JsonlResultSink.extension}'
+    # registered up front so a worker cancelled mid-run is still cleaned up
+    generated_files.append(filename)
+
+    # each worker keeps its own cookies (the captcha is bound to the ASP.NET session) but shares the pool
+    async with aiohttp.ClientSession(
+            connector=connector,
+            connector_owner=False,
+            cookie_jar=aiohttp.CookieJar(unsafe=True),
+            timeout=aiohttp.ClientTimeout(total=REQUEST_TIMEOUT),
+    ) as session:
+        captcha = None
+
+        async def lookup(app_num: str) -> str | None:
+            nonlocal captcha
+            # warmed by the first lookup, so a failed warm-up is retried like any failed lookup
+            if captcha is None:
+                captcha = await warm_session_async(session, base_url)
+            try:
+                return await request_trademark_data_async(app_num, captcha, session, base_url, viewstate_cache)
+            except SessionRejectedError:
+                METRICS.count_error('captcha')
+                logging.warning(f"Session of worker {worker_id} was rejected by the server, warming it again")
+                if viewstate_cache is not None:
+                    viewstate_cache.invalidate(session)
+                captcha = None
+                captcha = await warm_session_async(session, base_url)
+                return await request_trademark_data_async(app_num, captcha, session, base_url, viewstate_cache)
+
+        with thread_file_sink(filename, f"worker {worker_id}") as sink:
+            while (app_num := await queue.get()) is not None:
+                # failures are retried, then dead-lettered, they no longer abort the worker
+                response = await fetch_with_retry_async(lookup, app_num, limiter, dead_letter)
+                record_lookup(app_num, response, sink, source, unparsed)
+
+
+# numbers handed from the source to the event loop per thread hop
+FEED_BATCH_SIZE = 100
+
+
+async def feed_queue(numbers, queue: asyncio.Queue, workers: int):
+    """
+    Fill ``queue`` from ``numbers``, then one None per worker. The iterable is
+    advanced in a thread, a batch at a time, since reading a PDF or workbook
+    would otherwise block the event loop.
+    """
+    numbers = iter(numbers)
+    while batch := await asyncio.to_thread(lambda: list(islice(numbers, FEED_BATCH_SIZE))):
+        for app_num in batch:
+            await queue.put(app_num)
+    for _ in range(workers):
+        await queue.put(None)
+
+
+async def automate_webxela_async(
+        concurrency: int,
+        base_url: str = BASE_URL,
+        refetch_after_days: float | None = None,
+        source: WorkSource | None = None,
+):
+    source = source or TextFileSource()
+    generated_files = []
+
+    initial_cleanup(EXTRACTED_DATA_DIR)
+
+    try:
+        queue = asyncio.Queue(maxsize=concurrency * LOOKAHEAD_PER_WORKER)
+        viewstate_cache = ViewStateCache()
+        limiter = AdaptiveRateLimiter(burst=concurrency)
+        dead_letter = DeadLetterFile()
+        unparsed = DeadLetterFile(UNPARSED_FILE)
+        connector = aiohttp.TCPConnector(limit=concurrency, ssl=False)
+        total = source.size()
+        METRICS.reset(total=total)
+        # every worker warms a session, no more of them than numbers
+        workers = concurrency if total is None else max(1, min(concurrency, total))
+        try:
+            tasks = [asyncio.create_task(feed_queue(iter_work(source, refetch_after_days), queue, workers))]
+            tasks += [
+                asyncio.create_task(
+                    process_queue(queue, worker_id + 1, generated_files, connector, base_url, viewstate_cache, source,
+                                  limiter, dead_letter, unparsed))
+                for worker_id in range(workers)
+            ]
+            with ProgressReporter(METRICS):
+                try:
+                    await asyncio.gather(*tasks)
+                except BaseException:
+                    for task in tasks:
+                        task.cancel()
+                    await asyncio.gather(*tasks, return_exceptions=True)
+                    raise
+        finally:
+            await connector.close()
+            logging.info(f"Viewstate cache: {viewstate_cache.stats()}")
+            log_run_summary(limiter, dead_letter, unparsed)
+
+        return finish_run(source, dead_letter)
+
+    except Exception as e:
+        logging.error(f"Error during processing: {e}")
+        print("Error occurred. Cleaning up generated files...")
+
+        cleanup_generated_files(generated_files)
+        return False
+
+    finally:
+        print("Process finished.")
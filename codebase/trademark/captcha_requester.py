@@ -2,18 +2,26 @@ import logging
 
 from requests import Session
 
+from doc_utils.metrics import METRICS, REQUEST_LOG
+from trademark.constants import GET_CAPTCHA_URL, REQUEST_TIMEOUT
+
+
+class CaptchaError(Exception):
+    """No captcha could be obtained for a session."""
+
 
 def request_captcha(session: Session) -> str | None:
 
-    url = 'https://tmrsearch.ipindia.gov.in/eregister/Viewdetails_Copyright.aspx/GetCaptcha'
+    url = GET_CAPTCHA_URL
 
     payload = {}
 
-    response = session.post(url = url, json=payload, verify=False)
+    with METRICS.stage('captcha'):
+        response = session.post(url = url, json=payload, verify=False, timeout=REQUEST_TIMEOUT)
 
     if response.status_code == 200:
-        logging.info("Captcha Request was successful!")
-        logging.info(f"Response captcha: {response.json().get('d')}")
+        REQUEST_LOG.info("Captcha Request was successful!")
+        REQUEST_LOG.info(f"Response captcha: {response.json().get('d')}")
         return response.json().get('d')
     else:
         logging.error(f"Failed with status code: {response.status_code}")
@@ -0,0 +1,15 @@
+import os
+
+# overridable so the scraper can be pointed at a local stub of the eregister site
+BASE_URL = os.environ.get("IPINDIA_BASE_URL", "https://tmrsearch.ipindia.gov.in/eregister").rstrip("/")
+
+CAPTCHA_PATH = "/captcha.ashx"
+TRADEMARK_PATH = "/Application_View.aspx"
+GET_CAPTCHA_PATH = "/Viewdetails_Copyright.aspx/GetCaptcha"
+
+CAPTCHA_URL = BASE_URL + CAPTCHA_PATH
+TRADEMARK_URL = BASE_URL + TRADEMARK_PATH
+GET_CAPTCHA_URL = BASE_URL + GET_CAPTCHA_PATH
+
+# seconds, so a hung connection fails and gets retried instead of stalling its worker
+REQUEST_TIMEOUT = float(os.environ.get("IPINDIA_REQUEST_TIMEOUT", 30))
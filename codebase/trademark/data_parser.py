@@ -1,9 +1,149 @@
+import html
 import logging
+import re
 
 from bs4 import BeautifulSoup
+from lxml import etree
+from lxml import html as lxml_html
+
+from doc_utils.metrics import METRICS
+from doc_utils.records import intern_label
+
+# 'lxml' is the fast backend, 'bs4' the original BeautifulSoup one. On unclosed cells and rows
+# html.parser nests the rows into each other and loses fields, lxml keeps them apart
+LXML_BACKEND = 'lxml'
+BS4_BACKEND = 'bs4'
+DEFAULT_PARSER_BACKEND = LXML_BACKEND
+
+# ASP.NET form state carried from one Application_View.aspx response to the next postback
+HIDDEN_FIELD_IDS = (
+    'ToolkitScriptManager1_HiddenField',
+    '__EVENTARGUMENT',
+    '__VIEWSTATE',
+    '__VIEWSTATEGENERATOR',
+    '__VIEWSTATEENCRYPTED',
+    '__EVENTVALIDATION',
+)
+
+DETAIL_EVENT_TARGET = 'SearchWMDatagrid$ctl03$lnkbtnappNumber1'
+
+_INPUT_TAG = re.compile(r'<input\b[^>]*>', re.IGNORECASE)
+_TAG_ATTRIBUTE = re.compile(r'([^\s=/>]+)(?:\s*=\s*(?:"([^"]*)"|\'([^\']*)\'|([^\s>]+)))?')
+
+_PANEL_TABLES = etree.XPath('//*[@id="panelgetdetail"]//table')
+_ROWS = etree.XPath('.//tr')
+_CELLS = etree.XPath('.//td')
+_RED_FONT = etree.XPath('.//font[@color="red"]')
+
+# BeautifulSoup's get_text leaves out comments and the contents of these tags
+_NON_TEXT_TAGS = {'script', 'style', 'template', 'rt', 'rp'}
+# ...and collapses whitespace-only strings outside of these
+_PRESERVE_WHITESPACE_TAGS = {'pre', 'textarea'}
+_ASCII_SPACES = '\x20\x0a\x09\x0c\x0d'
+
+
+def parse_application_data(response: str, backend: str = DEFAULT_PARSER_BACKEND) -> dict | None:
+    with METRICS.stage('parse_application_data'):
+        if backend == BS4_BACKEND:
+            return _parse_application_data_bs4(response)
+        return _parse_application_data_lxml(response)
+
+
+def parse_payload(response: str, backend: str = DEFAULT_PARSER_BACKEND) -> dict | None:
+    with METRICS.stage('parse_payload'):
+        if backend == BS4_BACKEND:
+            return _parse_payload_bs4(response)
+        return _parse_payload_scan(response)
+
+
+def _bs4_string(text: str, preserve_whitespace: bool) -> str:
+    if preserve_whitespace or text.strip(_ASCII_SPACES):
+        return text
+    return '\n' if '\n' in text else ' '
+
+
+def _strings(element, preserve_whitespace: bool = False):
+    preserve_whitespace = preserve_whitespace or element.tag in _PRESERVE_WHITESPACE_TAGS
+    if element.tag not in _NON_TEXT_TAGS and element.text:
+        yield _bs4_string(element.text, preserve_whitespace)
+    for child in element:
+        if isinstance(child.tag, str):
+            yield from _strings(child, preserve_whitespace)
+        elif child.text and child.text.startswith('[CDATA[') and child.text.endswith(']]'):
+            # libxml2 keeps CDATA sections in HTML as comments, BeautifulSoup as text
+            yield child.text[7:-2]
+        if child.tail:
+            yield _bs4_string(child.tail, preserve_whitespace)
+
+
+def _get_text(element, separator: str = "", strip: bool = False) -> str:
+    """Same text as BeautifulSoup's ``Tag.get_text`` for the same markup."""
+    if strip:
+        return separator.join(text for text in (text.strip() for text in _strings(element)) if text)
+    return separator.join(_strings(element))
+
+
+def _parse_application_data_lxml(response: str) -> dict | None:
+    try:
+
+        table_data = {}
+        document = lxml_html.document_fromstring(response)
+
+        tables = _PANEL_TABLES(document)
+
+        status_table = tables[1]
+        status_td = _ROWS(status_table)
+
+        status = _get_text(_RED_FONT(status_td[1])[0])
+        table_data.update({'status': intern_label(status)})
+
+        target_table = None
+        try:
+            if len(_ROWS(tables[2])) > 4:
+                target_table = tables[2]
+            else:
+                target_table = tables[3]
+        except IndexError:
+            logging.error("Error while finding right table")
+
+        rows = _ROWS(target_table)
+
+        try:
+            for row in rows:
+                cells = _CELLS(row)
+                if len(cells) == 2:
+                    key = _get_text(cells[0], strip=True)
+                    value = _get_text(cells[1], " ", strip=True)
+                    # labels repeat on every record, keep one copy of each
+                    table_data[intern_label(key)] = value
+        except IndexError:
+            logging.error("Error while parsing table")
+
+        return table_data
+
+    except Exception as e:
+        logging.error(f"Error while parsing data: {e}")
+        return None
+
+
+def _parse_payload_scan(response: str) -> dict | None:
+    try:
+        data = scan_hidden_fields(response)
+        return {
+            "ToolkitScriptManager1_HiddenField": data["ToolkitScriptManager1_HiddenField"],
+            "__EVENTTARGET": DETAIL_EVENT_TARGET,
+            "__EVENTARGUMENT": data["__EVENTARGUMENT"],
+            "__VIEWSTATE": data["__VIEWSTATE"],
+            "__VIEWSTATEGENERATOR": data["__VIEWSTATEGENERATOR"],
+            "__VIEWSTATEENCRYPTED": data["__VIEWSTATEENCRYPTED"],
+            "__EVENTVALIDATION": data["__EVENTVALIDATION"],
+        }
+    except Exception as e:
+        logging.error(f"Error while parsing payload: {e}")
+        return None
 
 
-def parse_application_data(response: str) -> dict | None:
+def _parse_application_data_bs4(response: str) -> dict | None:
     try:
 
         table_data = {}
@@ -15,7 +155,7 @@ def parse_application_data(response: str) -> dict | None:
         status_td = status_table.find_all('tr')
 
         status = status_td[1].find('font', color='red').text
-        table_data.update({'status': status})
+        table_data.update({'status': intern_label(status)})
 
         target_table = None
         try:
@@ -34,7 +174,8 @@ def parse_application_data(response: str) -> dict | None:
                 if len(cells) == 2:
                     key = cells[0].get_text(strip=True)
                     value = cells[1].get_text(" ", strip=True)
-                    table_data[key] = value
+                    # labels repeat on every record, keep one copy of each
+                    table_data[intern_label(key)] = value
         except IndexError:
             logging.error("Error while parsing table")
 
@@ -45,11 +186,11 @@ def parse_application_data(response: str) -> dict | None:
         return None
 
 
-def parse_payload(response: str) -> dict | None:
+def _parse_payload_bs4(response: str) -> dict | None:
     try:
         soup = BeautifulSoup(response, 'html.parser')
 
-        event_target = 'SearchWMDatagrid$ctl03$lnkbtnappNumber1'
+        event_target = DETAIL_EVENT_TARGET
         hidden_field = (soup.find(id='ToolkitScriptManager1_HiddenField').get("value", "")) \
             if soup.find(id='ToolkitScriptManager1_HiddenField') else ""
         event_argument = (soup.find(id='__EVENTARGUMENT').get("value", ""))\
@@ -77,3 +218,23 @@ def parse_payload(response: str) -> dict | None:
     except Exception as e:
         logging.error(f"Error while parsing payload: {e}")
         return None
+
+
+def scan_hidden_fields(response: str) -> dict:
+    """Values of ``HIDDEN_FIELD_IDS`` from a single pass over the page's input tags, without a DOM."""
+    fields = dict.fromkeys(HIDDEN_FIELD_IDS, "")
+    pending = set(HIDDEN_FIELD_IDS)
+
+    for tag in _INPUT_TAG.finditer(response):
+        attributes = {}
+        for name, double_quoted, single_quoted, unquoted in _TAG_ATTRIBUTE.findall(tag.group(0)[6:]):
+            attributes.setdefault(name.lower(), double_quoted or single_quoted or unquoted)
+
+        element_id = html.unescape(attributes.get('id', ''))
+        if element_id in pending:
+            fields[element_id] = html.unescape(attributes.get('value', ''))
+            pending.discard(element_id)
+            if not pending:
+                break
+
+    return fields
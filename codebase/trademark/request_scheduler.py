@@ -0,0 +1,258 @@
+import asyncio
+import logging
+import random
+import threading
+import time
+
+import aiohttp
+import requests
+
+from doc_utils.metrics import METRICS
+from trademark.captcha_requester import CaptchaError
+from trademark.trademark_requester import SessionRejectedError
+
+# error kinds, see classify_error
+SERVER_ERROR = 'server'
+THROTTLED = 'throttled'
+TIMEOUT = 'timeout'
+CONNECTION_ERROR = 'connection'
+CAPTCHA_ERROR = 'captcha'
+OTHER_ERROR = 'other'
+
+RETRYABLE_ERRORS = {SERVER_ERROR, THROTTLED, TIMEOUT, CONNECTION_ERROR, CAPTCHA_ERROR}
+# errors that mean the server is struggling with our request rate
+CONGESTION_ERRORS = {SERVER_ERROR, THROTTLED, TIMEOUT, CONNECTION_ERROR}
+
+DEAD_LETTER_FILE = 'data/application_num/dead_letter.txt'
+# numbers whose page held no trademark data, e.g. the gaps of a generated range
+UNPARSED_FILE = 'data/application_num/unparsed.txt'
+
+
+def classify_error(error: Exception) -> str:
+    """Kind of a failed lookup, from the threaded (requests) or the async (aiohttp) scraper."""
+    if isinstance(error, (requests.Timeout, asyncio.TimeoutError)):
+        return TIMEOUT
+    status = None
+    if isinstance(error, requests.HTTPError) and error.response is not None:
+        status = error.response.status_code
+    elif isinstance(error, aiohttp.ClientResponseError):
+        status = error.status
+    if status == 429:
+        return THROTTLED
+    if status is not None and status >= 500:
+        return SERVER_ERROR
+    if isinstance(error, (requests.ConnectionError, aiohttp.ClientConnectionError)):
+        return CONNECTION_ERROR
+    if isinstance(error, (SessionRejectedError, CaptchaError)):
+        return CAPTCHA_ERROR
+    return OTHER_ERROR
+
+
+def backoff_delay(attempt: int, base: float = 1.0, cap: float = 30.0) -> float:
+    """Exponential backoff with full jitter, so retrying workers do not fire in lockstep."""
+    return random.uniform(0, min(cap, base * 2 ** attempt))
+
+
+class AdaptiveRateLimiter:
+    """
+    Token bucket shared by all scraping workers, with a rate that adapts to the server.
+
+    Every request takes a token first. The rate grows additively while requests
+    succeed faster than ``latency_target`` and is cut multiplicatively once the
+    recent share of congestion errors (5xx, timeouts, dropped connections)
+    exceeds ``error_threshold``, or on any 429. Cuts happen at most once per
+    ``cooldown`` seconds so a burst of failures counts as one signal, and slow
+    successes shrink the rate gently. It settles near the fastest rate the
+    server tolerates.
+    """
+
+    def __init__(
+            self,
+            rate: float = 4.0,
+            min_rate: float = 0.5,
+            max_rate: float = 50.0,
+            burst: int = 4,
+            latency_target: float = 2.0,
+            increase: float = 0.5,
+            decrease: float = 0.7,
+            cooldown: float = 2.0,
+            error_threshold: float = 0.1,
+    ):
+        self.rate = rate
+        self.min_rate = min_rate
+        self.max_rate = max_rate
+        self.burst = burst
+        self.latency_target = latency_target
+        self.increase = increase
+        self.decrease = decrease
+        self.cooldown = cooldown
+        self.error_threshold = error_threshold
+        # moving average of congestion errors over roughly the last 20 requests
+        self.error_rate = 0.0
+        self.successes = 0
+        self.errors = {}
+        self._tokens = float(burst)
+        self._refilled_at = time.monotonic()
+        self._decreased_at = 0.0
+        self._lock = threading.Lock()
+
+    def _refill(self, now: float):
+        self._tokens = min(self.burst, self._tokens + (now - self._refilled_at) * self.rate)
+        self._refilled_at = now
+
+    def _take(self) -> float:
+        """Take a token, or return how long to wait before one is available."""
+        with self._lock:
+            now = time.monotonic()
+            self._refill(now)
+            if self._tokens >= 1:
+                self._tokens -= 1
+                return 0.0
+            return (1 - self._tokens) / self.rate
+
+    def acquire(self):
+        while wait := self._take():
+            time.sleep(wait)
+
+    async def acquire_async(self):
+        """``acquire`` for the async scraper, waits without blocking the event loop."""
+        while wait := self._take():
+            await asyncio.sleep(wait)
+
+    def record(self, latency: float, error_kind: str | None = None):
+        with self._lock:
+            now = time.monotonic()
+            self._refill(now)
+            self.error_rate += 0.05 * ((error_kind in CONGESTION_ERRORS) - self.error_rate)
+            if error_kind is None:
+                self.successes += 1
+                if latency <= self.latency_target:
+                    # roughly +increase req/s per second of successful traffic
+                    self.rate = min(self.max_rate, self.rate + self.increase / self.rate)
+                else:
+                    self.rate = max(self.min_rate, self.rate * 0.95)
+                return
+
+            self.errors[error_kind] = self.errors.get(error_kind, 0) + 1
+            congested = error_kind == THROTTLED or \
+                (error_kind in CONGESTION_ERRORS and self.error_rate > self.error_threshold)
+            if congested and now - self._decreased_at >= self.cooldown:
+                self._decreased_at = now
+                self.rate = max(self.min_rate, self.rate * self.decrease)
+                logging.warning(f"Server is struggling ({error_kind}), slowing down to {self.rate:.2f} req/s")
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {
+                'rate': round(self.rate, 2),
+                'error_rate': round(self.error_rate, 3),
+                'successes': self.successes,
+                'errors': dict(self.errors),
+            }
+
+
+class DeadLetterFile:
+    """
+    Application numbers that failed every attempt, one per line, ready to be fed
+    back as input. Runs append to the file, the dead letters of earlier runs
+    stay until whoever retries them clears it.
+    """
+
+    def __init__(self, path: str = DEAD_LETTER_FILE):
+        self.path = path
+        self.count = 0
+        self._lock = threading.Lock()
+
+    def add(self, appl_number: str, error_kind: str):
+        with self._lock:
+            with open(self.path, 'a') as file:
+                file.write(f"{appl_number}\n")
+            self.count += 1
+        logging.error(f"Gave up on application number {appl_number} ({error_kind}), added to {self.path}")
+
+
+def _failed_attempt(
+        error: Exception,
+        appl_number: str,
+        attempt: int,
+        max_attempts: int,
+        latency: float,
+        limiter: AdaptiveRateLimiter | None,
+        dead_letter: DeadLetterFile | None,
+) -> float | None:
+    """Record a failed attempt. Returns the backoff before the next one, None once the number is dead-lettered."""
+    error_kind = classify_error(error)
+    METRICS.count_error(error_kind)
+    if limiter is not None:
+        limiter.record(latency, error_kind)
+
+    if error_kind in RETRYABLE_ERRORS and attempt + 1 < max_attempts:
+        delay = backoff_delay(attempt)
+        logging.warning(f"Request for {appl_number} failed ({error_kind}: {error}), retrying in {delay:.1f}s")
+        return delay
+
+    logging.error(f"Request for {appl_number} failed ({error_kind}): {error}")
+    if dead_letter is not None:
+        dead_letter.add(appl_number, error_kind)
+    return None
+
+
+def fetch_with_retry(
+        request,
+        appl_number: str,
+        limiter: AdaptiveRateLimiter | None = None,
+        dead_letter: DeadLetterFile | None = None,
+        max_attempts: int = 4,
+):
+    """
+    Call ``request(appl_number)`` paced by ``limiter``, retrying retryable errors
+    with jittered backoff. Returns None once the number is dead-lettered.
+    """
+    for attempt in range(max_attempts):
+        if limiter is not None:
+            with METRICS.stage('rate_limit_wait'):
+                limiter.acquire()
+        started = time.monotonic()
+        try:
+            with METRICS.in_flight_request():
+                response = request(appl_number)
+        except Exception as e:
+            delay = _failed_attempt(e, appl_number, attempt, max_attempts, time.monotonic() - started,
+                                    limiter, dead_letter)
+            if delay is None:
+                return None
+            time.sleep(delay)
+            continue
+
+        if limiter is not None:
+            limiter.record(time.monotonic() - started)
+        return response
+
+
+async def fetch_with_retry_async(
+        request,
+        appl_number: str,
+        limiter: AdaptiveRateLimiter | None = None,
+        dead_letter: DeadLetterFile | None = None,
+        max_attempts: int = 4,
+):
+    """``fetch_with_retry`` for a coroutine function ``request``, as the async scraper uses it."""
+    for attempt in range(max_attempts):
+        if limiter is not None:
+            with METRICS.stage('rate_limit_wait'):
+                await limiter.acquire_async()
+        started = time.monotonic()
+        try:
+            with METRICS.in_flight_request():
+                response = await request(appl_number)
+        except Exception as e:
+            delay = _failed_attempt(e, appl_number, attempt, max_attempts, time.monotonic() - started,
+                                    limiter, dead_letter)
+            if delay is None:
+                return None
+            await asyncio.sleep(delay)
+            continue
+
+        if limiter is not None:
+            limiter.record(time.monotonic() - started)
+        return response
@@ -0,0 +1,117 @@
+import logging
+import queue
+import threading
+from contextlib import contextmanager
+
+import requests
+
+from doc_utils.metrics import METRICS
+from trademark.captcha_requester import CaptchaError, request_captcha
+from trademark.constants import CAPTCHA_URL, REQUEST_TIMEOUT, TRADEMARK_URL
+from trademark.trademark_requester import SessionRejectedError, request_trademark_data
+from trademark.viewstate_cache import ViewStateCache
+
+
+class PooledSession:
+
+    def __init__(self, session_id: int):
+        self.session_id = session_id
+        self.session = None
+        self.captcha = None
+
+    def warm(self):
+        """Open a fresh ASP.NET session and solve its captcha."""
+        if self.session is not None:
+            self.session.close()
+
+        self.session = requests.Session()
+        with METRICS.stage('warm'):
+            self.session.get(url=CAPTCHA_URL, verify=False, timeout=REQUEST_TIMEOUT)
+            self.session.get(url=TRADEMARK_URL, verify=False, timeout=REQUEST_TIMEOUT)
+
+        self.captcha = request_captcha(self.session)
+        if not self.captcha:
+            logging.error(f"Error retrieving captcha for pooled session {self.session_id}")
+            raise CaptchaError("Captcha retrieval failed")
+
+
+class SessionPool:
+    """
+    Keeps up to ``size`` warmed eregister sessions, each holding a valid captcha,
+    and lends them to scraping workers one lookup at a time. A session whose
+    captcha or viewstate gets rejected is warmed again on its own and the
+    lookup retried, the other sessions are left alone.
+    """
+
+    def __init__(self, size: int):
+        self.size = size
+        self.warmups = 0
+        self.rewarms = 0
+        self.viewstate_cache = ViewStateCache()
+        self._idle = queue.Queue()
+        self._created = 0
+        self._lock = threading.Lock()
+
+    def _new_session(self) -> PooledSession | None:
+        with self._lock:
+            if self._created >= self.size:
+                return None
+            self._created += 1
+            pooled = PooledSession(self._created)
+
+        try:
+            pooled.warm()
+        except Exception:
+            with self._lock:
+                self._created -= 1
+            raise
+        with self._lock:
+            self.warmups += 1
+        return pooled
+
+    @contextmanager
+    def acquire(self):
+        try:
+            pooled = self._idle.get_nowait()
+        except queue.Empty:
+            # sessions are warmed lazily, by the first workers that need them
+            pooled = self._new_session() or self._idle.get()
+        try:
+            yield pooled
+        finally:
+            self._idle.put(pooled)
+
+    def _rewarm(self, pooled: PooledSession):
+        logging.warning(f"Session {pooled.session_id} was rejected by the server, warming it again")
+        pooled.warm()
+        with self._lock:
+            self.rewarms += 1
+
+    def request_trademark_data(self, appl_number: str) -> str | None:
+        with self.acquire() as pooled:
+            try:
+                return request_trademark_data(
+                    appl_number=appl_number,
+                    captcha_value=pooled.captcha,
+                    session=pooled.session,
+                    viewstate_cache=self.viewstate_cache,
+                )
+            except SessionRejectedError:
+                METRICS.count_error('captcha')
+                self.viewstate_cache.invalidate(pooled.session)
+                self._rewarm(pooled)
+                return request_trademark_data(
+                    appl_number=appl_number,
+                    captcha_value=pooled.captcha,
+                    session=pooled.session,
+                    viewstate_cache=self.viewstate_cache,
+                )
+
+    def close(self):
+        while True:
+            try:
+                pooled = self._idle.get_nowait()
+            except queue.Empty:
+                break
+            if pooled.session is not None:
+                pooled.session.close()
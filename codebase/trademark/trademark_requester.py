@@ -1,18 +1,45 @@
 import logging
-from requests import Session
+import re
 
-from trademark.data_parser import parse_payload
+from requests import Response, Session
+
+from doc_utils.metrics import METRICS, REQUEST_LOG
+from trademark.constants import REQUEST_TIMEOUT, TRADEMARK_URL
+from trademark.data_parser import DETAIL_EVENT_TARGET, parse_payload, scan_hidden_fields
+from trademark.viewstate_cache import ViewStateCache
 
 logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
 
-def request_trademark_data(
-        appl_number: str,
-        captcha_value,
-        session: Session,
-) -> str | None:
-    url = 'https://tmrsearch.ipindia.gov.in/eregister/Application_View.aspx'
+# pages the server returns when it refuses the session's captcha or viewstate rather than the number
+SESSION_REJECTION_PATTERN = re.compile(
+    r"Validation of viewstate MAC failed"
+    r"|Invalid postback or callback argument"
+    r"|The state information is invalid for this page"
+    r"|alert\(\s*['\"][^'\"]*captcha",
+    re.IGNORECASE,
+)
+
+
+class SessionRejectedError(Exception):
+    """The server rejected the session's captcha or viewstate, the session has to be warmed again."""
+
+
+def is_session_rejected(response_text: str) -> bool:
+    return bool(SESSION_REJECTION_PATTERN.search(response_text))
+
 
-    initial_payload = {
+def is_server_error(status: int) -> bool:
+    """5xx and 429 answers are worth retrying later, other failures are returned as None."""
+    return status >= 500 or status == 429
+
+
+def raise_for_server_error(response: Response):
+    if is_server_error(response.status_code):
+        response.raise_for_status()
+
+
+def build_initial_payload(appl_number: str, captcha_value) -> dict:
+    return {
         "ToolkitScriptManager1_HiddenField": ";;AjaxControlToolkit, Version=3.5.11119.20050, Culture=neutral, PublicKeyToken=28f01b0e84b6d53e:en-US:8e147239-dd05-47b0-8fb3-f743a139f982:865923e8:91bd373d:8e72a662:411fea1c:acd642d2:596d588c:77c58d20:14b56adc:269a19ae",
         "__EVENTTARGET": "",
         "__EVENTARGUMENT": "",
@@ -26,26 +53,110 @@ def request_trademark_data(
     }
 
 
+def build_chained_payload(hidden_fields: dict, appl_number: str, captcha_value) -> dict:
+    payload = dict(hidden_fields)
+    payload.update({
+        "__EVENTTARGET": DETAIL_EVENT_TARGET,
+        "applNumber": appl_number,
+        "captcha1": captcha_value,
+    })
+    return payload
+
+
+def is_detail_page_for(response_text: str, appl_number: str) -> bool:
+    return 'panelgetdetail' in response_text and \
+        re.search(rf'>\s*{re.escape(appl_number)}\s*<', response_text) is not None
+
+
+# the decisions of a lookup, shared by request_trademark_data and its aiohttp twin in async_automator
+
+def check_session(response_text: str, appl_number: str):
+    if is_session_rejected(response_text):
+        raise SessionRejectedError(f"Session rejected while requesting application number {appl_number}")
+
+
+def chained_detail_text(status: int, text: str, appl_number: str, session, viewstate_cache: ViewStateCache,
+                        round_trips: int) -> str | None:
+    """The detail page answering a chained postback, None when the server refused the cached state."""
+    if status == 200 and is_detail_page_for(text, appl_number):
+        viewstate_cache.update(session, scan_hidden_fields(text))
+        viewstate_cache.record(round_trips, chained=True, session=session)
+        REQUEST_LOG.info("Trademark Data Request was successful!")
+        return text
+    return None
+
+
+def detail_text(status: int, text: str, appl_number: str, session, viewstate_cache: ViewStateCache | None,
+                round_trips: int, chained: bool | None) -> str | None:
+    """The detail page answering the second step of a lookup, None when the server answered with an error."""
+    check_session(text, appl_number)
+
+    if viewstate_cache is not None:
+        viewstate_cache.record(round_trips, chained=chained, session=session)
+        if status == 200:
+            viewstate_cache.update(session, scan_hidden_fields(text))
+
+    if status == 200:
+        REQUEST_LOG.info("Trademark Data Request was successful!")
+        return text
+    else:
+        logging.error(f"Failed with status code: {status}")
+        logging.error(f"Response text: {text}")
+        return None
+
+
+def request_trademark_data(
+        appl_number: str,
+        captcha_value,
+        session: Session,
+        viewstate_cache: ViewStateCache | None = None,
+) -> str | None:
+    url = TRADEMARK_URL
+    round_trips = 0
+    chained = None
+
+    cached_fields = viewstate_cache.get(session) if viewstate_cache is not None else None
+    if cached_fields is not None:
+        # detail postback straight from the previous response's state, one round trip
+        with METRICS.stage('network'):
+            chained_response = session.post(
+                url=url,
+                data=build_chained_payload(cached_fields, appl_number, captcha_value),
+                verify=False,
+                timeout=REQUEST_TIMEOUT,
+            )
+        round_trips += 1
+        text = chained_detail_text(chained_response.status_code, chained_response.text, appl_number, session,
+                                   viewstate_cache, round_trips)
+        if text is not None:
+            return text
+        # the server refused the cached state, fall back to the two-step flow
+        chained = False
+
+    initial_payload = build_initial_payload(appl_number, captcha_value)
+
     # basic trademark info
-    initial_response = session.post(
-        url=url,
-        data=initial_payload,
-        verify=False
-    )
+    with METRICS.stage('network'):
+        initial_response = session.post(
+            url=url,
+            data=initial_payload,
+            verify=False,
+            timeout=REQUEST_TIMEOUT,
+        )
+    round_trips += 1
+    raise_for_server_error(initial_response)
+    check_session(initial_response.text, appl_number)
 
     # getting detailed trademark info
     final_payload = parse_payload(initial_response.text)
-    response = session.post(
-        url=url,
-        data=final_payload,
-        verify=False
-    )
-
-    if response.status_code == 200:
-        logging.info("Trademark Data Request was successful!")
-        # print(response.text)
-        return response.text
-    else:
-        logging.error("Failed with status code:", response.status_code)
-        logging.error("Response text:", response.text)
-        return None
+    with METRICS.stage('network'):
+        response = session.post(
+            url=url,
+            data=final_payload,
+            verify=False,
+            timeout=REQUEST_TIMEOUT,
+        )
+    round_trips += 1
+
+    raise_for_server_error(response)
+    return detail_text(response.status_code, response.text, appl_number, session, viewstate_cache, round_trips, chained)
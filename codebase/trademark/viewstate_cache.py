@@ -0,0 +1,65 @@
+import threading
+import weakref
+
+
+class ViewStateCache:
+    """
+    Latest ASP.NET hidden fields seen by each eregister session.
+
+    With a cached state a lookup first tries the detail postback directly, in one
+    round trip instead of two. A session whose cached state is refused
+    ``max_misses`` times in a row stops chaining and keeps the two-step flow.
+    Round trips are counted per application so the saving can be measured.
+    """
+
+    def __init__(self, max_misses: int = 3):
+        self.max_misses = max_misses
+        self.applications = 0
+        self.round_trips = 0
+        self.chained_hits = 0
+        self.chained_misses = 0
+        self._states = weakref.WeakKeyDictionary()
+        self._misses = weakref.WeakKeyDictionary()
+        self._lock = threading.Lock()
+
+    def get(self, session) -> dict | None:
+        with self._lock:
+            if self._misses.get(session, 0) >= self.max_misses:
+                return None
+            return self._states.get(session)
+
+    def update(self, session, hidden_fields: dict):
+        with self._lock:
+            self._states[session] = hidden_fields
+
+    def invalidate(self, session):
+        """Forget a session's state, e.g. after it was warmed again with new cookies."""
+        with self._lock:
+            self._states.pop(session, None)
+            self._misses.pop(session, None)
+
+    def record(self, round_trips: int, chained: bool | None, session=None):
+        """Count one application; ``chained`` is None when no cached state was tried."""
+        with self._lock:
+            self.applications += 1
+            self.round_trips += round_trips
+            if chained:
+                self.chained_hits += 1
+                if session is not None:
+                    self._misses.pop(session, None)
+            elif chained is not None:
+                self.chained_misses += 1
+                if session is not None:
+                    self._states.pop(session, None)
+                    self._misses[session] = self._misses.get(session, 0) + 1
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {
+                'applications': self.applications,
+                'round_trips': self.round_trips,
+                'round_trips_per_application': round(self.round_trips / self.applications, 3)
+                if self.applications else 0.0,
+                'chained_hits': self.chained_hits,
+                'chained_misses': self.chained_misses,
+            }
@@ -1,96 +1,230 @@
 import logging
 import os
+import queue
+import threading
 from concurrent.futures.thread import ThreadPoolExecutor
-from math import ceil
-import requests
+from contextlib import contextmanager
 
-from doc_utils.spreadsheet_utils import combine_excel_files, save_to_excel
-from trademark.captcha_requester import request_captcha
+from doc_utils.metrics import DEFAULT_REPORT_PATH, METRICS, ProgressReporter
+from doc_utils.result_sink import JsonlResultSink
+from doc_utils.spreadsheet_utils import THREAD_FILE_EXTENSIONS, THREAD_FILE_PREFIX, combine_excel_files
+from doc_utils.trademark_store import normalize_application_number, scraped_numbers_to_skip
+from doc_utils.work_source import TextFileSource, WorkSource
 from trademark.data_parser import parse_application_data
-from trademark.trademark_requester import request_trademark_data
+from trademark.request_scheduler import UNPARSED_FILE, AdaptiveRateLimiter, DeadLetterFile, fetch_with_retry
+from trademark.session_pool import SessionPool
 
 logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
 
 EXTRACTED_DATA_DIR = "data/extracted"
 
 
-def automate_webxela(threads: int):
-    pdf_data = "data/application_num/application_numbers.txt"
-    generated_files = []
+# numbers read ahead of the workers, per worker
+LOOKAHEAD_PER_WORKER = 8
 
 
-    initial_cleanup(EXTRACTED_DATA_DIR)
+def iter_work(source: WorkSource, refetch_after_days: float | None):
+    """
+    The numbers of ``source`` to scrape. Numbers the trademark store already
+    holds in a final or recent enough state are dropped (and marked done).
+    """
+    skip = scraped_numbers_to_skip(refetch_after_days)
+    skipped = 0
+    for app_num in source:
+        if skip and normalize_application_number(app_num) in skip:
+            source.mark_done(app_num)
+            METRICS.skip()
+            skipped += 1
+            continue
+        yield app_num
+    if skipped:
+        logging.info(f"Skipped {skipped} already scraped application number(s)")
 
+
+def feed_work(numbers, work: queue.Queue, workers: int, errors: list):
+    """Fill ``work`` from ``numbers``, then one None per worker. Blocks while the queue is full."""
     try:
-        with open(pdf_data, 'r') as file:
-            application_numbers = file.readlines()
-            application_numbers = [num.strip() for num in application_numbers]
-            chunk_size = ceil(len(application_numbers) / threads)
+        for app_num in numbers:
+            work.put(app_num)
+    except Exception as e:
+        logging.error(f"Error while reading application numbers: {e}")
+        errors.append(e)
+    finally:
+        for _ in range(workers):
+            work.put(None)
+
+
+def drain(work: queue.Queue):
+    while (app_num := work.get()) is not None:
+        yield app_num
 
-            chunks = [application_numbers[i:i + chunk_size] for i in range(0, len(application_numbers), chunk_size)]
 
-            with ThreadPoolExecutor(max_workers=threads) as executor:
-                futures = [executor.submit(process_chunk, chunk, idx + 1, generated_files) for idx, chunk in
-                           enumerate(chunks)]
+# shared by the threaded scraper here and the async one in async_automator
+
+@contextmanager
+def thread_file_sink(filename: str, worker: str):
+    """The JSONL sink of one worker, its file removed when the worker fails."""
+    sink = JsonlResultSink(filename)
+    try:
+        with sink:
+            yield sink
+    except Exception as e:
+        logging.error(f"Error during data extraction in {worker}: {e}")
+        if os.path.exists(filename):
+            os.remove(filename)
+        raise
+
+
+def record_lookup(
+        app_num: str,
+        response: str | None,
+        sink: JsonlResultSink,
+        source: WorkSource | None,
+        unparsed: DeadLetterFile | None,
+):
+    """Store the record of a finished lookup and mark its number done when the number needs no new pass."""
+    METRICS.complete()
+    if response is None:
+        # dead-lettered or refused, not marked done: a range stops before it until a later pass gets it
+        return
+    trademark_data = parse_application_data(response)
+
+    if not trademark_data:
+        METRICS.count_error('parse')
+        if unparsed is None:
+            # not marked done, a resumed range comes back to it
+            logging.error(f"Error parsing trademark data for application number: {app_num}")
+            return
+        # recorded and marked done, or a range would stop advancing at its first gap
+        unparsed.add(app_num, 'parse')
+    else:
+        # buffered, only every ``flush_every``-th record touches the disk
+        sink.write(trademark_data)
+    # stored or recorded as unparsed
+    if source is not None:
+        source.mark_done(app_num)
+
+
+def log_run_summary(limiter: AdaptiveRateLimiter, dead_letter: DeadLetterFile, unparsed: DeadLetterFile):
+    logging.info(f"Rate limiter: {limiter.stats()}")
+    METRICS.dump_json()
+    logging.info(f"Scrape metrics written to {DEFAULT_REPORT_PATH}")
+    if dead_letter.count:
+        logging.warning(f"{dead_letter.count} application number(s) failed, "
+                        f"see {dead_letter.path} to retry them in a later pass")
+    if unparsed.count:
+        logging.warning(f"{unparsed.count} application number(s) returned no trademark data, "
+                        f"see {unparsed.path}")
+
+
+def finish_run(source: WorkSource, dead_letter: DeadLetterFile) -> bool:
+    """Store the records of a run. False when every lookup was dead-lettered."""
+    combine_excel_files()
+    # only now are the records safe, generated ranges advance past them
+    source.commit()
+    if dead_letter.count and dead_letter.count >= METRICS.completed:
+        logging.error("Every lookup failed, the site is probably unreachable")
+        return False
+    return True
+
+
+def automate_webxela(
+        threads: int,
+        refetch_after_days: float | None = None,
+        source: WorkSource | None = None,
+):
+    """
+    Scrape the numbers of ``source``, application_numbers.txt by default. The
+    numbers are read as the workers need them, at most LOOKAHEAD_PER_WORKER per
+    worker ahead. With ``refetch_after_days`` set, numbers already in the store
+    are skipped unless their status is not final and was fetched more than that
+    many days ago. Returns False when the run failed or every lookup was
+    dead-lettered, True otherwise.
+    """
+    source = source or TextFileSource()
+    generated_files = []
+
+
+    initial_cleanup(EXTRACTED_DATA_DIR)
+
+    try:
+        pool = SessionPool(size=threads)
+        limiter = AdaptiveRateLimiter(burst=threads)
+        dead_letter = DeadLetterFile()
+        unparsed = DeadLetterFile(UNPARSED_FILE)
+        METRICS.reset(total=source.size())
+
+        work = queue.Queue(maxsize=threads * LOOKAHEAD_PER_WORKER)
+        feed_errors = []
+        feeder = threading.Thread(
+            target=feed_work,
+            args=(iter_work(source, refetch_after_days), work, threads, feed_errors),
+            name='work-feeder',
+            daemon=True,
+        )
+        feeder.start()
+        try:
+            with ProgressReporter(METRICS), ThreadPoolExecutor(max_workers=threads) as executor:
+                futures = [
+                    executor.submit(process_chunk, drain(work), idx + 1, generated_files, pool, limiter,
+                                    dead_letter, source, unparsed)
+                    for idx in range(threads)
+                ]
                 for future in futures:
                     future.result()
+            if feed_errors:
+                raise feed_errors[0]
+        finally:
+            logging.info(f"Session pool warmed {pool.warmups} session(s), re-warmed {pool.rewarms} time(s)")
+            logging.info(f"Viewstate cache: {pool.viewstate_cache.stats()}")
+            log_run_summary(limiter, dead_letter, unparsed)
+            pool.close()
 
-        combine_excel_files()
+        return finish_run(source, dead_letter)
 
     except Exception as e:
         logging.error(f"Error during processing: {e}")
         print("Error occurred. Cleaning up generated files...")
 
         cleanup_generated_files(generated_files)
+        return False
 
     finally:
         print("Process finished.")
 
 
-def process_chunk(chunk, thread_id, generated_files):
+def process_chunk(
+        chunk,
+        thread_id,
+        generated_files,
+        pool: SessionPool | None = None,
+        limiter: AdaptiveRateLimiter | None = None,
+        dead_letter: DeadLetterFile | None = None,
+        source: WorkSource | None = None,
+        unparsed: DeadLetterFile | None = None,
+):
 
-    session = requests.Session()
-    session.get(
-        url="https://tmrsearch.ipindia.gov.in/eregister/captcha.ashx",
-        verify=False
-    )
-    session.get(
-        url="https://tmrsearch.ipindia.gov.in/eregister/Application_View.aspx",
-        verify=False
-    )
+    owns_pool = pool is None
+    if owns_pool:
+        pool = SessionPool(size=1)
 
-    captcha = request_captcha(session)
-
-    filename = f'{EXTRACTED_DATA_DIR}/trademark_data_thread_{thread_id}.xlsx'
+    filename = f'{EXTRACTED_DATA_DIR}/{THREAD_FILE_PREFIX}{thread_id}{JsonlResultSink.extension}'
 
     try:
-        if captcha:
+        with thread_file_sink(filename, f"thread {thread_id}") as sink:
             for app_num in chunk:
-                response = request_trademark_data(
-                    appl_number=app_num,
-                    captcha_value=captcha,
-                    session=session,
-                )
-                trademark_data = parse_application_data(response)
-
-                if trademark_data:
-                    save_to_excel(trademark_data, filename)
-                else:
-                    logging.error(f"Error parsing trademark data for application number: {app_num}")
-            generated_files.append(filename)
-        else:
-            logging.error(f"Error retrieving captcha in thread {thread_id}")
-            raise Exception("Captcha retrieval failed")
+                # failures are retried, then dead-lettered, they no longer abort the chunk
+                response = fetch_with_retry(pool.request_trademark_data, app_num, limiter, dead_letter)
+                record_lookup(app_num, response, sink, source, unparsed)
+        generated_files.append(filename)
 
-    except Exception as e:
-        logging.error(f"Error during data extraction in thread {thread_id}: {e}")
-        if os.path.exists(filename):
-            os.remove(filename)
-        raise
+    finally:
+        if owns_pool:
+            pool.close()
 
 
 def cleanup_generated_files(generated_files):
-    """Delete only generated Excel files that start with 'trademark_data_thread'."""
+    """Delete only generated thread files that start with 'trademark_data_thread'."""
     for file in generated_files:
         if os.path.exists(file) and os.path.basename(file).startswith("trademark_data_thread"):
             try:
@@ -101,10 +235,10 @@ def cleanup_generated_files(generated_files):
 
 
 def initial_cleanup(directory):
-    """Delete only Excel files that start with 'trademark_data_thread' in the given directory."""
+    """Delete only thread files (.jsonl/.xlsx) that start with 'trademark_data_thread' in the given directory."""
     try:
         for filename in os.listdir(directory):
-            if filename.startswith("trademark_data_thread") and filename.endswith(".xlsx"):
+            if filename.startswith("trademark_data_thread") and filename.endswith(THREAD_FILE_EXTENSIONS):
                 file_path = os.path.join(directory, filename)
                 os.remove(file_path)
                 logging.info(f"Deleted existing file: {file_path}")